@@ -1,4 +1,6 @@
 from utils.llama_api import llama_api
+from utils.tracing import tracer
+from utils.output_budget import OUTPUT_BUDGETS
 from typing import Optional
 try:
     from crewai import Agent, Task, Crew
@@ -58,9 +60,9 @@ class HealthcareChatbot:
         from utils.llama_api import llama_api as _llama
         class _GroqLLM:
             def __call__(self, prompt: str) -> str:
-                return _llama.generate_response(prompt)
+                return _llama.generate_response(prompt, agent="chatbot", output_budget=OUTPUT_BUDGETS['chatbot'])
             def predict(self, text: str) -> str:
-                return _llama.generate_response(text)
+                return _llama.generate_response(text, agent="chatbot", output_budget=OUTPUT_BUDGETS['chatbot'])
         return _GroqLLM()
         
         # Common health topics and responses
@@ -110,7 +112,8 @@ class HealthcareChatbot:
                     agent=self._crew_agent
                 )
                 crew = Crew(agents=[self._crew_agent], tasks=[task], verbose=False)
-                ai_response = str(crew.kickoff())
+                with tracer.span("crew.kickoff", agent=self.agent_name):
+                    ai_response = str(crew.kickoff())
             except Exception:
                 ai_response = None
 
@@ -148,8 +151,10 @@ class HealthcareChatbot:
         
         emoji = topic_emojis.get(topic, '💡')
         
-        # Provide comprehensive response - truncate at sentence boundary for readability
-        comprehensive_response = self._truncate_at_sentence(ai_response, 700)
+        # Generation is already capped by the output budget; truncation is only a safety net
+        budget = OUTPUT_BUDGETS['chatbot']
+        comprehensive_response = self._truncate_at_sentence(ai_response, budget.max_chars)
+        budget.record(ai_response, comprehensive_response)
         
         formatted_response = f"""{emoji} **Health Information**
 
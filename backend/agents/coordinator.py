@@ -1,39 +1,61 @@
-from crewai import Agent, Task, Crew
-from typing import Dict, Any
+from contextvars import ContextVar
+from typing import Dict, Any, Tuple
 import re
-from utils.llama_api import llama_api
+import time
+from database import reminder_snapshot
+from utils.llama_api import llama_api, set_llm_user
+from utils.metrics import metrics
+from utils.tracing import tracer
+
+# Agent chosen for the request being routed; per context, so concurrent /chat turns don't mix names
+_current_agent_name: ContextVar[str] = ContextVar("current_agent_name", default=None)
 
 class CoordinatorAgent:
-    def __init__(self):
-        self.setup_agents()
-        self._current_agent_name = None
+    # Specialized agents (and crewai/langchain) are imported on first use
     
-    def setup_agents(self):
-        """Setup specialized agents for different healthcare tasks"""
-        
-        # Import specialized agents
+    def setup_agents(self) -> Dict[str, float]:
+        """Load all specialized agents up front and return load time per agent"""
+        timings = {}
+        for name in ['report_analyzer', 'symptom_checker', 'drug_interaction_checker', 'healthcare_chatbot']:
+            start = time.perf_counter()
+            getattr(self, name)
+            timings[name] = round(time.perf_counter() - start, 3)
+        return timings
+    
+    @property
+    def report_analyzer(self):
         from agents.report_analyzer import report_analyzer
+        return report_analyzer
+    
+    @property
+    def symptom_checker(self):
         from agents.symptom_checker import symptom_checker
+        return symptom_checker
+    
+    @property
+    def drug_interaction_checker(self):
         from agents.drug_interaction import drug_interaction_checker
+        return drug_interaction_checker
+    
+    @property
+    def healthcare_chatbot(self):
         from agents.chatbot import healthcare_chatbot
-        
-        self.report_analyzer = report_analyzer
-        self.symptom_checker = symptom_checker
-        self.drug_interaction_checker = drug_interaction_checker
-        self.healthcare_chatbot = healthcare_chatbot
+        return healthcare_chatbot
     
+    @tracer.traced("coordinator.route_request")
     def route_request(self, message: str, context: Dict[str, Any] = None) -> str:
         """Route user request to appropriate agent based on content analysis"""
         
         message_lower = message.lower()
         user_id = context.get('user_id') if context else None
+        set_llm_user(user_id)
         
         # Check for report analysis request
         if any(keyword in message_lower for keyword in [
             'report', 'test result', 'lab result', 'blood test', 'x-ray', 
             'scan', 'mri', 'ct scan', 'analyze', 'interpretation'
         ]):
-            self._current_agent_name = getattr(self.report_analyzer, 'agent_name', 'Report Analyzer')
+            _current_agent_name.set(getattr(self.report_analyzer, 'agent_name', 'Report Analyzer'))
             return self._handle_report_analysis(message, context)
         
         # Check for symptom checking request
@@ -41,7 +63,7 @@ class CoordinatorAgent:
             'symptom', 'pain', 'ache', 'fever', 'headache', 'nausea', 
             'dizzy', 'tired', 'cough', 'sore', 'hurt', 'feel', 'sick'
         ]):
-            self._current_agent_name = getattr(self.symptom_checker, 'agent_name', 'Symptom Checker')
+            _current_agent_name.set(getattr(self.symptom_checker, 'agent_name', 'Symptom Checker'))
             return self._handle_symptom_check(message)
         
         # Check for drug interaction request OR reminder request
@@ -53,14 +75,18 @@ class CoordinatorAgent:
             'delete', 'remove', 'cancel', 'stop', 'edit', 'change', 'update',
             'show my reminders', 'list my reminders', 'my reminders'
         ]):
-            self._current_agent_name = getattr(self.drug_interaction_checker, 'agent_name', 'Drug Interaction')
-            return self._handle_drug_interaction(message, user_id)
+            _current_agent_name.set(getattr(self.drug_interaction_checker, 'agent_name', 'Drug Interaction'))
+            # The reminder handlers read the medication list several times; read it once per turn
+            with reminder_snapshot():
+                return self._handle_drug_interaction(message, user_id)
         
         # Default to general healthcare chatbot
         else:
-            self._current_agent_name = getattr(self.healthcare_chatbot, 'agent_name', 'Healthcare Chatbot')
+            _current_agent_name.set(getattr(self.healthcare_chatbot, 'agent_name', 'Healthcare Chatbot'))
             return self._handle_general_question(message)
     
+    @tracer.traced("agent.report_analyzer")
+    @metrics.timed("agent_request_duration_seconds", agent="report_analyzer")
     def _handle_report_analysis(self, message: str, context: Dict[str, Any] = None) -> str:
         """Handle medical report analysis"""
         
@@ -87,17 +113,28 @@ I can analyze various types of medical reports including:
 Once you upload the image, I'll extract the text and provide a detailed analysis with explanations in simple terms."""
 
     def get_current_agent_name(self) -> str:
-        """Return the name of the last agent selected by routing."""
-        return self._current_agent_name or "Assistant"
+        """Return the name of the last agent selected by routing in this context."""
+        return _current_agent_name.get() or "Assistant"
+    
+    def route_with_agent(self, message: str, context: Dict[str, Any] = None) -> Tuple[str, str]:
+        """Route a request and return (response, name of the agent that handled it)"""
+        response = self.route_request(message, context)
+        return response, self.get_current_agent_name()
     
+    @tracer.traced("agent.symptom_checker")
+    @metrics.timed("agent_request_duration_seconds", agent="symptom_checker")
     def _handle_symptom_check(self, message: str) -> str:
         """Handle symptom checking requests"""
         return self.symptom_checker.check_symptoms(message)
     
+    @tracer.traced("agent.drug_interaction")
+    @metrics.timed("agent_request_duration_seconds", agent="drug_interaction")
     def _handle_drug_interaction(self, message: str, user_id: int = None) -> str:
         """Handle drug interaction checking with database access"""
         return self.drug_interaction_checker.check_interactions(message, user_id)
     
+    @tracer.traced("agent.chatbot")
+    @metrics.timed("agent_request_duration_seconds", agent="chatbot")
     def _handle_general_question(self, message: str) -> str:
         """Handle general healthcare questions"""
         return self.healthcare_chatbot.respond_to_query(message)
@@ -147,5 +184,5 @@ Once you upload the image, I'll extract the text and provide a detailed analysis
         else:
             return llama_api.answer_healthcare_question(message)
 
-# Global coordinator instance
+# Global coordinator instance (agents are loaded on first use)
 coordinator = CoordinatorAgent()
\ No newline at end of file
@@ -1,8 +1,14 @@
 from crewai import Agent, Task, Crew
 from utils.llama_api import llama_api
+from utils.tracing import tracer
+from utils.model_router import model_router
+from utils.output_budget import OUTPUT_BUDGETS
 from utils.drug_interaction_tool import drug_interaction_checker, drug_rxcui_finder, multi_drug_interaction_checker
 import utils.drug_interaction_tool as drug_interaction_tool
 from database import db
+from utils.interaction_checks import interaction_checks
+from utils.interaction_graph import interaction_graph
+from utils.drug_lexicon import drug_lexicon
 from typing import Optional, List, Dict
 import re
 
@@ -74,8 +80,9 @@ class DrugInteractionChecker:
                 from langchain_groq import ChatGroq
                 groq_llm = ChatGroq(
                     groq_api_key=groq_api_key,
-                    model_name="llama-3.3-70b-versatile",
-                    temperature=0.1
+                    model_name=model_router.large_model,
+                    temperature=0.1,
+                    max_tokens=OUTPUT_BUDGETS['drug_interaction'].max_tokens
                 )
                 
                 self.crew_agent = Agent(
@@ -115,10 +122,10 @@ class DrugInteractionChecker:
                 self.api_key = api_key
             
             def __call__(self, prompt: str) -> str:
-                return llama_api.generate_response(prompt)
+                return llama_api.generate_response(prompt, agent="drug_interaction", output_budget=OUTPUT_BUDGETS['drug_interaction'])
             
             def predict(self, text: str) -> str:
-                return llama_api.generate_response(text)
+                return llama_api.generate_response(text, agent="drug_interaction", output_budget=OUTPUT_BUDGETS['drug_interaction'])
         
         return CustomGroqLLM(api_key)
     
@@ -212,7 +219,7 @@ class DrugInteractionChecker:
             
             if user_id:
                 try:
-                    reminders = db.get_user_reminders(user_id)
+                    reminders = db.get_user_reminders(user_id, fresh=True)
                     current_medications = [reminder['medicine_name'].lower() for reminder in reminders]
                     reminder_count = len(reminders)
                     print(f"Found {reminder_count} active reminders for user {user_id}")
@@ -301,10 +308,14 @@ Acetaminophen and paracetamol are the same medication. You should not take both
             system_message = """You are a clinical pharmacist providing additional context to RxNorm API results. 
             Focus on practical, actionable advice for patients while emphasizing professional consultation."""
             
-            ai_response = llama_api.generate_response(prompt, system_message, max_tokens=800)
+            intent = self._interaction_intent(new_drugs, current_medications)
+            budget = OUTPUT_BUDGETS['drug_info']
+            ai_response = llama_api.generate_response(prompt, system_message, agent="drug_interaction",
+                                                      intent=intent, output_budget=budget)
             
             if ai_response:
-                truncated_response = self._truncate_at_sentence(ai_response, 300)
+                truncated_response = self._truncate_at_sentence(ai_response, budget.max_chars)
+                budget.record(ai_response, truncated_response)
                 return f"**🩺 Clinical Guidance:**\n{truncated_response}"
             
             return None
@@ -389,7 +400,8 @@ Acetaminophen and paracetamol are the same medication. You should not take both
             )
             
             print("Executing CrewAI task...")
-            result = crew.kickoff()
+            with tracer.span("crew.kickoff", agent=self.agent_name):
+                result = crew.kickoff()
             print(f"CrewAI result received: {type(result)}")
             return self._format_crewai_response(str(result), current_medications, new_drugs)
             
@@ -404,8 +416,10 @@ Acetaminophen and paracetamol are the same medication. You should not take both
     def _format_crewai_response(self, ai_response: str, current_meds: List[str], new_drugs: List[str]) -> str:
         """Format CrewAI response with additional context"""
         
-        # Keep analysis short - truncate at sentence boundary
-        short_analysis = self._truncate_at_sentence(ai_response, 200)
+        # Generation is already capped by the output budget; truncation is only a safety net
+        budget = OUTPUT_BUDGETS['drug_interaction']
+        short_analysis = self._truncate_at_sentence(ai_response, budget.max_chars)
+        budget.record(ai_response, short_analysis)
         quick_ref = self._get_quick_reference(new_drugs, current_meds)
         
         return f"""💊 **Drug Check**
@@ -449,6 +463,12 @@ Acetaminophen and paracetamol are the same medication. You should not take both
             
             return text[:max_length] + "..."
     
+    def _interaction_intent(self, new_drugs: List[str], current_medications: List[str]) -> str:
+        """Routing intent: a single drug pair stays on the fast model, several pairs escalate"""
+        drugs = {drug.lower() for drug in new_drugs} | {drug.lower() for drug in current_medications}
+        pairs = len(drugs) * (len(drugs) - 1) // 2
+        return "multi_drug_interaction" if pairs > 1 else "drug_interaction"
+    
     def _format_medication_list(self, medications: List[str]) -> str:
         """Format medication list for display"""
         if not medications:
@@ -531,42 +551,8 @@ Acetaminophen and paracetamol are the same medication. You should not take both
 **Note:** This is a basic analysis. Professional consultation is recommended for comprehensive interaction checking."""
     
     def _extract_drug_names(self, text: str) -> List[str]:
-        """Extract drug names from text using enhanced pattern matching"""
-        
-        # Expanded drug names database
-        drug_names = [
-            # Pain relievers
-            'aspirin', 'ibuprofen', 'acetaminophen', 'paracetamol', 'tylenol', 'advil', 'motrin', 'naproxen', 'aleve',
-            # Blood thinners
-            'warfarin', 'coumadin', 'heparin', 'eliquis', 'xarelto', 'pradaxa',
-            # Diabetes medications
-            'metformin', 'insulin', 'glipizide', 'glyburide', 'januvia', 'victoza',
-            # Blood pressure medications
-            'lisinopril', 'atenolol', 'amlodipine', 'hydrochlorothiazide', 'losartan', 'metoprolol',
-            # Stomach medications
-            'omeprazole', 'ranitidine', 'nexium', 'prilosec', 'zantac', 'pepcid',
-            # Cholesterol medications
-            'simvastatin', 'atorvastatin', 'lipitor', 'crestor', 'zocor',
-            # Thyroid medications
-            'levothyroxine', 'synthroid', 'armour thyroid',
-            # Steroids
-            'prednisone', 'prednisolone', 'methylprednisolone',
-            # Respiratory
-            'albuterol', 'ventolin', 'proair', 'symbicort', 'advair',
-            # Antibiotics
-            'amoxicillin', 'azithromycin', 'ciprofloxacin', 'doxycycline', 'penicillin',
-            # Heart medications
-            'digoxin', 'furosemide', 'lasix', 'spironolactone'
-        ]
-        
-        text_lower = text.lower()
-        found_drugs = []
-        
-        for drug in drug_names:
-            if drug in text_lower:
-                found_drugs.append(drug)
-        
-        return list(set(found_drugs))  # Remove duplicates
+        """Extract drug names from text, correcting misspellings with the local drug lexicon"""
+        return drug_lexicon.extract(text, resolves=drug_interaction_tool.is_rxnorm_name)
     
     def _direct_groq_analysis(self, message: str, new_drugs: List[str], current_medications: List[str]) -> str:
         """Direct analysis using our Groq API when CrewAI fails"""
@@ -598,7 +584,9 @@ Acetaminophen and paracetamol are the same medication. You should not take both
         system_message = """You are an expert clinical pharmacist specializing in drug interactions and medication safety. 
         Provide comprehensive, evidence-based analysis while emphasizing patient safety and professional consultation."""
         
-        ai_response = llama_api.generate_response(prompt, system_message, max_tokens=1500)
+        intent = self._interaction_intent(new_drugs, current_medications)
+        ai_response = llama_api.generate_response(prompt, system_message, agent="drug_interaction",
+                                                  intent=intent, output_budget=OUTPUT_BUDGETS['drug_interaction'])
         
         if ai_response:
             return self._format_crewai_response(ai_response, current_medications, new_drugs)
@@ -624,7 +612,8 @@ Acetaminophen and paracetamol are the same medication. You should not take both
         
         # Use AI for detailed analysis
         ai_analysis = llama_api.answer_healthcare_question(
-            f"Analyze potential drug interactions between: {', '.join(drugs)}. {original_message}"
+            f"Analyze potential drug interactions between: {', '.join(drugs)}. {original_message}",
+            agent="drug_interaction", output_budget=OUTPUT_BUDGETS['drug_interaction']
         )
         
         return f"""
@@ -667,7 +656,8 @@ Acetaminophen and paracetamol are the same medication. You should not take both
         
         # Use AI for detailed information
         ai_response = llama_api.answer_healthcare_question(
-            f"Provide information about {drug} medication including uses, side effects, and precautions. {original_message}"
+            f"Provide information about {drug} medication including uses, side effects, and precautions. {original_message}",
+            agent="drug_interaction", output_budget=OUTPUT_BUDGETS['drug_info']
         )
         
         return f"""
@@ -702,10 +692,13 @@ Acetaminophen and paracetamol are the same medication. You should not take both
         
         # Try to get AI response first
         try:
-            ai_response = llama_api.answer_healthcare_question(message)
+            budget = OUTPUT_BUDGETS['drug_info']
+            ai_response = llama_api.answer_healthcare_question(message, agent="drug_interaction",
+                                                               output_budget=budget)
             if ai_response:
-                # Use the truncation method to keep it short
-                short_response = self._truncate_at_sentence(ai_response, 300)
+                # Truncation is a safety net; the output budget already caps generation
+                short_response = self._truncate_at_sentence(ai_response, budget.max_chars)
+                budget.record(ai_response, short_response)
                 return f"""💊 **Medication Info**
 
 {short_response}"""
@@ -759,37 +752,13 @@ To delete medication reminders, please log in to your account first."""
             
             print(f"DEBUG: Processing delete request for {medicine_name} (user {user_id})")
             
-            # Get user's current reminders
+            # Delete all matching reminders (case-insensitive) in one statement
             try:
-                reminders = db.get_user_reminders(user_id)
-                print(f"DEBUG: Found {len(reminders)} total reminders")
-                
-                # Find reminders matching the medicine name (case-insensitive)
-                matching_reminders = []
-                for reminder in reminders:
-                    if reminder['medicine_name'].lower() == medicine_name.lower():
-                        matching_reminders.append(reminder)
-                
-                print(f"DEBUG: Found {len(matching_reminders)} matching reminders for {medicine_name}")
-                
-                if not matching_reminders:
-                    return parser.format_delete_confirmation(medicine_name, False, 0)
-                
-                # Delete all matching reminders
-                deleted_count = 0
-                for reminder in matching_reminders:
-                    success = db.delete_reminder(reminder['id'], user_id)
-                    if success:
-                        deleted_count += 1
-                        print(f"DEBUG: Deleted reminder {reminder['id']}")
-                    else:
-                        print(f"DEBUG: Failed to delete reminder {reminder['id']}")
+                deleted_count = db.delete_reminders_by_medicine(user_id, medicine_name)
+                print(f"DEBUG: Deleted {deleted_count} reminders for {medicine_name}")
                 
                 # Return confirmation
-                if deleted_count > 0:
-                    return parser.format_delete_confirmation(medicine_name, True, deleted_count)
-                else:
-                    return parser.format_delete_confirmation(medicine_name, False, len(matching_reminders))
+                return parser.format_delete_confirmation(medicine_name, deleted_count > 0, deleted_count)
                     
             except Exception as e:
                 print(f"DEBUG: Error accessing reminders: {e}")
@@ -830,43 +799,16 @@ To edit medication reminders, please log in to your account first."""
             
             print(f"DEBUG: Processing edit request for {medicine_name} - {field} to {new_value} (user {user_id})")
             
-            # Get user's current reminders
+            # Update all matching reminders (case-insensitive) in one transaction
             try:
-                reminders = db.get_user_reminders(user_id)
-                print(f"DEBUG: Found {len(reminders)} total reminders")
-                
-                # Find reminders matching the medicine name (case-insensitive)
-                matching_reminders = []
-                for reminder in reminders:
-                    if reminder['medicine_name'].lower() == medicine_name.lower():
-                        matching_reminders.append(reminder)
-                
-                print(f"DEBUG: Found {len(matching_reminders)} matching reminders for {medicine_name}")
-                
-                if not matching_reminders:
-                    return parser.format_edit_confirmation(medicine_name, field, "", new_value, False, 0)
-                
-                # Update all matching reminders
-                updated_count = 0
-                old_value = ""
-                
-                for reminder in matching_reminders:
-                    # Get the old value for confirmation
-                    if not old_value:
-                        old_value = reminder.get(field, "Unknown")
-                    
-                    success = db.update_reminder(reminder['id'], user_id, field, new_value)
-                    if success:
-                        updated_count += 1
-                        print(f"DEBUG: Updated reminder {reminder['id']}")
-                    else:
-                        print(f"DEBUG: Failed to update reminder {reminder['id']}")
+                result = db.update_reminders_by_medicine(user_id, medicine_name, field, new_value)
+                updated_count = result['affected']
+                old_value = result['old_value'] or ""
+                print(f"DEBUG: Updated {updated_count} reminders for {medicine_name}")
                 
                 # Return confirmation
-                if updated_count > 0:
-                    return parser.format_edit_confirmation(medicine_name, field, old_value, new_value, True, updated_count)
-                else:
-                    return parser.format_edit_confirmation(medicine_name, field, old_value, new_value, False, len(matching_reminders))
+                return parser.format_edit_confirmation(medicine_name, field, old_value, new_value,
+                                                       updated_count > 0, updated_count)
                     
             except Exception as e:
                 print(f"DEBUG: Error accessing reminders: {e}")
@@ -912,11 +854,17 @@ Please try again or contact support."""
 
 To add medication reminders, please log in to your account first."""
             
-            # Re-parse the original reminder request with force flag
-            # For now, we'll use default values and let user specify if needed
             from utils.reminder_parser import ReminderParser
             parser = ReminderParser()
             
+            # The warning kept the parsed reminder; insert it without re-parsing or re-checking
+            check = interaction_checks.consume_for_medicine(user_id, medicine_name)
+            if check:
+                return self._add_confirmed_reminder(parser, check['reminder'], user_id, check['interaction_result'])
+            
+            # No pending warning (expired, or never shown) - re-parse with the force flag
+            # For now, we'll use default values and let user specify if needed
+            
             # Create a forced reminder request
             forced_request = f"force add {medicine_name}, {parser.default_dosage}, {parser.default_frequency}, {parser.default_time}"
             
@@ -926,6 +874,27 @@ To add medication reminders, please log in to your account first."""
             print(f"Error handling confirmation request: {e}")
             return None
     
+    def _add_confirmed_reminder(self, parser, reminder_data: Dict, user_id: int, interaction_result=None) -> str:
+        """Insert a reminder the user confirmed after an interaction warning"""
+        success = db.add_reminder(
+            user_id=user_id,
+            medicine_name=reminder_data['medicine_name'],
+            dosage=reminder_data['dosage'],
+            frequency=reminder_data['frequency'],
+            time=reminder_data['time']
+        )
+        if not success:
+            return """❌ **Error Adding Reminder**
+
+Sorry, there was an error saving your medication reminder. Please try again or contact support if the problem persists."""
+        
+        if interaction_result is not None:
+            interaction_graph.add_medication(user_id, reminder_data['medicine_name'], interaction_result)
+        
+        confirmation = parser.format_reminder_confirmation(reminder_data)
+        confirmation += "\n\n⚠️ **Added Despite Interaction Warning**\nPlease monitor for side effects and consult your healthcare provider."
+        return confirmation
+    
     def _handle_reminder_request(self, message: str, user_id: int = None) -> Optional[str]:
         """Handle medication reminder requests with pre-save interaction checking"""
         
@@ -953,7 +922,7 @@ To set medication reminders, please log in to your account first. This helps us
             # Get current medications BEFORE adding new one
             current_medications = []
             try:
-                reminders = db.get_user_reminders(user_id)
+                reminders = db.get_user_reminders(user_id, fresh=True)
                 current_medications = [r['medicine_name'].lower() for r in reminders]
                 print(f"DEBUG: Current medications: {current_medications}")
             except Exception as e:
@@ -963,19 +932,17 @@ To set medication reminders, please log in to your account first. This helps us
             should_check_interactions = len(current_medications) > 0 and not force_add
             print(f"DEBUG: Should check interactions: {should_check_interactions}")
             
+            interaction_result = None
             if should_check_interactions:
                 try:
-                    from utils.drug_interaction_tool import check_all_drug_interactions
-                    
-                    interaction_result = check_all_drug_interactions(
-                        [reminder_data['medicine_name']], 
-                        current_medications
-                    )
+                    # Only the new drug's edges are looked up against the user's interaction graph
+                    interaction_result = interaction_graph.check(user_id, reminder_data['medicine_name'])
                     
-                    print(f"DEBUG: Interaction result: {interaction_result[:100]}...")
+                    print(f"DEBUG: Interaction result: {len(interaction_result.pairs)} pair(s)")
                     
-                    if "⚠️ Interactions Detected" in interaction_result:
-                        # Don't add to database yet - warn user first
+                    if interaction_result.has_interactions:
+                        # Don't add to database yet - warn user first, keeping the check for the confirmation
+                        interaction_checks.issue(user_id, reminder_data, interaction_result)
                         return f"""⚠️ **Drug Interaction Warning**
 
 **New Medication:** {reminder_data['medicine_name'].title()}
@@ -984,7 +951,7 @@ To set medication reminders, please log in to your account first. This helps us
 **Time:** {reminder_data['time']}
 
 🚨 **INTERACTION ALERT:**
-{interaction_result}
+{interaction_result.to_markdown()}
 
 **⚠️ This medication may interact with your current medications.**
 
@@ -1012,6 +979,8 @@ To set medication reminders, please log in to your account first. This helps us
             print(f"DEBUG: Database add result: {success}")
             
             if success:
+                if interaction_result is not None:
+                    interaction_graph.add_medication(user_id, reminder_data['medicine_name'], interaction_result)
                 confirmation = parser.format_reminder_confirmation(reminder_data)
                 
                 # Add safety note if this was a forced add
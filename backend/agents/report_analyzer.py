@@ -1,4 +1,7 @@
 from utils.llama_api import llama_api
+from utils.tracing import tracer
+from utils.prompt_compactor import prompt_compactor
+from utils.output_budget import OUTPUT_BUDGETS
 from typing import Optional
 try:
     from crewai import Agent, Task, Crew
@@ -33,9 +36,9 @@ class ReportAnalyzer:
         from utils.llama_api import llama_api as _llama
         class _GroqLLM:
             def __call__(self, prompt: str) -> str:
-                return _llama.generate_response(prompt)
+                return _llama.generate_response(prompt, agent="report_analyzer", output_budget=OUTPUT_BUDGETS['report_analyzer'])
             def predict(self, text: str) -> str:
-                return _llama.generate_response(text)
+                return _llama.generate_response(text, agent="report_analyzer", output_budget=OUTPUT_BUDGETS['report_analyzer'])
         return _GroqLLM()
     
     def analyze_report(self, ocr_text: str) -> Optional[str]:
@@ -44,6 +47,9 @@ class ReportAnalyzer:
         if not ocr_text or len(ocr_text.strip()) < 20:
             return "The extracted text is too short or unclear to analyze. Please upload a clearer image."
         
+        # Compact once; the crew and the llama fallback see the same report text
+        report_text = prompt_compactor.compact(ocr_text).text
+
         # Prefer CrewAI; fallback to existing llama path
         analysis = None
         if self._crew_agent is not None:
@@ -52,18 +58,19 @@ class ReportAnalyzer:
                     description=(
                         'Summarize the following medical report text, listing key findings, simple explanations, any '
                         'abnormalities, and general recommendations. Keep it 5-6 sentences, layperson-friendly. '
-                        f'Report text: {ocr_text}'
+                        f'Report text: {report_text}'
                     ),
                     expected_output='A single paragraph (5-6 sentences) in plain language with key findings and guidance.',
                     agent=self._crew_agent
                 )
                 crew = Crew(agents=[self._crew_agent], tasks=[task], verbose=False)
-                analysis = str(crew.kickoff())
+                with tracer.span("crew.kickoff", agent=self.agent_name):
+                    analysis = str(crew.kickoff())
             except Exception:
                 analysis = None
         if analysis is None:
             # Existing llama fallback
-            analysis = llama_api.analyze_medical_report(ocr_text)
+            analysis = llama_api.analyze_medical_report(report_text, compact=False)
         
         if analysis:
             return self._format_analysis(analysis, ocr_text)
@@ -73,8 +80,10 @@ class ReportAnalyzer:
     def _format_analysis(self, analysis: str, original_text: str) -> str:
         """Format the analysis with proper structure"""
         
-        # Allow longer analysis for reports (5-6 sentences) - truncate at sentence boundary
-        short_analysis = self._truncate_at_sentence(analysis, 500)
+        # Generation is already capped by the output budget; truncation is only a safety net
+        budget = OUTPUT_BUDGETS['report_analyzer']
+        short_analysis = self._truncate_at_sentence(analysis, budget.max_chars)
+        budget.record(analysis, short_analysis)
         
         formatted = f"""📋 **Report Analysis**
 
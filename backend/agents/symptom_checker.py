@@ -1,4 +1,6 @@
 from utils.llama_api import llama_api
+from utils.tracing import tracer
+from utils.output_budget import OUTPUT_BUDGETS
 from typing import Optional, List, Dict
 try:
     from crewai import Agent, Task, Crew
@@ -40,9 +42,9 @@ class SymptomChecker:
         from utils.llama_api import llama_api as _llama
         class _GroqLLM:
             def __call__(self, prompt: str) -> str:
-                return _llama.generate_response(prompt)
+                return _llama.generate_response(prompt, agent="symptom_checker", output_budget=OUTPUT_BUDGETS['symptom_checker'])
             def predict(self, text: str) -> str:
-                return _llama.generate_response(text)
+                return _llama.generate_response(text, agent="symptom_checker", output_budget=OUTPUT_BUDGETS['symptom_checker'])
         return _GroqLLM()
         self.emergency_keywords = [
             'chest pain', 'difficulty breathing', 'shortness of breath',
@@ -75,7 +77,8 @@ class SymptomChecker:
                     agent=self._crew_agent
                 )
                 crew = Crew(agents=[self._crew_agent], tasks=[task], verbose=False)
-                analysis = str(crew.kickoff())
+                with tracer.span("crew.kickoff", agent=self.agent_name):
+                    analysis = str(crew.kickoff())
             except Exception:
                 analysis = None
         if analysis is None:
@@ -103,8 +106,10 @@ Your symptoms may indicate a medical emergency.
     def _format_symptom_analysis(self, analysis: str, original_symptoms: str) -> str:
         """Format symptom analysis with proper structure"""
         
-        # Allow comprehensive analysis for symptoms (6-8 sentences) - truncate at sentence boundary
-        comprehensive_analysis = self._truncate_at_sentence(analysis, 800)
+        # Generation is already capped by the output budget; truncation is only a safety net
+        budget = OUTPUT_BUDGETS['symptom_checker']
+        comprehensive_analysis = self._truncate_at_sentence(analysis, budget.max_chars)
+        budget.record(analysis, comprehensive_analysis)
         
         return f"""🩺 **Symptom Analysis**
 
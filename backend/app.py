@@ -1,20 +1,30 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 import uvicorn
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Import our modules
-from database import db
+# Import our modules (heavy services are built lazily on first use)
+from database import db, async_db
 from agents.coordinator import coordinator
 from utils.ocr import ocr_processor
 from utils.email_service import email_service
+from utils.llama_api import llama_api
+from utils.lazy import is_loaded, warm_up
+from utils.recurrence import is_valid_timezone, parse_time_of_day
+from utils.session import session_manager, run_auth_work
+from utils.interaction_checks import interaction_checks
+from utils.interaction_graph import interaction_graph
+from utils.tracing import tracer
+from utils.metrics import metrics
 from scheduler import reminder_scheduler
 
 # Initialize FastAPI app
@@ -31,13 +41,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Trace each request (ID returned in X-Trace-Id) and record its latency per endpoint"""
+    start = time.perf_counter()
+    status = 500
+    with tracer.start_trace(f"{request.method} {request.url.path}", request.headers.get("traceparent"),
+                            kind="server", **{"http.method": request.method, "http.target": request.url.path}) as span:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            span.set_attribute("http.status_code", status)
+        finally:
+            # Label by route template so unknown paths cannot create unbounded series
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            metrics.histogram("http_request_duration_seconds", time.perf_counter() - start,
+                              method=request.method, route=route, status=status)
+    response.headers["X-Trace-Id"] = span.trace_id
+    return response
+
+@app.on_event("startup")
+async def start_background_services():
+    """Start the reminder scheduler once the app is serving, not at import time"""
+    # In standalone mode `python scheduler.py` runs the reminder engine instead
+    if reminder_scheduler.mode == "embedded":
+        reminder_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    """Stop the scheduler and hand its lease to another worker"""
+    reminder_scheduler.shutdown()
+
 # Pydantic models for request/response
 class UserRegister(BaseModel):
     username: str
     password: str
     email: Optional[str] = None
+    timezone: Optional[str] = None  # IANA name, e.g. "Asia/Kolkata"
+    locale: Optional[str] = None    # e.g. "en", "es"; selects the reminder email language
 
 class UserLogin(BaseModel):
     username: str
@@ -53,53 +97,116 @@ class ReminderCreate(BaseModel):
     dosage: str
     frequency: str
     time: str
+    check_token: Optional[str] = None  # from an /add-reminder interaction warning
+
+class BulkReminderItem(BaseModel):
+    medicine_name: str
+    dosage: str
+    frequency: str
+    time: str
+
+class ReminderBulkCreate(BaseModel):
+    user_id: int
+    reminders: List[BulkReminderItem]
+    force: bool = False  # add items even if they interact
 
 class ReminderDelete(BaseModel):
     reminder_id: int
     user_id: int
 
+class TimezoneUpdate(BaseModel):
+    user_id: int
+    timezone: str
+
+# Endpoints that act on a user's data need a session token issued by /login
+SESSION_REQUIRED = os.getenv("SESSION_REQUIRED", "true").lower() == "true"
+
+def require_session(user_id: int, authorization: Optional[str]) -> Optional[Dict]:
+    """Check that the bearer token belongs to user_id (HMAC + LRU, no database access)"""
+    token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+    if token is None:
+        if SESSION_REQUIRED:
+            raise HTTPException(status_code=401, detail="Missing session token")
+        return None
+    session = session_manager.validate(token)
+    if session is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session")
+    if session['user_id'] != user_id:
+        raise HTTPException(status_code=403, detail="Session does not belong to this user")
+    return session
+
 # Authentication endpoints
 @app.post("/register")
 async def register_user(user: UserRegister):
     """Register a new user"""
+    if user.timezone and not is_valid_timezone(user.timezone):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {user.timezone}")
     try:
-        success = db.register_user(user.username, user.password, user.email)
-        if success:
-            return {"message": "User registered successfully"}
-        else:
-            raise HTTPException(status_code=400, detail="Username already exists")
+        # bcrypt hashing runs in the auth pool so it never blocks the event loop
+        success = await run_auth_work(db.register_user, user.username, user.password,
+                                      user.email, user.timezone, user.locale)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not success:
+        raise HTTPException(status_code=400, detail="Username already exists")
+    return {"message": "User registered successfully"}
 
 @app.post("/login")
 async def login_user(user: UserLogin):
     """Authenticate user login"""
     try:
-        user_data = db.authenticate_user(user.username, user.password)
-        if user_data:
-            return {"message": "Login successful", "user": user_data}
-        else:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
+        user_data = await run_auth_work(db.authenticate_user, user.username, user.password)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not user_data:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    return {
+        "message": "Login successful",
+        "user": user_data,
+        "token": session_manager.issue(user_data),
+        "expires_in": session_manager.ttl
+    }
+
+@app.post("/logout")
+async def logout_user(authorization: Optional[str] = Header(None)):
+    """Revoke the caller's session token"""
+    token = authorization[7:].strip() if authorization and authorization.lower().startswith("bearer ") else ""
+    session_manager.revoke(token)
+    return {"message": "Logged out"}
+
+@app.post("/update-timezone")
+async def update_timezone(update: TimezoneUpdate, authorization: Optional[str] = Header(None)):
+    """Set the timezone reminders are scheduled in for a user"""
+    require_session(update.user_id, authorization)
+    if not is_valid_timezone(update.timezone):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {update.timezone}")
+    if not await async_db.set_user_timezone(update.user_id, update.timezone):
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"message": "Timezone updated", "timezone": update.timezone}
 
 # Chat endpoints
 @app.post("/chat")
-async def chat_with_ai(message: ChatMessage):
+async def chat_with_ai(message: ChatMessage, authorization: Optional[str] = Header(None)):
     """Process chat message with AI coordinator"""
+    require_session(message.user_id, authorization)
     try:
         # Pass user_id in context for drug interaction checking
         context = {"user_id": message.user_id}
-        response = coordinator.route_request(message.message, context)
-        agent_name = coordinator.get_current_agent_name()
+        # Agents are synchronous (LLM, RxNav and DB calls), so run the turn off the event loop
+        # The agent name is read in the worker's context, not from state shared with other turns
+        response, agent_name = await run_in_threadpool(coordinator.route_with_agent, message.message, context)
         return {"response": response, "agent": agent_name}
     except Exception as e:
         print(f"Chat error: {e}")
         return {"response": "I apologize, but I'm experiencing technical difficulties. Please try again later.", "agent": "Assistant"}
 
 @app.post("/upload-report")
-async def upload_medical_report(file: UploadFile = File(...), user_id: int = Form(...)):
+async def upload_medical_report(file: UploadFile = File(...), user_id: int = Form(...),
+                                authorization: Optional[str] = Header(None)):
     """Upload and analyze medical report image"""
+    require_session(user_id, authorization)
     try:
         # Validate file type
         if not file.content_type.startswith('image/'):
@@ -108,8 +215,12 @@ async def upload_medical_report(file: UploadFile = File(...), user_id: int = For
         # Read file content
         file_content = await file.read()
         
-        # Extract text using OCR
-        ocr_text = ocr_processor.extract_text_from_image(file_content)
+        # Extract text using OCR (queue depth counts uploads waiting for or running OCR)
+        metrics.add_gauge("ocr_queue_depth", 1)
+        try:
+            ocr_text = await run_in_threadpool(ocr_processor.extract_text_from_image, file_content)
+        finally:
+            metrics.add_gauge("ocr_queue_depth", -1)
         
         if not ocr_text:
             raise HTTPException(status_code=400, detail="Could not extract text from image. Please ensure the image is clear and contains readable text.")
@@ -126,8 +237,8 @@ If this is indeed a medical report, please try uploading a clearer image or cont
             }
         
         # Analyze with AI coordinator
-        context = {"ocr_text": ocr_text}
-        analysis = coordinator.route_request("analyze medical report", context)
+        context = {"ocr_text": ocr_text, "user_id": user_id}
+        analysis = await run_in_threadpool(coordinator.route_request, "analyze medical report", context)
         
         return {"analysis": analysis}
         
@@ -139,38 +250,48 @@ If this is indeed a medical report, please try uploading a clearer image or cont
 
 # Reminder endpoints
 @app.post("/add-reminder")
-async def add_reminder(reminder: ReminderCreate):
+async def add_reminder(reminder: ReminderCreate, authorization: Optional[str] = Header(None)):
     """Add a new medication reminder with drug interaction checking"""
+    require_session(reminder.user_id, authorization)
     try:
-        from agents.drug_interaction import drug_interaction_checker
-        from utils.drug_interaction_tool import check_all_drug_interactions
-        
         # Get user's current medications
-        current_reminders = db.get_user_reminders(reminder.user_id)
+        current_reminders = await async_db.get_user_reminders(reminder.user_id, fresh=True)
         current_medications = [r['medicine_name'].lower() for r in current_reminders]
         
         print(f"DEBUG: Manual reminder - checking interactions for {reminder.medicine_name}")
         print(f"DEBUG: Current medications: {current_medications}")
         
         # Check for drug interactions if user has existing medications
+        interaction_result = None
         if len(current_medications) > 0:
             try:
-                interaction_result = check_all_drug_interactions(
-                    [reminder.medicine_name.lower()], 
-                    current_medications
+                # Only the new drug's edges are looked up against the user's interaction graph
+                interaction_result = await run_in_threadpool(
+                    interaction_graph.check,
+                    reminder.user_id,
+                    reminder.medicine_name
                 )
                 
-                print(f"DEBUG: Interaction result: {interaction_result[:200]}...")
+                print(f"DEBUG: Interaction result: {len(interaction_result.pairs)} pair(s) from {interaction_result.source.value}")
                 
                 # If interactions are detected, don't add to database
-                if "⚠️ Interactions Detected" in interaction_result:
+                if interaction_result.has_interactions:
+                    # Keep the checked reminder so /force-add-reminder can insert it directly
+                    check_token = interaction_checks.issue(reminder.user_id, {
+                        "medicine_name": reminder.medicine_name,
+                        "dosage": reminder.dosage,
+                        "frequency": reminder.frequency,
+                        "time": reminder.time
+                    }, interaction_result)
                     return {
                         "success": False,
                         "interaction_warning": True,
                         "message": "Drug interaction detected",
-                        "interaction_details": interaction_result,
+                        "interaction_details": interaction_result.to_markdown(),
+                        "interactions": interaction_result.to_dict(),
                         "conflicting_drugs": current_medications,
-                        "new_drug": reminder.medicine_name
+                        "new_drug": reminder.medicine_name,
+                        "check_token": check_token
                     }
                     
             except Exception as e:
@@ -178,7 +299,7 @@ async def add_reminder(reminder: ReminderCreate):
                 # Continue with adding the reminder if interaction check fails
         
         # No interactions found or no current medications - proceed with adding
-        success = db.add_reminder(
+        success = await async_db.add_reminder(
             user_id=reminder.user_id,
             medicine_name=reminder.medicine_name,
             dosage=reminder.dosage,
@@ -187,6 +308,9 @@ async def add_reminder(reminder: ReminderCreate):
         )
         
         if success:
+            if interaction_result is not None:
+                await run_in_threadpool(interaction_graph.add_medication, reminder.user_id,
+                                        reminder.medicine_name, interaction_result)
             return {
                 "success": True,
                 "message": "Reminder added successfully",
@@ -199,22 +323,29 @@ async def add_reminder(reminder: ReminderCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/force-add-reminder")
-async def force_add_reminder(reminder: ReminderCreate):
+async def force_add_reminder(reminder: ReminderCreate, authorization: Optional[str] = Header(None)):
     """Force add a medication reminder bypassing interaction warnings"""
+    require_session(reminder.user_id, authorization)
     try:
-        success = db.add_reminder(
-            user_id=reminder.user_id,
-            medicine_name=reminder.medicine_name,
-            dosage=reminder.dosage,
-            frequency=reminder.frequency,
-            time=reminder.time
-        )
+        # With a check token, insert exactly the reminder that was checked and warned about
+        check = interaction_checks.consume(reminder.check_token, reminder.user_id)
+        data = check['reminder'] if check else {
+            "medicine_name": reminder.medicine_name,
+            "dosage": reminder.dosage,
+            "frequency": reminder.frequency,
+            "time": reminder.time
+        }
+        success = await async_db.add_reminder(user_id=reminder.user_id, **data)
         
         if success:
+            if check:
+                await run_in_threadpool(interaction_graph.add_medication, reminder.user_id,
+                                        data['medicine_name'], check['interaction_result'])
             return {
                 "success": True,
                 "message": "Reminder added successfully (interaction warning bypassed)",
-                "forced": True
+                "forced": True,
+                "from_check": check is not None
             }
         else:
             raise HTTPException(status_code=500, detail="Failed to add reminder")
@@ -222,20 +353,121 @@ async def force_add_reminder(reminder: ReminderCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Upper bound on one onboarding import
+BULK_REMINDER_LIMIT = int(os.getenv("BULK_REMINDER_LIMIT", "100"))
+
+@app.post("/reminders/bulk")
+async def add_reminders_bulk(request: ReminderBulkCreate, authorization: Optional[str] = Header(None)):
+    """Add a medication list at once with a single interaction check over the combined set"""
+    require_session(request.user_id, authorization)
+    if len(request.reminders) > BULK_REMINDER_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_REMINDER_LIMIT} reminders per request")
+    try:
+        from utils.drug_interaction_tool import find_drug_interactions
+        
+        results = []
+        for index, item in enumerate(request.reminders):
+            result = {"index": index, "medicine_name": item.medicine_name}
+            if not item.medicine_name.strip():
+                result.update(status="invalid", error="Medicine name is required")
+            elif parse_time_of_day(item.time) is None:
+                result.update(status="invalid", error="Time must be HH:MM")
+            else:
+                result.update(status="pending", interactions=[])
+            results.append(result)
+        
+        current_reminders = await async_db.get_user_reminders(request.user_id, fresh=True)
+        current_medications = list(dict.fromkeys(r['medicine_name'].lower() for r in current_reminders))
+        new_drugs = list(dict.fromkeys(
+            item.medicine_name.strip().lower() for item, result in zip(request.reminders, results)
+            if result["status"] == "pending" and item.medicine_name.strip().lower() not in current_medications
+        ))
+        
+        # One pass over new x current and new x new instead of one check per item
+        found = None
+        interactions = []
+        if new_drugs and len(new_drugs) + len(current_medications) > 1:
+            try:
+                found = await run_in_threadpool(find_drug_interactions, new_drugs, current_medications)
+                interactions = found.pairs
+            except Exception as e:
+                print(f"DEBUG: Error in bulk interaction checking: {e}")
+                # Continue with adding the reminders if interaction check fails
+        
+        for result in results:
+            if result["status"] != "pending":
+                continue
+            name = result["medicine_name"].strip().lower()
+            for pair in interactions:
+                if pair.involves(name):
+                    result["interactions"].append({
+                        "drug": pair.other(name),
+                        "severity": pair.severity.value,
+                        "description": pair.description,
+                        "source": pair.source.value
+                    })
+            if result["interactions"] and not request.force:
+                result["status"] = "interaction_warning"
+        
+        to_add = [(item, result) for item, result in zip(request.reminders, results) if result["status"] == "pending"]
+        ids = await async_db.add_reminders_bulk(request.user_id, [
+            {"medicine_name": item.medicine_name.strip(), "dosage": item.dosage,
+             "frequency": item.frequency, "time": item.time}
+            for item, _ in to_add
+        ])
+        for (_, result), reminder_id in zip(to_add, ids):
+            result.update(status="added", reminder_id=reminder_id)
+        
+        # The combined check already has the new drugs' RxCUIs and edges for the interaction graph
+        if found is not None:
+            added_drugs = {item.medicine_name.strip().lower(): item.medicine_name.strip() for item, _ in to_add}
+            for drug in new_drugs:
+                if drug in added_drugs:
+                    await run_in_threadpool(interaction_graph.add_medication, request.user_id, added_drugs[drug], found)
+        
+        added = len(ids)
+        warnings = sum(1 for r in results if r["status"] == "interaction_warning")
+        return {
+            "success": added > 0 or not results,
+            "message": f"Added {added} of {len(results)} reminders",
+            "added": added,
+            "interaction_warning": any(r.get("interactions") for r in results),
+            "skipped_for_interactions": warnings,
+            "results": results
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Bulk reminder error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/get-reminders")
-async def get_user_reminders(user_id: int):
+async def get_user_reminders(user_id: int, authorization: Optional[str] = Header(None)):
     """Get all reminders for a user"""
+    require_session(user_id, authorization)
     try:
-        reminders = db.get_user_reminders(user_id)
+        reminders = await async_db.get_user_reminders(user_id)
         return {"reminders": reminders}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/interaction-graph")
+async def get_interaction_graph(user_id: int, authorization: Optional[str] = Header(None)):
+    """Medication interaction graph for the dashboard (nodes, edges, severity summary)"""
+    require_session(user_id, authorization)
+    try:
+        return await run_in_threadpool(interaction_graph.describe, user_id)
+    except Exception as e:
+        print(f"Interaction graph error: {e}")
+        raise HTTPException(status_code=500, detail="Error building interaction graph")
+
 @app.delete("/delete-reminder")
-async def delete_reminder(reminder: ReminderDelete):
+async def delete_reminder(reminder: ReminderDelete, authorization: Optional[str] = Header(None)):
     """Delete a reminder"""
+    require_session(reminder.user_id, authorization)
     try:
-        success = db.delete_reminder(reminder.reminder_id, reminder.user_id)
+        success = await async_db.delete_reminder(reminder.reminder_id, reminder.user_id)
         if success:
             return {"message": "Reminder deleted successfully"}
         else:
@@ -263,15 +495,24 @@ async def health_check():
         # Check scheduler status
         scheduler_status = reminder_scheduler.get_scheduler_status()
         
+        # LLM client and circuit breaker state (without forcing the client to load)
+        if is_loaded(llama_api):
+            llama_status = llama_api.get_status()
+            breaker_open = llama_status["circuit_breaker"]["state"] != "closed"
+        else:
+            llama_status = {"loaded": False}
+            breaker_open = False
+        
         return {
-            "status": "healthy",
+            "status": "degraded" if breaker_open else "healthy",
             "database": db_status,
             "scheduler": scheduler_status,
             "services": {
-                "ocr": "available",
-                "llama_api": "available",
-                "email": "available"
-            }
+                "ocr": ocr_processor.get_status(),
+                "llama_api": llama_status,
+                "email": email_service.get_status()
+            },
+            "tracing": tracer.get_status()
         }
     except Exception as e:
         return JSONResponse(
@@ -279,11 +520,34 @@ async def health_check():
             content={"status": "unhealthy", "error": str(e)}
         )
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.post("/warmup")
+async def warmup():
+    """Load agents, the LLM client and the database ahead of the first real request"""
+    try:
+        start = time.perf_counter()
+        timings = {
+            "database": round(warm_up(db), 3),
+            "llama_api": round(warm_up(llama_api), 3),
+        }
+        timings.update(coordinator.setup_agents())
+        return {
+            "message": "Warm-up complete",
+            "timings": timings,
+            "total_seconds": round(time.perf_counter() - start, 3)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/test-email")
 async def test_email(email: str):
     """Test email configuration"""
     try:
-        success = email_service.send_test_email(email)
+        success = await run_in_threadpool(email_service.send_test_email, email)
         if success:
             return {"message": "Test email sent successfully"}
         else:
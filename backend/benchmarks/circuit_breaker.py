@@ -0,0 +1,140 @@
+"""
+Circuit breaker and hedging check for the Groq client
+Drives LlamaAPI.generate_response against the fake Groq client through a simulated outage
+(injected latency past the timeout, then errors) and asserts the breaker goes
+closed -> open -> half-open -> closed, fails fast while open, and that a hedged duplicate
+rescues a slow primary call. Exits 1 if any step fails.
+
+Usage:
+    python benchmarks/circuit_breaker.py [--verbose]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fakes import SENTENCES, FakeGroqClient, configure_environment  # noqa: E402
+
+TIMEOUT = 0.5
+FAILURES = 3
+RESET = 0.5
+PROMPT = "What is a healthy resting heart rate?"
+
+
+class SlowFirstCallClient(FakeGroqClient):
+    """Fake whose first call is slow, as a tail-latency outlier would be"""
+
+    def __init__(self, slow_seconds: float):
+        super().__init__()
+        self._slow_seconds = slow_seconds
+        self._first = threading.Event()
+
+    def create(self, *args, **kwargs):
+        if not self._first.is_set():
+            self._first.set()
+            time.sleep(self._slow_seconds)
+        return super().create(*args, **kwargs)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verbose', action='store_true', help="Show the app's debug output")
+    args = parser.parse_args()
+
+    configure_environment()
+    os.environ.update({
+        "AI_TIMEOUT": str(TIMEOUT),
+        "LLM_BREAKER_FAILURES": str(FAILURES),
+        "LLM_BREAKER_RESET_SECONDS": str(RESET),
+        "LLM_HEDGE_ENABLED": "true",
+        "LLM_HEDGE_DEFAULT_DELAY": "0.1",
+        "LLM_HEDGE_MIN_DELAY": "0.05",
+    })
+    from utils.llama_api import LlamaAPI, LLMQueueTimeout
+    from utils.model_router import model_router
+
+    llm = LlamaAPI()
+    llm.client = FakeGroqClient()
+    llm.model = model_router.large_model
+    breaker = llm.circuit_breaker
+    failures = []
+
+    def check(name: str, ok: bool, detail: str = "") -> None:
+        print(f"{'✅' if ok else '❌'} {name}{f' ({detail})' if detail else ''}")
+        if not ok:
+            failures.append(name)
+
+    def ask() -> tuple:
+        start = time.perf_counter()
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            response = llm.generate_response(PROMPT, agent="chatbot")
+        return response, time.perf_counter() - start
+
+    def answered(response: str) -> bool:
+        return any(sentence in response for sentence in SENTENCES)
+
+    response, _ = ask()
+    check("healthy call answered by the model", answered(response) and breaker.state == breaker.CLOSED)
+
+    # Outage: every call runs into the timeout
+    llm.client.latency = TIMEOUT * 2
+    for _ in range(FAILURES):
+        response, elapsed = ask()
+    check(f"opens after {FAILURES} timeouts", breaker.state == breaker.OPEN,
+          f"state {breaker.state}, last call {elapsed:.2f}s")
+
+    calls = llm.client.calls
+    response, elapsed = ask()
+    check("fails fast while open", not answered(response) and elapsed < 0.05 and llm.client.calls == calls,
+          f"{elapsed * 1000:.1f}ms, {llm.client.calls - calls} upstream calls")
+
+    # Half-open: a probe that never reaches Groq must not wedge the breaker
+    time.sleep(RESET + 0.05)
+    check("half-open after the reset timeout", breaker.state == breaker.HALF_OPEN)
+    acquire = llm.scheduler.acquire
+
+    def queue_timeout(*args, **kwargs):
+        raise LLMQueueTimeout("queue full")
+
+    llm.scheduler.acquire = queue_timeout
+    ask()
+    llm.scheduler.acquire = acquire
+    check("queue-timeout probe leaves the breaker half-open and probeable",
+          breaker.state == breaker.HALF_OPEN and breaker.allow_request())
+    breaker.release_probe()
+
+    # A failed probe reopens the breaker
+    llm.client.latency = 0.0
+    llm.client.fail_with = RuntimeError("503 Service Unavailable")
+    ask()
+    check("failed probe reopens", breaker.state == breaker.OPEN)
+
+    # Recovery: the next probe succeeds and closes the breaker
+    llm.client.fail_with = None
+    time.sleep(RESET + 0.05)
+    response, _ = ask()
+    check("successful probe closes", answered(response) and breaker.state == breaker.CLOSED)
+
+    # Hedging: a duplicate sent after the hedge delay answers before the slow primary
+    llm.client = SlowFirstCallClient(TIMEOUT * 0.8)
+    response, elapsed = ask()
+    check("hedged duplicate rescues a slow primary", answered(response) and elapsed < TIMEOUT * 0.6,
+          f"{elapsed:.2f}s")
+
+    print(f"Breaker status: {breaker.get_status()}")
+    if failures:
+        print("❌ Circuit breaker check failed: " + "; ".join(failures))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
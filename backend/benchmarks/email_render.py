@@ -0,0 +1,107 @@
+"""
+Reminder email render benchmark
+Renders a peak minute of reminder emails through the compiled template cache and the
+shared MIME skeleton, compared with str.format and fresh email.mime objects per message
+
+Usage:
+    python benchmarks/email_render.py [--count 100000] [--locale en] [--save]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from utils.email_service import EmailService  # noqa: E402
+from utils.email_templates import TEMPLATES, TemplateRegistry  # noqa: E402
+
+MEDICINES = ['Paracetamol', 'Metformin', 'Lisinopril', 'Atorvastatin', 'Amlodipine',
+             'Omeprazole', 'Levothyroxine', 'Aspirin']
+
+
+def reminders(count: int):
+    """Deterministic reminder payloads resembling a busy minute"""
+    for i in range(count):
+        yield {
+            'username': f"user{i % 5000}",
+            'medicine_name': MEDICINES[i % len(MEDICINES)],
+            'dosage': f"{1 + i % 3} tablet",
+            'time': '08:00',
+        }
+
+
+def run_uncached(count: int, locale: str, build_mime: bool) -> float:
+    """Format and (optionally) build every message from scratch"""
+    source = TEMPLATES[locale]['reminder']
+    start = time.perf_counter()
+    for values in reminders(count):
+        subject = source['subject'].format(**values)
+        text = source['text'].format(**values)
+        html = source['html'].format(**values)
+        if build_mime:
+            msg = MIMEMultipart('alternative')
+            msg['Subject'] = subject
+            msg.attach(MIMEText(text, 'plain', 'utf-8'))
+            msg.attach(MIMEText(html, 'html', 'utf-8'))
+    return time.perf_counter() - start
+
+
+def run_cached(count: int, locale: str, build_mime: bool) -> float:
+    """Render through the compiled template cache and shared MIME parts"""
+    registry = TemplateRegistry()
+    service = EmailService()
+    start = time.perf_counter()
+    for values in reminders(count):
+        rendered = registry.render('reminder', values, locale)
+        if build_mime:
+            service.build_message('user@example.com', rendered)
+    return time.perf_counter() - start
+
+
+def summarize(label: str, seconds: float, count: int) -> dict:
+    return {
+        'variant': label,
+        'seconds': round(seconds, 4),
+        'per_message_us': round(seconds / count * 1e6, 2),
+        'messages_per_second': round(count / seconds) if seconds else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--locale', default='en')
+    parser.add_argument('--output', default=os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'email_render.json'))
+    parser.add_argument('--save', action='store_true', help='Write the results JSON')
+    args = parser.parse_args()
+
+    results = {
+        'count': args.count,
+        'locale': args.locale,
+        'render_only': [
+            summarize('str.format', run_uncached(args.count, args.locale, False), args.count),
+            summarize('compiled_cache', run_cached(args.count, args.locale, False), args.count),
+        ],
+        'render_and_mime': [
+            summarize('fresh_mime_parts', run_uncached(args.count, args.locale, True), args.count),
+            summarize('shared_mime_skeleton', run_cached(args.count, args.locale, True), args.count),
+        ],
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
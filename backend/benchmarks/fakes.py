@@ -0,0 +1,312 @@
+"""
+Deterministic stand-ins for external services used by the benchmarks
+- FakeGroqClient: drop-in for groq.Groq; replies are derived from the prompt, with optional latency
+  and injected failures
+- MockRxNavServer: local HTTP server answering the RxNav endpoints used by utils/drug_interaction_tool.py
+- install_fake_ocr: OCR that returns a sample lab report instead of running Tesseract
+- SMTPSink: local SMTP server that accepts and records every message
+- use_temp_database / install_fake_llm: point the app's lazy singletons at the stand-ins
+
+Call configure_environment() before importing any backend module.
+"""
+
+import hashlib
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Canned sentences the fake model picks from; long enough to exercise truncation and formatting
+SENTENCES = [
+    "Based on the information provided, this is most likely a mild and self-limiting condition.",
+    "Rest, stay hydrated and monitor your symptoms over the next 24 to 48 hours.",
+    "Over-the-counter pain relievers can help, but follow the dosing instructions on the label.",
+    "If symptoms worsen or new symptoms appear, contact your healthcare provider promptly.",
+    "Values slightly outside the reference range are common and often not clinically significant.",
+    "Your doctor can interpret these results in the context of your overall health history.",
+    "Taking these medications together may increase the risk of side effects.",
+    "A pharmacist can review your full medication list and suggest safer alternatives.",
+    "Regular exercise, a balanced diet and adequate sleep support overall wellbeing.",
+    "This information is educational and does not replace professional medical advice.",
+]
+
+# RxCUIs and interactions served by the mock RxNav server
+RXCUIS = {
+    'aspirin': '1191', 'ibuprofen': '5640', 'acetaminophen': '161', 'paracetamol': '161',
+    'warfarin': '11289', 'metformin': '6809', 'lisinopril': '29046', 'atorvastatin': '83367',
+    'amlodipine': '17767', 'omeprazole': '7646', 'levothyroxine': '10582', 'simvastatin': '36567',
+    'prednisone': '8640', 'amoxicillin': '723', 'digoxin': '3407', 'furosemide': '4603',
+}
+INTERACTIONS = {
+    frozenset(('11289', '1191')): ('high', 'Increased risk of bleeding.'),
+    frozenset(('11289', '5640')): ('high', 'Increased risk of bleeding.'),
+    frozenset(('1191', '5640')): ('moderate', 'Increased risk of gastrointestinal bleeding.'),
+    frozenset(('5640', '29046')): ('moderate', 'Reduced antihypertensive effect.'),
+    frozenset(('36567', '17767')): ('moderate', 'Increased simvastatin exposure.'),
+    frozenset(('3407', '4603')): ('high', 'Hypokalemia may increase digoxin toxicity.'),
+}
+
+# Lab report text returned by the fake OCR
+SAMPLE_REPORT = """CITY HOSPITAL LABORATORY REPORT
+Patient: Jane Doe    Age: 54    Sample: Blood
+COMPLETE BLOOD COUNT
+Hemoglobin 11.2 g/dL (13.0 - 17.0) LOW
+WBC 7,800 /uL (4,000 - 11,000)
+Platelets 210,000 /uL (150,000 - 450,000)
+LIPID PROFILE
+Total Cholesterol 232 mg/dL (< 200) HIGH
+LDL 158 mg/dL (< 100) HIGH
+HDL 41 mg/dL (> 40)
+Fasting Glucose 104 mg/dL (70 - 99) HIGH"""
+
+
+def configure_environment(rxnav_url: str = None) -> None:
+    """Settings that must be in place before backend modules are imported"""
+    os.environ["GROQ_API_KEY"] = ""  # keep CrewAI agents off; the fake client is installed directly
+    os.environ.setdefault("SESSION_REQUIRED", "false")
+    os.environ.setdefault("EMAIL_USER", "")
+    # The rate limiter would otherwise dominate the measurement
+    os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", "64")
+    if rxnav_url:
+        os.environ["RXNORM_API_BASE"] = rxnav_url
+
+
+class FakeGroqClient:
+    """Deterministic replacement for groq.Groq (chat.completions.create only)"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.calls = 0
+        # Raised (after the latency) instead of replying, to simulate an outage
+        self.fail_with: Exception = None
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: list, max_tokens: int = 1000, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_with is not None:
+            raise self.fail_with
+        prompt = messages[-1]["content"]
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+        # Roughly 4 characters per token, stopping at the token budget like the real API
+        budget_chars = max_tokens * 4
+        parts, length, truncated = [], 0, False
+        for i in range(3 + seed % (len(SENTENCES) - 3)):
+            sentence = SENTENCES[(seed + i) % len(SENTENCES)]
+            if length + len(sentence) > budget_chars:
+                truncated = True
+                break
+            parts.append(sentence)
+            length += len(sentence) + 1
+        content = " ".join(parts) or SENTENCES[seed % len(SENTENCES)][:budget_chars]
+        finish_reason = "length" if truncated else "stop"
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        completion_tokens = len(content) // 4
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                total_tokens=prompt_tokens + completion_tokens)
+        message = SimpleNamespace(content=content, role="assistant")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)],
+                               usage=usage, model=model)
+
+
+class _RxNavHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    requests_served = 0
+
+    def do_GET(self):
+        type(self).requests_served += 1
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.endswith("/rxcui.json"):
+            rxcui = RXCUIS.get(unquote(query.get("name", [""])[0]).strip().lower())
+            body = {"idGroup": {"rxnormId": [rxcui]} if rxcui else {}}
+        elif url.path.endswith("/approximateTerm.json"):
+            term = unquote(query.get("term", [""])[0]).strip().lower()
+            match = next((cui for name, cui in RXCUIS.items() if name[:4] == term[:4]), None)
+            body = {"approximateGroup": {"candidate": [{"rxcui": match}]} if match else {}}
+        elif url.path.endswith("/interaction/list.json"):
+            body = self._interactions(query.get("rxcuis", [""])[0])
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _interactions(self, rxcuis: str) -> dict:
+        ids = set(rxcuis.replace(" ", "+").split("+"))
+        pairs = []
+        for pair, (severity, description) in INTERACTIONS.items():
+            if pair <= ids:
+                first, second = sorted(pair)
+                pairs.append({
+                    "interactionConcept": [{"minConceptItem": {"rxcui": first}},
+                                           {"minConceptItem": {"rxcui": second}}],
+                    "severity": severity,
+                    "description": description,
+                })
+        if not pairs:
+            return {}
+        return {"fullInteractionTypeGroup": [{"fullInteractionType": [{"interactionPair": pairs}]}]}
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockRxNavServer:
+    """Local RxNav stand-in on 127.0.0.1 (random port), run in a background thread"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        handler = type("Handler", (_RxNavHandler,), {"latency": latency_ms / 1000.0, "requests_served": 0})
+        self._handler = handler
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/REST"
+
+    @property
+    def requests_served(self) -> int:
+        return self._handler.requests_served
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib.sendmail without TLS or AUTH"""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        self.reply("220 sink ESMTP")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 sink")
+            elif verb == "MAIL":
+                sender, recipients = command.partition(":")[2].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.partition(":")[2].strip().strip("<>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data in iter(self.rfile.readline, b""):
+                    if data in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data.decode("utf-8", "replace"))
+                self.server.record(sender, recipients, "".join(lines))
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SMTPSink:
+    """Local SMTP server on 127.0.0.1 (random port) that records messages instead of delivering them"""
+
+    def __init__(self):
+        self.messages = []
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPHandler)
+        self._server.daemon_threads = True
+        self._server.record = self._record
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def _record(self, sender: str, recipients: list, data: str) -> None:
+        with self._lock:
+            self.messages.append(SimpleNamespace(sender=sender, recipients=recipients, data=data))
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def configure(self) -> None:
+        """Point the email settings at the sink; call before utils.email_service is imported"""
+        os.environ.update({"EMAIL_HOST": "127.0.0.1", "EMAIL_PORT": str(self.port),
+                           "EMAIL_USE_TLS": "false", "EMAIL_USER": "reminders@example.com", "EMAIL_PASS": ""})
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def use_temp_database(prefix: str = "bench_"):
+    """Point the app's lazy database at a throwaway file and return it"""
+    from database import Database, db
+    path = os.path.join(tempfile.mkdtemp(prefix=prefix), "bench.db")
+    database = Database(path)
+    object.__setattr__(db, '_lazy_instance', database)
+    return database
+
+
+def install_fake_llm(latency_ms: float = 0.0) -> FakeGroqClient:
+    """Replace the Groq client behind llama_api with the deterministic fake"""
+    from utils.llama_api import llama_api
+    from utils.model_router import model_router
+    client = FakeGroqClient(latency_ms)
+    llama_api.client = client
+    llama_api.model = model_router.large_model
+    return client
+
+
+def disable_crew_agents() -> None:
+    """Route agent turns through llama_api, so every LLM call reaches the fake client
+
+    CrewAI agents are built whenever crewai is importable, and would otherwise call the real LLM.
+    """
+    from agents.coordinator import coordinator
+    coordinator.setup_agents()
+    for name in ['report_analyzer', 'symptom_checker', 'drug_interaction_checker', 'healthcare_chatbot']:
+        agent = getattr(coordinator, name)
+        if getattr(agent, '_crew_agent', None) is not None:
+            agent._crew_agent = None
+
+
+def install_fake_ocr(latency_ms: float = 0.0) -> None:
+    """Replace Tesseract with a fixed report; latency_ms stands in for OCR CPU time"""
+    from utils.ocr import ocr_processor
+
+    def extract_text_from_image(image_data: bytes):
+        if latency_ms:
+            time.sleep(latency_ms / 1000.0)
+        return SAMPLE_REPORT
+
+    ocr_processor.extract_text_from_image = extract_text_from_image
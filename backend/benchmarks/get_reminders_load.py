@@ -0,0 +1,121 @@
+"""
+/get-reminders concurrency benchmark
+Compares the async DB path used by the endpoint with the previous pattern of calling the
+synchronous Database directly inside an async handler, at high concurrency
+
+Runs in-process against a temporary database seeded with users and reminders.
+
+Usage:
+    python benchmarks/get_reminders_load.py [--requests 2000] [--concurrency 200] [--users 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# The benchmark calls endpoints without logging in
+os.environ.setdefault("SESSION_REQUIRED", "false")
+
+import httpx  # noqa: E402
+
+from stats import percentiles  # noqa: E402
+
+MEDICINES = ['Paracetamol', 'Metformin', 'Lisinopril', 'Atorvastatin', 'Amlodipine',
+             'Omeprazole', 'Levothyroxine', 'Aspirin', 'Ibuprofen', 'Warfarin']
+
+
+def setup_app(users: int):
+    from database import Database, db
+    path = os.path.join(tempfile.mkdtemp(prefix="get_reminders_load_"), "load.db")
+    database = Database(path)
+    object.__setattr__(db, '_lazy_instance', database)
+    for i in range(users):
+        database.register_user(f"user{i}", "password", f"user{i}@example.com")
+        for j, medicine in enumerate(MEDICINES):
+            database.add_reminder(i + 1, medicine, "1 tablet", "2 times daily", f"{8 + j % 12:02d}:00")
+
+    from app import app
+
+    # Previous pattern: blocking sqlite call directly on the event loop
+    @app.get("/bench/get-reminders-sync")
+    async def get_reminders_sync(user_id: int):
+        return {"reminders": db.get_user_reminders(user_id)}
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, args) -> Dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latency, probe_latency = [], []
+    errors = 0
+    done = asyncio.Event()
+
+    async def request(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(path, params={"user_id": i % args.users + 1})
+            latency.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors += 1
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/")
+            probe_latency.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+
+    return {
+        'path': path,
+        'requests_per_second': round(args.requests / elapsed, 1),
+        'errors': errors,
+        'latency': percentiles(latency),
+        'event_loop_probe_latency': percentiles(probe_latency),
+    }
+
+
+async def run(args) -> Dict:
+    app = setup_app(args.users)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        await client.get("/get-reminders", params={"user_id": 1})  # warm up
+        before = await measure(client, "/bench/get-reminders-sync", args)
+        after = await measure(client, "/get-reminders", args)
+    return {'requests': args.requests, 'concurrency': args.concurrency, 'users': args.users,
+            'before_sync_db': before, 'after_async_db': after}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--output', default=None, help='Write results JSON to this path')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+HTTP load test for the main API endpoints
+Drives a weighted mix of /chat, /add-reminder, /get-reminders and /upload-report from concurrent
+asyncio workers, while probing GET / to catch handlers that block the event loop. Reports
+throughput, latency histograms, percentiles and error rates per endpoint.
+
+By default the app runs in-process on a temporary database, with Groq, RxNav and OCR replaced by
+the stand-ins in benchmarks/fakes.py. With --url it loads a running server instead. Uploads then
+send --report-image, and that server's real services are exercised.
+
+Usage:
+    python benchmarks/http_load.py [--requests 2000] [--concurrency 50] [--users 20]
+                                   [--mix chat=40,get-reminders=35,add-reminder=20,upload-report=5]
+                                   [--llm-latency-ms 300] [--rxnav-latency-ms 80] [--ocr-latency-ms 150]
+                                   [--max-probe-p99-ms 50] [--url http://localhost:8000] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx  # noqa: E402
+
+from fakes import (MockRxNavServer, configure_environment, disable_crew_agents, install_fake_llm,  # noqa: E402
+                   install_fake_ocr, use_temp_database)
+from stats import percentiles  # noqa: E402
+
+PASSWORD = "load-test-password"
+DEFAULT_MIX = "chat=40,get-reminders=35,add-reminder=20,upload-report=5"
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+CHAT_MESSAGES = [
+    "I have a headache and a mild fever",
+    "Can I take ibuprofen with my warfarin?",
+    "show my reminders",
+    "add aspirin 100mg twice daily at 8:00 am",
+    "How can I improve my sleep quality?",
+    "My throat is sore and I have a dry cough",
+    "What is a healthy resting heart rate?",
+]
+MEDICINES = ['Metformin', 'Lisinopril', 'Atorvastatin', 'Amlodipine', 'Omeprazole',
+             'Levothyroxine', 'Aspirin', 'Ibuprofen', 'Paracetamol', 'Simvastatin']
+
+# Smallest valid PNG; the fake OCR ignores the content
+PLACEHOLDER_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+def histogram(samples: List[float]) -> Dict[str, int]:
+    """Request counts per latency bucket, keyed by upper bound ("le" as in Prometheus)"""
+    counts = Counter()
+    for sample in samples:
+        ms = sample * 1000
+        bucket = next((f"{bound}ms" for bound in BUCKETS_MS if ms <= bound), "+Inf")
+        counts[bucket] += 1
+    return {key: counts[key] for key in [f"{b}ms" for b in BUCKETS_MS] + ["+Inf"] if counts[key]}
+
+
+def render_histogram(name: str, counts: Dict[str, int], width: int = 40) -> str:
+    total = sum(counts.values()) or 1
+    peak = max(counts.values(), default=1)
+    lines = [name]
+    for bucket, count in counts.items():
+        bar = "#" * max(1, round(count / peak * width))
+        lines.append(f"  <= {bucket:>8s} {count:7d} {count / total:6.1%} {bar}")
+    return "\n".join(lines)
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip().lstrip('/')
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class LoadUser:
+    """A logged-in user with a session token"""
+
+    def __init__(self, user_id: int, token: str):
+        self.user_id = user_id
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.counter = itertools.count()
+
+
+async def chat(client: httpx.AsyncClient, user: LoadUser, args) -> httpx.Response:
+    message = CHAT_MESSAGES[next(user.counter) % len(CHAT_MESSAGES)]
+    return await client.post("/chat", json={"message": message, "user_id": user.user_id}, headers=user.headers)
+
+
+async def get_reminders(client: httpx.AsyncClient, user: LoadUser, args) -> httpx.Response:
+    return await client.get("/get-reminders", params={"user_id": user.user_id}, headers=user.headers)
+
+
+async def add_reminder(client: httpx.AsyncClient, user: LoadUser, args) -> httpx.Response:
+    i = next(user.counter)
+    reminder = {
+        "user_id": user.user_id,
+        "medicine_name": MEDICINES[i % len(MEDICINES)],
+        "dosage": "1 tablet",
+        "frequency": "2 times daily",
+        "time": f"{7 + i % 12:02d}:{(i * 5) % 60:02d}",
+    }
+    return await client.post("/add-reminder", json=reminder, headers=user.headers)
+
+
+async def upload_report(client: httpx.AsyncClient, user: LoadUser, args) -> httpx.Response:
+    files = {"file": ("report.png", args.report_bytes, "image/png")}
+    return await client.post("/upload-report", data={"user_id": str(user.user_id)}, files=files,
+                             headers=user.headers)
+
+
+ENDPOINTS = {
+    'chat': chat,
+    'get-reminders': get_reminders,
+    'add-reminder': add_reminder,
+    'upload-report': upload_report,
+}
+
+
+def make_client(args, stack: ExitStack) -> httpx.AsyncClient:
+    if args.url:
+        return httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+
+    # In-process: temporary database and stand-ins for every external service
+    rxnav = stack.enter_context(MockRxNavServer(args.rxnav_latency_ms))
+    configure_environment(rxnav.url)
+    # Logging in the load users is setup, not part of the measurement
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    use_temp_database("http_load_")
+    from app import app
+    args.llm = install_fake_llm(args.llm_latency_ms)
+    install_fake_ocr(args.ocr_latency_ms)
+    disable_crew_agents()
+    args.rxnav = rxnav
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest",
+                             timeout=args.timeout)
+
+
+async def login_users(client: httpx.AsyncClient, count: int) -> List[LoadUser]:
+    users = []
+    for i in range(count):
+        username = f"http_load_{i}"
+        await client.post("/register", json={"username": username, "password": PASSWORD})
+        response = await client.post("/login", json={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+        data = response.json()
+        users.append(LoadUser(data["user"]["id"], data["token"]))
+    # Seed a medication so interaction checks have something to compare against
+    for user in users:
+        await client.post("/add-reminder", headers=user.headers, json={
+            "user_id": user.user_id, "medicine_name": "Warfarin", "dosage": "5mg",
+            "frequency": "Once daily", "time": "20:00"})
+    return users
+
+
+async def run(args) -> Dict:
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    plan = rng.choices(list(mix), weights=list(mix.values()), k=args.requests)
+
+    with ExitStack() as stack:
+        async with make_client(args, stack) as client:
+            users = await login_users(client, args.users)
+            latency = {name: [] for name in mix}
+            statuses = {name: Counter() for name in mix}
+            probe_latency = []
+            work = iter(enumerate(plan))
+            done = asyncio.Event()
+
+            async def worker():
+                for i, name in work:
+                    user = users[i % len(users)]
+                    start = time.perf_counter()
+                    try:
+                        response = await ENDPOINTS[name](client, user, args)
+                        status = str(response.status_code)
+                    except httpx.HTTPError as e:
+                        status = type(e).__name__
+                    latency[name].append(time.perf_counter() - start)
+                    statuses[name][status] += 1
+
+            async def probe():
+                # A blocked event loop shows up as slow responses on a trivial endpoint
+                while not done.is_set():
+                    start = time.perf_counter()
+                    await client.get("/")
+                    probe_latency.append(time.perf_counter() - start)
+                    await asyncio.sleep(0.01)
+
+            probe_task = asyncio.create_task(probe())
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - start
+            done.set()
+            await probe_task
+
+    endpoints = {}
+    all_failed = 0
+    for name in mix:
+        total = sum(statuses[name].values())
+        failed = sum(count for status, count in statuses[name].items() if not status.startswith('2'))
+        all_failed += failed
+        endpoints[name] = {
+            'requests': total,
+            'error_rate': round(failed / total, 4) if total else 0.0,
+            'status_codes': dict(statuses[name]),
+            'latency': percentiles(latency[name]),
+            'histogram': histogram(latency[name]),
+        }
+    all_latency = [sample for samples in latency.values() for sample in samples]
+
+    results = {
+        'target': args.url or 'in-process',
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'users': args.users,
+        'mix': mix,
+        'requests_per_second': round(args.requests / elapsed, 1),
+        'error_rate': round(all_failed / args.requests, 4) if args.requests else 0.0,
+        'latency': percentiles(all_latency),
+        'histogram': histogram(all_latency),
+        'endpoints': endpoints,
+        'event_loop_probe_latency': percentiles(probe_latency),
+    }
+    if not args.url:
+        results['stubs'] = {
+            'llm_latency_ms': args.llm_latency_ms, 'llm_calls': args.llm.calls,
+            'rxnav_latency_ms': args.rxnav_latency_ms, 'rxnav_requests': args.rxnav.requests_served,
+            'ocr_latency_ms': args.ocr_latency_ms,
+        }
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=None, help='Base URL of a running server (default: in-process)')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50, help='Concurrent virtual users (workers)')
+    parser.add_argument('--users', type=int, default=20, help='Accounts the workers log in as')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Endpoint weights, e.g. chat=1,get-reminders=3')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the request order')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--llm-latency-ms', type=float, default=300.0, help='Simulated Groq latency')
+    parser.add_argument('--rxnav-latency-ms', type=float, default=80.0, help='Simulated RxNav latency')
+    parser.add_argument('--ocr-latency-ms', type=float, default=150.0, help='Simulated OCR time')
+    parser.add_argument('--report-image', default=None, help='Image to upload to /upload-report')
+    parser.add_argument('--max-probe-p99-ms', type=float, default=None,
+                        help='Fail if GET / p99 during the run exceeds this (event loop blocking)')
+    parser.add_argument('--max-error-rate', type=float, default=None, help='Fail if the error rate exceeds this')
+    parser.add_argument('--output', default=None, help='Write results JSON to this path')
+    args = parser.parse_args()
+
+    if args.report_image:
+        with open(args.report_image, 'rb') as f:
+            args.report_bytes = f.read()
+    else:
+        args.report_bytes = PLACEHOLDER_PNG
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    print()
+    for name, endpoint in results['endpoints'].items():
+        print(render_histogram(f"{name}  ({endpoint['requests']} requests, "
+                               f"{endpoint['error_rate']:.2%} errors)", endpoint['histogram']))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    probe_p99 = results['event_loop_probe_latency'].get('p99_ms', 0)
+    if args.max_probe_p99_ms is not None and probe_p99 > args.max_probe_p99_ms:
+        failures.append(f"event loop probe p99 {probe_p99}ms > {args.max_probe_p99_ms}ms")
+    if args.max_error_rate is not None and results['error_rate'] > args.max_error_rate:
+        failures.append(f"error rate {results['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    if failures:
+        print("❌ Load test failed: " + "; ".join(failures))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
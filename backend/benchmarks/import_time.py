@@ -0,0 +1,140 @@
+"""
+Import-time regression check for the FastAPI app
+Runs `python -X importtime -c "import app"` and fails if startup pulls in heavy
+dependencies eagerly, builds the lazy singletons or agents, starts the reminder
+scheduler, or exceeds the import-time budget
+
+Usage:
+    python benchmarks/import_time.py [--module app] [--budget 1.5] [--baseline benchmarks/results/import_time.json] [--save]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported on first use, never when the app module loads
+LAZY_MODULES = ['crewai', 'langchain', 'langchain_core', 'langchain_groq', 'groq',
+                'pytesseract', 'PIL', 'apscheduler']
+
+# Agent modules the coordinator imports on first use
+LAZY_AGENTS = ['agents.report_analyzer', 'agents.symptom_checker', 'agents.drug_interaction', 'agents.chatbot']
+
+# Run after importing the module: which lazy singletons, agents and background threads were started
+_PROBE = """
+import json, sys
+import {module}
+from utils.lazy import LazyInstance, is_loaded
+from scheduler import reminder_scheduler
+built = sorted(object.__getattribute__(value, '_lazy_name')
+               for mod in list(sys.modules.values()) for value in list(vars(mod).values())
+               if isinstance(value, LazyInstance) and is_loaded(value))
+print(json.dumps({{
+    'constructed_singletons': sorted(set(built)),
+    'loaded_agents': sorted(name for name in {agents!r} if name in sys.modules),
+    'scheduler_started': reminder_scheduler.scheduler is not None,
+}}))
+"""
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure(module: str) -> Dict:
+    """Import module in a fresh interpreter and parse the -X importtime report"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    cumulative_us = None
+    imported: List[str] = []
+    modules: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        cumulative = int(match.group(2))
+        imported.append(name)
+        modules[name] = cumulative
+        if name == module:
+            cumulative_us = cumulative
+
+    top_level = sorted(
+        ((name, us) for name, us in modules.items() if '.' not in name),
+        key=lambda item: -item[1]
+    )[:15]
+    return {
+        'module': module,
+        'total_seconds': round((cumulative_us or 0) / 1e6, 4),
+        'eager_heavy_modules': sorted({n.split('.')[0] for n in imported if n.split('.')[0] in LAZY_MODULES}),
+        'slowest_top_level': [{'module': n, 'seconds': round(us / 1e6, 4)} for n, us in top_level],
+    }
+
+
+def probe_laziness(module: str) -> Dict:
+    """Import module in a fresh interpreter and report what it built eagerly"""
+    proc = subprocess.run(
+        [sys.executable, '-c', _PROBE.format(module=module, agents=LAZY_AGENTS)],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--budget', type=float, default=float(os.getenv('IMPORT_TIME_BUDGET', '1.5')),
+                        help='Maximum allowed import time in seconds')
+    parser.add_argument('--baseline', default=os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'import_time.json'))
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown relative to the baseline (0.25 = 25%%)')
+    parser.add_argument('--save', action='store_true', help='Write the measurement as the new baseline')
+    args = parser.parse_args()
+
+    result = measure(args.module)
+    result.update(probe_laziness(args.module))
+    print(json.dumps(result, indent=2))
+
+    failures = []
+    if result['eager_heavy_modules']:
+        failures.append(f"heavy modules imported eagerly: {', '.join(result['eager_heavy_modules'])}")
+    if result['constructed_singletons']:
+        failures.append(f"singletons built at import: {', '.join(result['constructed_singletons'])}")
+    if result['loaded_agents']:
+        failures.append(f"agents loaded at import: {', '.join(result['loaded_agents'])}")
+    if result['scheduler_started']:
+        failures.append("reminder scheduler started at import")
+    if result['total_seconds'] > args.budget:
+        failures.append(f"import took {result['total_seconds']}s (budget {args.budget}s)")
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        limit = baseline['total_seconds'] * (1 + args.tolerance)
+        if result['total_seconds'] > limit:
+            failures.append(f"import took {result['total_seconds']}s, baseline {baseline['total_seconds']}s")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    if failures:
+        print("❌ Import-time regression: " + "; ".join(failures))
+        return 1
+    print("✅ Import time within budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
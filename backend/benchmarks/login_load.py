@@ -0,0 +1,124 @@
+"""
+Concurrent login load test
+Fires concurrent /login requests while probing GET / to show that bcrypt work stays off the
+event loop, then measures session-token validation on an authenticated endpoint
+
+Runs in-process against a temporary database by default, or against a live server with --url.
+
+Usage:
+    python benchmarks/login_load.py [--logins 200] [--concurrency 50] [--users 20] [--url http://localhost:8000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx  # noqa: E402
+
+from stats import percentiles  # noqa: E402
+
+PASSWORD = "load-test-password"
+
+
+def make_client(url: str) -> httpx.AsyncClient:
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=60)
+
+    # In-process: point the app's lazy database at a throwaway file
+    from database import Database, db
+    path = os.path.join(tempfile.mkdtemp(prefix="login_load_"), "load.db")
+    object.__setattr__(db, '_lazy_instance', Database(path))
+    from app import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=60)
+
+
+async def run(args) -> Dict:
+    async with make_client(args.url) as client:
+        usernames = [f"loadtest_{i}" for i in range(args.users)]
+        for username in usernames:
+            await client.post("/register", json={"username": username, "password": PASSWORD})
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        login_latency, probe_latency = [], []
+        errors = 0
+        tokens = {}
+        done = asyncio.Event()
+
+        async def login(i: int):
+            nonlocal errors
+            username = usernames[i % len(usernames)]
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/login", json={"username": username, "password": PASSWORD})
+                login_latency.append(time.perf_counter() - start)
+            if response.status_code == 200:
+                data = response.json()
+                tokens[data["user"]["id"]] = data["token"]
+            else:
+                errors += 1
+
+        async def probe():
+            # A blocked event loop shows up as slow responses on a trivial endpoint
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/")
+                probe_latency.append(time.perf_counter() - start)
+                await asyncio.sleep(0.02)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+        # Authenticated requests validate the token from the LRU (no bcrypt, no DB lookup)
+        validate_latency = []
+        for user_id, token in list(tokens.items()) * max(1, args.validations // max(len(tokens), 1)):
+            start = time.perf_counter()
+            response = await client.get("/get-reminders", params={"user_id": user_id},
+                                        headers={"Authorization": f"Bearer {token}"})
+            validate_latency.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    return {
+        'logins': args.logins,
+        'concurrency': args.concurrency,
+        'bcrypt_rounds': int(os.getenv("BCRYPT_ROUNDS", "12")),
+        'logins_per_second': round(args.logins / elapsed, 1),
+        'errors': errors,
+        'login_latency': percentiles(login_latency),
+        'event_loop_probe_latency': percentiles(probe_latency),
+        'authenticated_request_latency': percentiles(validate_latency),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=None, help='Base URL of a running server (default: in-process)')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--validations', type=int, default=500)
+    parser.add_argument('--output', default=None, help='Write results JSON to this path')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
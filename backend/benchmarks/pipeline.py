@@ -0,0 +1,229 @@
+"""
+Agent pipeline benchmark
+Drives CoordinatorAgent.route_request over a corpus of realistic messages with a deterministic
+fake Groq client and a local mock RxNav server, and reports latency percentiles, throughput
+and allocations per agent. Results are JSON so runs on different commits can be compared.
+
+Usage:
+    python benchmarks/pipeline.py [--iterations 200] [--llm-latency-ms 0] [--rxnav-latency-ms 0]
+                                  [--concurrency 8] [--baseline benchmarks/results/pipeline.json] [--save]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fakes import (SAMPLE_REPORT, MockRxNavServer, configure_environment, disable_crew_agents,  # noqa: E402
+                   install_fake_llm, use_temp_database)
+from stats import percentiles  # noqa: E402
+
+USERS = 20
+
+# (message, needs a logged-in user, context extras) per agent
+CORPUS: Dict[str, List[Tuple[str, bool, Dict]]] = {
+    'symptom_checker': [
+        ("I have had a headache and mild fever since yesterday", False, {}),
+        ("My throat is sore and I have a dry cough", False, {}),
+        ("I feel dizzy when I stand up quickly", False, {}),
+        ("Lower back pain after lifting boxes, what should I do?", False, {}),
+        ("I've been feeling tired and nauseous all week", False, {}),
+    ],
+    'drug_interaction': [
+        ("Can I take ibuprofen with my warfarin?", True, {}),
+        ("Can I take aspirin and ibuprofen together?", True, {}),
+        ("Any interaction between simvastatin and amlodipine?", True, {}),
+        ("I was prescribed digoxin, I already take furosemide", True, {}),
+        ("Can I take paracetmol with metformin?", True, {}),
+    ],
+    'reminders': [
+        ("add aspirin 100mg twice daily at 8:00 am", True, {}),
+        ("Create reminder for metformin 500mg, 2 times daily, 9:00", True, {}),
+        ("show my reminders", True, {}),
+        ("Remind me to take lisinopril 10mg once daily at 7:00", True, {}),
+        ("delete aspirin reminder", True, {}),
+    ],
+    'report_analyzer': [
+        ("analyze medical report", True, {'ocr_text': SAMPLE_REPORT}),
+        ("analyze medical report", True, {'ocr_text': SAMPLE_REPORT.replace('11.2', '12.6')}),
+    ],
+    'chatbot': [
+        ("How much water should an adult drink per day?", False, {}),
+        ("What is a healthy resting heart rate?", False, {}),
+        ("How can I improve my sleep quality?", False, {}),
+        ("What vaccines do adults need?", False, {}),
+    ],
+}
+
+
+def requests_for(agent: str, count: int):
+    """Round-robin over an agent's messages, rotating through users"""
+    users = itertools.cycle(range(1, USERS + 1))
+    messages = itertools.cycle(CORPUS[agent])
+    for _ in range(count):
+        message, needs_user, extra = next(messages)
+        context = dict(extra)
+        if needs_user:
+            context['user_id'] = next(users)
+        yield message, context
+
+
+def run_agent(coordinator, agent: str, iterations: int) -> Dict:
+    """Sequential timing pass, then an allocation pass under tracemalloc"""
+    latency = []
+    start = time.perf_counter()
+    for message, context in requests_for(agent, iterations):
+        t0 = time.perf_counter()
+        coordinator.route_request(message, context)
+        latency.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc slows allocation-heavy code, so it gets its own, shorter pass
+    peaks, retained = [], []
+    tracemalloc.start()
+    for message, context in requests_for(agent, max(iterations // 10, len(CORPUS[agent]))):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        coordinator.route_request(message, context)
+        after, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        retained.append(after - before)
+    tracemalloc.stop()
+
+    return {
+        'latency': percentiles(latency, digits=3),
+        'throughput_per_second': round(iterations / elapsed, 1),
+        'allocations': {
+            'peak_kib_mean': round(statistics.mean(peaks) / 1024, 1),
+            'peak_kib_max': round(max(peaks) / 1024, 1),
+            'retained_kib_mean': round(statistics.mean(retained) / 1024, 2),
+        },
+    }
+
+
+def run_mixed(coordinator, iterations: int, concurrency: int) -> Dict:
+    """All agents interleaved across a thread pool, as concurrent /chat requests would be"""
+    work = [item for agent in CORPUS for item in requests_for(agent, iterations)]
+    work.sort(key=lambda item: hash(item[0]) % 997)
+
+    def call(item):
+        t0 = time.perf_counter()
+        coordinator.route_request(*item)
+        return time.perf_counter() - t0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latency = list(pool.map(call, work))
+    elapsed = time.perf_counter() - start
+    return {'concurrency': concurrency, 'latency': percentiles(latency, digits=3),
+            'throughput_per_second': round(len(work) / elapsed, 1)}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """p95 latency regressions beyond tolerance, per agent"""
+    failures = []
+    for agent, current in results['agents'].items():
+        previous = baseline.get('agents', {}).get(agent)
+        if not previous:
+            continue
+        before, after = previous['latency']['p95_ms'], current['latency']['p95_ms']
+        change = (after - before) / before if before else 0.0
+        print(f"  {agent:18s} p95 {before:9.3f}ms -> {after:9.3f}ms ({change:+.0%})")
+        # Sub-millisecond paths are too noisy to gate on
+        if change > tolerance and after - before > 1.0:
+            failures.append(f"{agent} p95 {before}ms -> {after}ms")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200, help='Requests per agent')
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='Simulated Groq latency')
+    parser.add_argument('--rxnav-latency-ms', type=float, default=0.0, help='Simulated RxNav latency')
+    parser.add_argument('--concurrency', type=int, default=8, help='Threads for the mixed run (0 to skip)')
+    parser.add_argument('--agents', default=','.join(CORPUS), help='Comma-separated subset of agents')
+    parser.add_argument('--baseline', default=os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'pipeline.json'))
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed p95 slowdown relative to the baseline (0.25 = 25%%)')
+    parser.add_argument('--save', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--verbose', action='store_true', help="Show the app's debug output")
+    args = parser.parse_args()
+
+    with MockRxNavServer(args.rxnav_latency_ms) as rxnav:
+        configure_environment(rxnav.url)
+        database = use_temp_database("pipeline_bench_")
+        for i in range(USERS):
+            database.register_user(f"bench{i}", "password", f"bench{i}@example.com")
+            database.add_reminder(i + 1, "Warfarin", "5mg", "Once daily", "20:00")
+            database.add_reminder(i + 1, "Lisinopril", "10mg", "Once daily", "08:00")
+
+        from agents.coordinator import coordinator
+        llm = install_fake_llm(args.llm_latency_ms)
+
+        # The agents print debug lines on every request; keep them out of the timings
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        agents = {}
+        with quiet:
+            disable_crew_agents()
+            for agent in args.agents.split(','):
+                for message, context in requests_for(agent, len(CORPUS[agent])):  # warm up
+                    coordinator.route_request(message, context)
+                agents[agent] = run_agent(coordinator, agent, args.iterations)
+            mixed = run_mixed(coordinator, args.iterations // 4, args.concurrency) if args.concurrency else None
+
+        results = {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'iterations': args.iterations,
+            'llm_latency_ms': args.llm_latency_ms,
+            'rxnav_latency_ms': args.rxnav_latency_ms,
+            'agents': agents,
+            'mixed': mixed,
+            'llm_calls': llm.calls,
+            'rxnav_requests': rxnav.requests_served,
+        }
+
+    print(json.dumps(results, indent=2))
+
+    failures = []
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline} (revision {baseline.get('revision')}):")
+        failures = compare(results, baseline, args.tolerance)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    if failures:
+        print("❌ Pipeline regression: " + "; ".join(failures))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Reminder digest check
+Runs scheduler ticks against a temporary database and a local SMTP sink, and asserts that each
+recipient gets one digest for all reminders due in the tick, that re-dispatching the same tick
+(a second tick, or another scheduler instance) sends nothing more, and that with digests off
+every reminder is its own message. Exits 1 if any step fails.
+
+Usage:
+    python benchmarks/reminder_digest.py [--users 20] [--reminders-per-user 4] [--verbose]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from email import message_from_string
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fakes import SMTPSink, configure_environment, use_temp_database  # noqa: E402
+
+MEDICINES = ['Metformin', 'Lisinopril', 'Atorvastatin', 'Amlodipine', 'Omeprazole', 'Levothyroxine']
+
+
+def plain_text(data: str) -> str:
+    """Decoded text/plain body of a raw message"""
+    for part in message_from_string(data).walk():
+        if part.get_content_type() == "text/plain":
+            return part.get_payload(decode=True).decode("utf-8")
+    return ""
+
+
+def seed(users: int, per_user: int) -> int:
+    """Users whose reminders are all due this minute (UTC); the last user has a single reminder"""
+    database = use_temp_database("reminder_digest_")
+    due_at = datetime.now(timezone.utc).strftime("%H:%M")
+    # Due a few hours from now, so never part of this tick
+    later = (datetime.now(timezone.utc) + timedelta(hours=3)).strftime("%H:%M")
+    total = 0
+    for i in range(users):
+        database.register_user(f"digest{i}", "password", f"digest{i}@example.com", timezone="UTC")
+        count = 1 if i == users - 1 else per_user
+        for j in range(count):
+            database.add_reminder(i + 1, MEDICINES[j % len(MEDICINES)], "1 tablet", "Once daily", due_at)
+        database.add_reminder(i + 1, "Aspirin", "100mg", "Once daily", later)
+        total += count
+    # Slots before created_at are never sent; backdate so seeding across a minute boundary can't skip any
+    with sqlite3.connect(database.db_path) as conn:
+        conn.execute("UPDATE reminders SET created_at = datetime('now', '-1 hour')")
+    return total
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--reminders-per-user', type=int, default=4)
+    parser.add_argument('--verbose', action='store_true', help="Show the app's debug output")
+    args = parser.parse_args()
+    failures = []
+
+    def check(name: str, ok: bool, detail: str = "") -> None:
+        print(f"{'✅' if ok else '❌'} {name}{f' ({detail})' if detail else ''}")
+        if not ok:
+            failures.append(name)
+
+    with SMTPSink() as sink:
+        configure_environment()
+        sink.configure()
+        from scheduler import ReminderScheduler
+
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            total = seed(args.users, args.reminders_per_user)
+            engine = ReminderScheduler()
+            engine.digest_enabled = True
+            engine.check_and_send_reminders()
+        per_recipient = Counter(r for message in sink.messages for r in message.recipients)
+        check("one message per recipient", len(sink.messages) == args.users and set(per_recipient.values()) == {1},
+              f"{len(sink.messages)} messages for {args.users} recipients and {total} due reminders")
+        listed = sum(sum(name in plain_text(m.data) for name in MEDICINES) for m in sink.messages)
+        check("messages list every due reminder", listed == total, f"{listed} of {total}")
+
+        sent = len(sink.messages)
+        with quiet:
+            engine.check_and_send_reminders()
+            # Another process re-dispatching the same occurrences, e.g. after a lease handover
+            other = ReminderScheduler()
+            due = other.due_occurrences(datetime.now(timezone.utc) - other.catchup_window,
+                                        datetime.now(timezone.utc))
+            for batch in ([item for item in due if item[0]['email'] == email] for email in per_recipient):
+                other.dispatch_batch(batch)
+        check("no double-send on re-dispatch", len(due) == total and len(sink.messages) == sent,
+              f"{len(due)} occurrences re-dispatched, {len(sink.messages) - sent} extra messages")
+
+        # Digests off: every due reminder is its own message
+        sink.messages.clear()
+        with quiet:
+            total = seed(args.users, args.reminders_per_user)
+            engine = ReminderScheduler()
+            engine.digest_enabled = False
+            engine.check_and_send_reminders()
+        check("one message per reminder with digests off", len(sink.messages) == total,
+              f"{len(sink.messages)} messages for {total} due reminders")
+
+    if failures:
+        print("❌ Reminder digest check failed: " + "; ".join(failures))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""
+Latency summaries shared by the benchmark scripts
+"""
+
+import statistics
+from typing import Dict, List
+
+
+def percentiles(samples: List[float], digits: int = 2) -> Dict:
+    """Count, mean, p50/p95/p99 and max of samples in seconds, reported in milliseconds"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)] * 1000, digits)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.mean(ordered) * 1000, digits),
+        'p50_ms': pct(50), 'p95_ms': pct(95), 'p99_ms': pct(99),
+        'max_ms': round(ordered[-1] * 1000, digits),
+    }
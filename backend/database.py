@@ -1,22 +1,59 @@
+import asyncio
+import contextvars
 import sqlite3
+import threading
+import time as _time
 import bcrypt
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from typing import Optional, List, Dict
 import os
 from dotenv import load_dotenv
+from utils.lazy import LazyInstance
+from utils.metrics import metrics
+from utils.recurrence import compute_slots, get_timezone, utc_minute_of_day
+from utils.tracing import trace_methods
 
 load_dotenv()
 
+# Reminders already read in the current request, keyed by user_id (see reminder_snapshot)
+_reminder_snapshot: ContextVar[Optional[Dict[int, List[Dict]]]] = ContextVar('reminder_snapshot', default=None)
+
+def normalize_medicine_name(name: str) -> str:
+    """Case- and whitespace-insensitive key used to match reminders by medicine name"""
+    return ' '.join((name or '').split()).casefold()
+
+@contextmanager
+def reminder_snapshot():
+    """Scope a request or chat turn so each user's reminders are read at most once until a write"""
+    token = _reminder_snapshot.set({})
+    try:
+        yield
+    finally:
+        _reminder_snapshot.reset(token)
+
+@trace_methods("db", exclude=("init_database",))
 class Database:
     def __init__(self, db_path: str = None):
         # Always use the same database file regardless of working directory
         if db_path is None:
             # Get the directory where this database.py file is located
-            import os
             current_dir = os.path.dirname(os.path.abspath(__file__))
             db_path = os.path.join(current_dir, "healthcare.db")
         
         self.db_path = db_path
+        # bcrypt cost factor; each +1 doubles the work per login
+        self.bcrypt_rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+        # Per-user medication lists; writes invalidate, the TTL bounds staleness from other workers
+        self.reminder_cache_size = int(os.getenv("REMINDER_CACHE_SIZE", "5000"))
+        self.reminder_cache_ttl = float(os.getenv("REMINDER_CACHE_TTL", "30"))
+        self._reminder_cache: "OrderedDict[int, tuple]" = OrderedDict()
+        self._reminder_cache_lock = threading.Lock()
+        # Bumped on every write, so a read that raced an invalidation does not cache stale rows
+        self._reminder_generations: Dict[int, int] = {}
         self.init_database()
     
     def init_database(self):
@@ -24,6 +61,9 @@ class Database:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # WAL lets the async access path read on several threads while the scheduler writes
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         # Users table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -31,9 +71,13 @@ class Database:
                 username TEXT UNIQUE NOT NULL,
                 password_hash TEXT NOT NULL,
                 email TEXT,
+                timezone TEXT,
+                locale TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        self._ensure_column(cursor, 'users', 'timezone', 'TEXT')
+        self._ensure_column(cursor, 'users', 'locale', 'TEXT')
         
         # Reminders table
         cursor.execute('''
@@ -41,6 +85,7 @@ class Database:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
                 medicine_name TEXT NOT NULL,
+                medicine_key TEXT,
                 dosage TEXT,
                 frequency TEXT NOT NULL,
                 time TEXT NOT NULL,
@@ -50,21 +95,130 @@ class Database:
             )
         ''')
         
+        # Normalized medicine name so bulk edits and deletes are one indexed statement
+        self._ensure_column(cursor, 'reminders', 'medicine_key', 'TEXT')
+        cursor.execute("SELECT id, medicine_name FROM reminders WHERE medicine_key IS NULL")
+        cursor.executemany(
+            "UPDATE reminders SET medicine_key = ? WHERE id = ?",
+            [(normalize_medicine_name(name), reminder_id) for reminder_id, name in cursor.fetchall()]
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_reminders_user_medicine ON reminders (user_id, medicine_key, is_active)"
+        )
+        
+        # Precomputed slots per reminder: local minute-of-day plus its UTC minute in the
+        # user's timezone; the scheduler looks up due rows by UTC minute
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reminder_slots (
+                reminder_id INTEGER NOT NULL,
+                minute_of_day INTEGER NOT NULL,
+                utc_minute INTEGER,
+                PRIMARY KEY (reminder_id, minute_of_day),
+                FOREIGN KEY (reminder_id) REFERENCES reminders (id)
+            )
+        ''')
+        self._ensure_column(cursor, 'reminder_slots', 'utc_minute', 'INTEGER')
+        cursor.execute("DROP INDEX IF EXISTS idx_reminder_slots_minute")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_reminder_slots_utc ON reminder_slots (utc_minute)"
+        )
+        
+        # Ledger of reminder sends: one row per (reminder, date, slot) makes dispatch exactly-once
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reminder_dispatch (
+                reminder_id INTEGER NOT NULL,
+                scheduled_date TEXT NOT NULL,
+                slot TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'claimed',
+                claimed_by TEXT,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                claimed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                completed_at TIMESTAMP,
+                PRIMARY KEY (reminder_id, scheduled_date, slot)
+            )
+        ''')
+        
+        # Leases for singleton background jobs (e.g. the reminder scheduler)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scheduler_lease (
+                name TEXT PRIMARY KEY,
+                owner TEXT,
+                expires_at REAL NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        # Per-user medication interaction graph: one node per active medicine, one edge per known interaction
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS medication_graph_nodes (
+                user_id INTEGER NOT NULL,
+                medicine_key TEXT NOT NULL,
+                medicine_name TEXT NOT NULL,
+                rxcui TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, medicine_key)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS medication_graph_edges (
+                user_id INTEGER NOT NULL,
+                key1 TEXT NOT NULL,
+                key2 TEXT NOT NULL,
+                severity TEXT NOT NULL,
+                description TEXT,
+                source TEXT,
+                PRIMARY KEY (user_id, key1, key2)
+            )
+        ''')
+        
+        # Backfill slots for reminders saved before slots were precomputed
+        cursor.execute(
+            """SELECT r.id, r.frequency, r.time, u.timezone
+               FROM reminders r JOIN users u ON r.user_id = u.id
+               WHERE r.is_active = TRUE
+                 AND NOT EXISTS (SELECT 1 FROM reminder_slots s WHERE s.reminder_id = r.id)"""
+        )
+        for reminder_id, frequency, time, tz_name in cursor.fetchall():
+            self._save_slots(cursor, reminder_id, frequency, time, tz_name)
+        
         conn.commit()
         conn.close()
+        
+        # Slots created before per-user timezones have no UTC minute yet
+        self.refresh_utc_slots()
+    
+    def _ensure_column(self, cursor, table: str, column: str, definition: str) -> None:
+        """Add a column to an existing table if an older database does not have it"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    
+    def _save_slots(self, cursor, reminder_id: int, frequency: str, time: str, tz_name: str = None) -> None:
+        """Replace the precomputed schedule slots of a reminder"""
+        tz = get_timezone(tz_name)
+        cursor.execute("DELETE FROM reminder_slots WHERE reminder_id = ?", (reminder_id,))
+        cursor.executemany(
+            "INSERT INTO reminder_slots (reminder_id, minute_of_day, utc_minute) VALUES (?, ?, ?)",
+            [(reminder_id, minute, utc_minute_of_day(minute, tz)) for minute in compute_slots(frequency, time)]
+        )
     
-    def register_user(self, username: str, password: str, email: str = None) -> bool:
+    def _get_user_timezone(self, cursor, user_id: int) -> Optional[str]:
+        cursor.execute("SELECT timezone FROM users WHERE id = ?", (user_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def register_user(self, username: str, password: str, email: str = None,
+                      timezone: str = None, locale: str = None) -> bool:
         """Register a new user"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             # Hash password
-            password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+            password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.bcrypt_rounds))
             
             cursor.execute(
-                "INSERT INTO users (username, password_hash, email) VALUES (?, ?, ?)",
-                (username, password_hash, email)
+                "INSERT INTO users (username, password_hash, email, timezone, locale) VALUES (?, ?, ?, ?, ?)",
+                (username, password_hash, email, timezone, locale)
             )
             
             conn.commit()
@@ -79,21 +233,67 @@ class Database:
         cursor = conn.cursor()
         
         cursor.execute(
-            "SELECT id, username, password_hash, email FROM users WHERE username = ?",
+            "SELECT id, username, password_hash, email, timezone FROM users WHERE username = ?",
             (username,)
         )
         
         user = cursor.fetchone()
-        conn.close()
         
         if user and bcrypt.checkpw(password.encode('utf-8'), user[2]):
+            # Re-hash with the configured cost so changing BCRYPT_ROUNDS applies to existing users
+            if self._hash_rounds(user[2]) != self.bcrypt_rounds:
+                cursor.execute(
+                    "UPDATE users SET password_hash = ? WHERE id = ?",
+                    (bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.bcrypt_rounds)), user[0])
+                )
+                conn.commit()
+            conn.close()
             return {
                 "id": user[0],
                 "username": user[1],
-                "email": user[3]
+                "email": user[3],
+                "timezone": user[4]
             }
+        conn.close()
         return None
     
+    def _hash_rounds(self, password_hash) -> Optional[int]:
+        """Read the cost factor from a '$2b$12$...' bcrypt hash"""
+        try:
+            value = password_hash.decode('ascii') if isinstance(password_hash, bytes) else password_hash
+            return int(value.split('$')[2])
+        except (ValueError, IndexError, UnicodeDecodeError):
+            return None
+    
+    def set_user_timezone(self, user_id: int, timezone: str) -> bool:
+        """Change a user's timezone and recompute the UTC minutes of their reminder slots"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("UPDATE users SET timezone = ? WHERE id = ?", (timezone, user_id))
+            updated = cursor.rowcount > 0
+            if updated:
+                tz = get_timezone(timezone)
+                cursor.execute(
+                    """SELECT s.reminder_id, s.minute_of_day FROM reminder_slots s
+                       JOIN reminders r ON r.id = s.reminder_id
+                       WHERE r.user_id = ?""",
+                    (user_id,)
+                )
+                cursor.executemany(
+                    "UPDATE reminder_slots SET utc_minute = ? WHERE reminder_id = ? AND minute_of_day = ?",
+                    [(utc_minute_of_day(minute, tz), reminder_id, minute)
+                     for reminder_id, minute in cursor.fetchall()]
+                )
+            
+            conn.commit()
+            conn.close()
+            return updated
+        except Exception as e:
+            print(f"Error updating timezone: {e}")
+            return False
+    
     def add_reminder(self, user_id: int, medicine_name: str, dosage: str, 
                     frequency: str, time: str) -> bool:
         """Add a new reminder for user"""
@@ -102,20 +302,104 @@ class Database:
             cursor = conn.cursor()
             
             cursor.execute(
-                """INSERT INTO reminders (user_id, medicine_name, dosage, frequency, time) 
-                   VALUES (?, ?, ?, ?, ?)""",
-                (user_id, medicine_name, dosage, frequency, time)
+                """INSERT INTO reminders (user_id, medicine_name, medicine_key, dosage, frequency, time) 
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (user_id, medicine_name, normalize_medicine_name(medicine_name), dosage, frequency, time)
             )
+            self._save_slots(cursor, cursor.lastrowid, frequency, time,
+                             self._get_user_timezone(cursor, user_id))
             
             conn.commit()
             conn.close()
+            self._invalidate_reminders(user_id)
             return True
         except Exception as e:
             print(f"Error adding reminder: {e}")
             return False
     
-    def get_user_reminders(self, user_id: int) -> List[Dict]:
-        """Get all active reminders for a user"""
+    def add_reminders_bulk(self, user_id: int, reminders: List[Dict]) -> List[int]:
+        """Insert many reminders in one transaction; returns their ids in input order"""
+        if not reminders:
+            return []
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            tz = get_timezone(self._get_user_timezone(cursor, user_id))
+            
+            cursor.executemany(
+                """INSERT INTO reminders (user_id, medicine_name, medicine_key, dosage, frequency, time) 
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                [(user_id, r['medicine_name'], normalize_medicine_name(r['medicine_name']),
+                  r['dosage'], r['frequency'], r['time']) for r in reminders]
+            )
+            # The transaction holds the write lock, so the new rows are this user's newest ids
+            cursor.execute(
+                "SELECT id FROM reminders WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                (user_id, len(reminders))
+            )
+            ids = [row[0] for row in reversed(cursor.fetchall())]
+            
+            cursor.executemany(
+                "INSERT INTO reminder_slots (reminder_id, minute_of_day, utc_minute) VALUES (?, ?, ?)",
+                [(reminder_id, minute, utc_minute_of_day(minute, tz))
+                 for reminder_id, r in zip(ids, reminders)
+                 for minute in compute_slots(r['frequency'], r['time'])]
+            )
+            
+            conn.commit()
+        finally:
+            conn.close()
+        self._invalidate_reminders(user_id)
+        return ids
+    
+    def _invalidate_reminders(self, user_id: int) -> None:
+        """Drop cached and request-snapshot reminders for a user after a write"""
+        with self._reminder_cache_lock:
+            self._reminder_cache.pop(user_id, None)
+            self._reminder_generations[user_id] = self._reminder_generations.get(user_id, 0) + 1
+        snapshot = _reminder_snapshot.get()
+        if snapshot is not None:
+            snapshot.pop(user_id, None)
+    
+    def get_user_reminders(self, user_id: int, fresh: bool = False) -> List[Dict]:
+        """
+        Get all active reminders for a user (cached until the user's next write)
+        
+        fresh=True skips the cache for reads that must see other workers' writes, such as
+        interaction checks; the cache is per process and only expires after reminder_cache_ttl
+        """
+        snapshot = _reminder_snapshot.get()
+        if snapshot is not None and user_id in snapshot and not fresh:
+            metrics.inc("reminder_cache_total", result="snapshot")
+            return [dict(r) for r in snapshot[user_id]]
+        
+        with self._reminder_cache_lock:
+            entry = None if fresh else self._reminder_cache.get(user_id)
+            if entry is not None and entry[0] > _time.monotonic():
+                self._reminder_cache.move_to_end(user_id)
+                reminders = entry[1]
+            else:
+                reminders = None
+            generation = self._reminder_generations.get(user_id, 0)
+        
+        if reminders is None:
+            metrics.inc("reminder_cache_total", result="bypass" if fresh else "miss")
+            reminders = self._query_user_reminders(user_id)
+            with self._reminder_cache_lock:
+                # An invalidation landed while querying; the rows may predate that write
+                if self._reminder_generations.get(user_id, 0) == generation:
+                    self._reminder_cache[user_id] = (_time.monotonic() + self.reminder_cache_ttl, reminders)
+                    if len(self._reminder_cache) > self.reminder_cache_size:
+                        self._reminder_cache.popitem(last=False)
+        else:
+            metrics.inc("reminder_cache_total", result="hit")
+        
+        if snapshot is not None:
+            snapshot[user_id] = reminders
+        # Callers get copies so the cached dicts are never mutated
+        return [dict(r) for r in reminders]
+    
+    def _query_user_reminders(self, user_id: int) -> List[Dict]:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -151,14 +435,192 @@ class Database:
                 "UPDATE reminders SET is_active = FALSE WHERE id = ? AND user_id = ?",
                 (reminder_id, user_id)
             )
+            deleted = cursor.rowcount > 0
+            if deleted:
+                cursor.execute("DELETE FROM reminder_slots WHERE reminder_id = ?", (reminder_id,))
+                self._prune_medication_graph(cursor, user_id)
             
             conn.commit()
             conn.close()
-            return cursor.rowcount > 0
+            self._invalidate_reminders(user_id)
+            return deleted
         except Exception as e:
             print(f"Error deleting reminder: {e}")
             return False
     
+    def update_reminder(self, reminder_id: int, user_id: int, field: str, value: str) -> bool:
+        """Update one field of a reminder; time and frequency changes recompute its slots"""
+        if field not in ('time', 'dosage', 'frequency'):
+            return False
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                f"UPDATE reminders SET {field} = ? WHERE id = ? AND user_id = ? AND is_active = TRUE",
+                (value, reminder_id, user_id)
+            )
+            updated = cursor.rowcount > 0
+            if updated and field in ('time', 'frequency'):
+                cursor.execute("SELECT frequency, time FROM reminders WHERE id = ?", (reminder_id,))
+                frequency, time = cursor.fetchone()
+                self._save_slots(cursor, reminder_id, frequency, time,
+                                 self._get_user_timezone(cursor, user_id))
+            
+            conn.commit()
+            conn.close()
+            self._invalidate_reminders(user_id)
+            return updated
+        except Exception as e:
+            print(f"Error updating reminder: {e}")
+            return False
+    
+    def delete_reminders_by_medicine(self, user_id: int, medicine_name: str) -> int:
+        """Soft-delete all of a user's active reminders for a medicine in one transaction; returns rows affected"""
+        key = normalize_medicine_name(medicine_name)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """DELETE FROM reminder_slots WHERE reminder_id IN (
+                       SELECT id FROM reminders
+                       WHERE user_id = ? AND medicine_key = ? AND is_active = TRUE)""",
+                (user_id, key)
+            )
+            cursor.execute(
+                "UPDATE reminders SET is_active = FALSE WHERE user_id = ? AND medicine_key = ? AND is_active = TRUE",
+                (user_id, key)
+            )
+            affected = cursor.rowcount
+            if affected:
+                self._prune_medication_graph(cursor, user_id)
+            conn.commit()
+        finally:
+            conn.close()
+        
+        if affected:
+            self._invalidate_reminders(user_id)
+        return affected
+    
+    def update_reminders_by_medicine(self, user_id: int, medicine_name: str,
+                                     field: str, value: str) -> Dict:
+        """
+        Set one field on all of a user's active reminders for a medicine in one transaction
+        
+        Returns {'affected': rows updated, 'old_value': previous value of the field (first match)};
+        an unsupported field updates nothing, as with update_reminder
+        """
+        if field not in ('time', 'dosage', 'frequency'):
+            return {'affected': 0, 'old_value': None}
+        
+        key = normalize_medicine_name(medicine_name)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""SELECT {field} FROM reminders
+                    WHERE user_id = ? AND medicine_key = ? AND is_active = TRUE
+                    ORDER BY id LIMIT 1""",
+                (user_id, key)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return {'affected': 0, 'old_value': None}
+            
+            cursor.execute(
+                f"UPDATE reminders SET {field} = ? WHERE user_id = ? AND medicine_key = ? AND is_active = TRUE",
+                (value, user_id, key)
+            )
+            affected = cursor.rowcount
+            
+            if field in ('time', 'frequency'):
+                tz_name = self._get_user_timezone(cursor, user_id)
+                cursor.execute(
+                    """SELECT id, frequency, time FROM reminders
+                       WHERE user_id = ? AND medicine_key = ? AND is_active = TRUE""",
+                    (user_id, key)
+                )
+                for reminder_id, frequency, time in cursor.fetchall():
+                    self._save_slots(cursor, reminder_id, frequency, time, tz_name)
+            
+            conn.commit()
+        finally:
+            conn.close()
+        
+        self._invalidate_reminders(user_id)
+        return {'affected': affected, 'old_value': row[0]}
+    
+    def get_medication_graph(self, user_id: int) -> Dict:
+        """Nodes and edges of a user's interaction graph"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT medicine_key, medicine_name, rxcui FROM medication_graph_nodes WHERE user_id = ? ORDER BY created_at, medicine_key",
+                (user_id,)
+            )
+            nodes = [{'medicine_key': row[0], 'medicine_name': row[1], 'rxcui': row[2]} for row in cursor.fetchall()]
+            cursor.execute(
+                "SELECT key1, key2, severity, description, source FROM medication_graph_edges WHERE user_id = ?",
+                (user_id,)
+            )
+            edges = [{'key1': row[0], 'key2': row[1], 'severity': row[2], 'description': row[3], 'source': row[4]}
+                     for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        return {'nodes': nodes, 'edges': edges}
+    
+    def add_medication_graph_node(self, user_id: int, medicine_name: str, rxcui: Optional[str],
+                                  edges: List[Dict]) -> bool:
+        """Add a medicine and its interactions with the user's existing nodes; False if it is already a node"""
+        key = normalize_medicine_name(medicine_name)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT OR IGNORE INTO medication_graph_nodes (user_id, medicine_key, medicine_name, rxcui) VALUES (?, ?, ?, ?)",
+                (user_id, key, medicine_name, rxcui)
+            )
+            added = cursor.rowcount > 0
+            if added:
+                # Edges are stored once, ordered by key, and only to nodes that still exist
+                cursor.executemany(
+                    """INSERT OR REPLACE INTO medication_graph_edges (user_id, key1, key2, severity, description, source)
+                       SELECT ?, ?, ?, ?, ?, ? WHERE EXISTS (
+                           SELECT 1 FROM medication_graph_nodes WHERE user_id = ? AND medicine_key = ?)""",
+                    [(user_id, *sorted((key, edge['other_key'])), edge['severity'], edge['description'],
+                      edge['source'], user_id, edge['other_key'])
+                     for edge in edges if edge['other_key'] != key]
+                )
+            conn.commit()
+        finally:
+            conn.close()
+        return added
+    
+    def _prune_medication_graph(self, cursor, user_id: int) -> None:
+        """Drop graph nodes (and their edges) for medicines with no active reminder left"""
+        cursor.execute(
+            """DELETE FROM medication_graph_nodes WHERE user_id = ? AND medicine_key NOT IN (
+                   SELECT medicine_key FROM reminders WHERE user_id = ? AND is_active = TRUE)""",
+            (user_id, user_id)
+        )
+        if cursor.rowcount:
+            cursor.execute(
+                """DELETE FROM medication_graph_edges WHERE user_id = ? AND (
+                       key1 NOT IN (SELECT medicine_key FROM medication_graph_nodes WHERE user_id = ?)
+                       OR key2 NOT IN (SELECT medicine_key FROM medication_graph_nodes WHERE user_id = ?))""",
+                (user_id, user_id, user_id)
+            )
+    
+    def prune_medication_graph(self, user_id: int) -> None:
+        """Remove nodes for medicines that are no longer active"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self._prune_medication_graph(conn.cursor(), user_id)
+            conn.commit()
+        finally:
+            conn.close()
+    
     def get_all_active_reminders(self) -> List[Dict]:
         """Get all active reminders for email scheduling"""
         conn = sqlite3.connect(self.db_path)
@@ -166,7 +628,7 @@ class Database:
         
         cursor.execute(
             """SELECT r.id, r.medicine_name, r.dosage, r.frequency, r.time,
-                      u.username, u.email
+                      u.username, u.email, r.created_at
                FROM reminders r
                JOIN users u ON r.user_id = u.id
                WHERE r.is_active = TRUE AND u.email IS NOT NULL"""
@@ -183,10 +645,250 @@ class Database:
                 "frequency": r[3],
                 "time": r[4],
                 "username": r[5],
-                "email": r[6]
+                "email": r[6],
+                "created_at": r[7]
             }
             for r in reminders
         ]
+    
+    def get_due_reminders(self, start_minute: int, end_minute: int) -> List[Dict]:
+        """Get active reminder slots with utc_minute in [start_minute, end_minute] (indexed lookup)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """SELECT r.id, r.medicine_name, r.dosage, r.frequency, r.time,
+                      u.username, u.email, r.created_at, s.minute_of_day, s.utc_minute, u.timezone,
+                      u.locale
+               FROM reminder_slots s
+               JOIN reminders r ON r.id = s.reminder_id
+               JOIN users u ON r.user_id = u.id
+               WHERE s.utc_minute BETWEEN ? AND ?
+                 AND r.is_active = TRUE AND u.email IS NOT NULL""",
+            (start_minute, end_minute)
+        )
+        
+        reminders = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                "id": r[0],
+                "medicine_name": r[1],
+                "dosage": r[2],
+                "frequency": r[3],
+                "time": r[4],
+                "username": r[5],
+                "email": r[6],
+                "created_at": r[7],
+                "minute_of_day": r[8],
+                "utc_minute": r[9],
+                "timezone": r[10],
+                "locale": r[11]
+            }
+            for r in reminders
+        ]
+    
+    def refresh_utc_slots(self) -> int:
+        """
+        Recompute UTC minutes whose offset changed (DST transitions); returns rows updated
+        
+        Work is per distinct (timezone, minute) pair, so it is cheap to run every hour.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """SELECT DISTINCT u.timezone, s.minute_of_day, s.utc_minute
+               FROM reminder_slots s
+               JOIN reminders r ON r.id = s.reminder_id
+               JOIN users u ON r.user_id = u.id
+               WHERE r.is_active = TRUE"""
+        )
+        
+        updated = 0
+        zones = {}
+        for tz_name, minute, current in cursor.fetchall():
+            tz = zones.setdefault(tz_name, get_timezone(tz_name))
+            utc_minute = utc_minute_of_day(minute, tz)
+            if utc_minute == current:
+                continue
+            cursor.execute(
+                """UPDATE reminder_slots SET utc_minute = ?
+                   WHERE minute_of_day = ? AND reminder_id IN (
+                       SELECT r.id FROM reminders r JOIN users u ON r.user_id = u.id
+                       WHERE u.timezone IS ?)""",
+                (utc_minute, minute, tz_name)
+            )
+            updated += cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        return updated
+    
+    def claim_reminder_dispatch(self, reminder_id: int, scheduled_date: str, slot: str,
+                                worker: str, max_attempts: int = 3, lease_seconds: float = 300) -> bool:
+        """Claim one reminder occurrence for sending; only one caller ever wins a claim"""
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                """INSERT OR IGNORE INTO reminder_dispatch (reminder_id, scheduled_date, slot, claimed_by)
+                   VALUES (?, ?, ?, ?)""",
+                (reminder_id, scheduled_date, slot, worker)
+            )
+            claimed = cursor.rowcount > 0
+            
+            if not claimed:
+                # Failed sends may be retried a limited number of times, as may claims whose
+                # worker died before completing them (still 'claimed' after the lease)
+                cursor.execute(
+                    """UPDATE reminder_dispatch
+                       SET status = 'claimed', claimed_by = ?, attempts = attempts + 1,
+                           claimed_at = CURRENT_TIMESTAMP, completed_at = NULL
+                       WHERE reminder_id = ? AND scheduled_date = ? AND slot = ?
+                         AND (status = 'failed'
+                              OR (status = 'claimed' AND claimed_at <= datetime('now', ?)))
+                         AND attempts < ?""",
+                    (worker, reminder_id, scheduled_date, slot, f"-{int(lease_seconds)} seconds", max_attempts)
+                )
+                claimed = cursor.rowcount > 0
+            
+            conn.commit()
+            conn.close()
+            return claimed
+        except Exception as e:
+            print(f"Error claiming reminder dispatch: {e}")
+            return False
+    
+    def complete_reminder_dispatch(self, reminder_id: int, scheduled_date: str, slot: str,
+                                   success: bool) -> None:
+        """Record the outcome of a claimed reminder occurrence"""
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                """UPDATE reminder_dispatch SET status = ?, completed_at = CURRENT_TIMESTAMP
+                   WHERE reminder_id = ? AND scheduled_date = ? AND slot = ?""",
+                ('sent' if success else 'failed', reminder_id, scheduled_date, slot)
+            )
+            
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error completing reminder dispatch: {e}")
+    
+    def prune_reminder_dispatch(self, keep_days: int = 30) -> int:
+        """Delete ledger rows older than keep_days"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "DELETE FROM reminder_dispatch WHERE scheduled_date < date('now', ?)",
+            (f"-{int(keep_days)} days",)
+        )
+        
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """Take or renew a named lease; returns True if owner now holds it"""
+        try:
+            now = datetime.now().timestamp()
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "INSERT OR IGNORE INTO scheduler_lease (name, owner, expires_at) VALUES (?, NULL, 0)",
+                (name,)
+            )
+            # Atomic compare-and-set: only the current owner or anyone after expiry wins
+            cursor.execute(
+                """UPDATE scheduler_lease SET owner = ?, expires_at = ?
+                   WHERE name = ? AND (owner = ? OR owner IS NULL OR expires_at < ?)""",
+                (owner, now + ttl_seconds, name, owner, now)
+            )
+            acquired = cursor.rowcount > 0
+            
+            conn.commit()
+            conn.close()
+            return acquired
+        except Exception as e:
+            print(f"Error acquiring lease {name}: {e}")
+            return False
+    
+    def release_lease(self, name: str, owner: str) -> bool:
+        """Give up a lease held by owner"""
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "UPDATE scheduler_lease SET owner = NULL, expires_at = 0 WHERE name = ? AND owner = ?",
+                (name, owner)
+            )
+            
+            conn.commit()
+            conn.close()
+            return cursor.rowcount > 0
+        except Exception as e:
+            print(f"Error releasing lease {name}: {e}")
+            return False
+    
+    def get_lease(self, name: str) -> Optional[Dict]:
+        """Get the current holder of a lease"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT owner, expires_at FROM scheduler_lease WHERE name = ?",
+            (name,)
+        )
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        if not row or not row[0] or row[1] < datetime.now().timestamp():
+            return None
+        return {
+            "owner": row[0],
+            "expires_at": datetime.fromtimestamp(row[1]).isoformat(timespec='seconds')
+        }
+
+class AsyncDatabase:
+    """
+    Awaitable access to Database for async endpoints
+    
+    Every method of Database is available as a coroutine that runs on a small pool of
+    dedicated DB threads, so disk I/O never blocks the event loop.
+    """
+    
+    def __init__(self, database, max_workers: int = None):
+        self._db = database
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv("DB_THREADS", "4")),
+            thread_name_prefix="db"
+        )
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        
+        async def run(*args, **kwargs):
+            # Resolve on the DB thread too, so the first call's lazy schema setup stays off the loop
+            call = lambda: getattr(self._db, name)(*args, **kwargs)
+            # Carry the request's context (trace span, reminder snapshot) onto the DB thread
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, call)
+        run.__name__ = name
+        return run
+
+# Global database instance (schema is initialized on first use)
+db = LazyInstance(Database, "db")
 
-# Global database instance
-db = Database()
\ No newline at end of file
+# Async access path for FastAPI handlers, e.g. `await async_db.get_user_reminders(user_id)`
+async_db = AsyncDatabase(db)
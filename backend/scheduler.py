@@ -1,14 +1,65 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime, time
+from datetime import datetime, time, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 import atexit
+import os
+import socket
+import uuid
+from dotenv import load_dotenv
 from database import db
 from utils.email_service import email_service
+from utils.metrics import metrics
+from utils.recurrence import format_slot, get_timezone
+
+load_dotenv()
+
+# Scheduler modes:
+#   embedded   - every API worker runs a scheduler; a SQLite lease elects the one that sends
+#   standalone - API workers never send; run `python scheduler.py` as a separate process
+#   disabled   - no reminder engine in this process
+SCHEDULER_MODE = os.getenv("REMINDER_SCHEDULER_MODE", "embedded").lower()
+LEASE_NAME = "reminder_engine"
 
 class ReminderScheduler:
     def __init__(self):
-        self.scheduler = BackgroundScheduler()
-        self.scheduler.start()
+        self.scheduler = None
+        self.mode = SCHEDULER_MODE
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_ttl = float(os.getenv("REMINDER_LEASE_TTL_SECONDS", "90"))
+        self.lease_renew_interval = float(os.getenv("REMINDER_LEASE_RENEW_SECONDS", "30"))
+        self.is_leader = False
+        # Missed slots within this window are sent after downtime or a late tick
+        # (capped below a day so a minute-of-day slot maps to a single date)
+        catchup_minutes = min(int(os.getenv("REMINDER_CATCHUP_MINUTES", "30")), 23 * 60)
+        self.catchup_window = timedelta(minutes=catchup_minutes)
+        self.dispatch_workers = max(1, int(os.getenv("REMINDER_DISPATCH_WORKERS", "1")))
+        self.max_send_attempts = int(os.getenv("REMINDER_MAX_SEND_ATTEMPTS", "3"))
+        # A claim not completed within this long (e.g. the worker crashed mid-send) may be taken again
+        self.claim_lease_seconds = float(os.getenv("REMINDER_CLAIM_LEASE_SECONDS", "300"))
+        self.ledger_retention_days = int(os.getenv("REMINDER_LEDGER_RETENTION_DAYS", "30"))
+        # Send one digest per recipient per tick instead of one email per reminder
+        self.digest_enabled = os.getenv("REMINDER_DIGEST_ENABLED", "true").lower() == "true"
+    
+    def start(self, blocking: bool = False):
+        """Start the scheduler (called from app startup or the standalone entry point)"""
+        if self.scheduler is not None:
+            return
+        
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from apscheduler.schedulers.blocking import BlockingScheduler
+        from apscheduler.triggers.cron import CronTrigger
+        from apscheduler.triggers.interval import IntervalTrigger
+        
+        self.scheduler = BlockingScheduler() if blocking else BackgroundScheduler()
+        
+        # Keep (or try to take) the reminder engine lease
+        self.scheduler.add_job(
+            func=self.renew_leadership,
+            trigger=IntervalTrigger(seconds=self.lease_renew_interval),
+            id='reminder_lease',
+            name='Renew reminder engine lease',
+            replace_existing=True,
+            next_run_time=datetime.now()
+        )
         
         # Schedule reminder checks every minute
         self.scheduler.add_job(
@@ -16,66 +67,217 @@ class ReminderScheduler:
             trigger=CronTrigger(second=0),  # Run every minute at 0 seconds
             id='reminder_checker',
             name='Check and send medication reminders',
+            replace_existing=True,
+            # Overlapping or missed runs collapse into one; the catch-up window covers the gap
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=30
+        )
+        
+        # Recompute UTC slot minutes ahead of DST transitions, off the per-minute path
+        self.scheduler.add_job(
+            func=self.refresh_timezone_slots,
+            trigger=CronTrigger(minute=5),
+            id='reminder_tz_refresh',
+            name='Refresh reminder UTC slots for DST',
             replace_existing=True
         )
         
-        # Ensure scheduler shuts down when app exits
-        atexit.register(lambda: self.scheduler.shutdown())
+        # Keep the dispatch ledger from growing without bound
+        self.scheduler.add_job(
+            func=self.prune_dispatch_ledger,
+            trigger=CronTrigger(hour=3, minute=30),
+            id='reminder_ledger_prune',
+            name='Prune reminder dispatch ledger',
+            replace_existing=True
+        )
+        
+        # Ensure scheduler shuts down and hands over the lease when the process exits
+        atexit.register(self.shutdown)
+        
+        print(f"Reminder scheduler started ({self.mode} mode, owner {self.owner_id})")
+        self.scheduler.start()
     
+    def shutdown(self):
+        """Stop the scheduler and release the lease so another process can take over"""
+        if self.scheduler is not None and self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        if self.is_leader:
+            db.release_lease(LEASE_NAME, self.owner_id)
+            self.is_leader = False
+    
+    def renew_leadership(self) -> bool:
+        """Acquire or renew the lease; exactly one process holds it at a time"""
+        was_leader = self.is_leader
+        self.is_leader = db.acquire_lease(LEASE_NAME, self.owner_id, self.lease_ttl)
+        if self.is_leader != was_leader:
+            print(f"Reminder engine leadership {'acquired' if self.is_leader else 'lost'} by {self.owner_id}")
+        return self.is_leader
+    
+    @metrics.timed("scheduler_tick_duration_seconds")
     def check_and_send_reminders(self):
         """Check for due reminders and send emails"""
+        # Only the lease holder sends, so N workers never send duplicates
+        if not self.renew_leadership():
+            return
+        
         try:
-            current_time = datetime.now().strftime("%H:%M")
-            current_day = datetime.now().strftime("%A").lower()
+            # The slot index is keyed on UTC minutes, so users in any timezone share one scan
+            now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+            window_start = now - self.catchup_window
             
-            # Get all active reminders
-            reminders = db.get_all_active_reminders()
+            # Slots are precomputed at save time, so each tick only touches due rows
+            due = self.due_occurrences(window_start, now)
+            if not due:
+                return
+            
+            if self.digest_enabled:
+                groups = {}
+                for item in due:
+                    groups.setdefault(item[0]['email'], []).append(item)
+                batches = list(groups.values())
+            else:
+                batches = [[item] for item in due]
             
-            for reminder in reminders:
-                if self.should_send_reminder(reminder, current_time, current_day):
-                    self.send_reminder_email(reminder)
+            # Claims in the dispatch ledger make sends exactly-once, so workers can share the load
+            if self.dispatch_workers > 1 and len(batches) > 1:
+                with ThreadPoolExecutor(max_workers=self.dispatch_workers) as pool:
+                    list(pool.map(self.dispatch_batch, batches))
+            else:
+                for batch in batches:
+                    self.dispatch_batch(batch)
                     
         except Exception as e:
             print(f"Error in reminder scheduler: {e}")
     
-    def should_send_reminder(self, reminder, current_time, current_day):
-        """Determine if a reminder should be sent now"""
-        reminder_time = reminder['time']
-        frequency = reminder['frequency'].lower()
+    def due_occurrences(self, window_start, now):
+        """Return (reminder, scheduled_date, slot) for every slot in [window_start, now] (UTC)
         
-        # Check if current time matches reminder time (within 1 minute)
-        if reminder_time != current_time:
+        scheduled_date and slot are in the user's local time, so the ledger key stays stable
+        when UTC minutes are recomputed across DST transitions
+        """
+        due = []
+        day = window_start.date()
+        while day <= now.date():
+            start_minute = 0 if day > window_start.date() else window_start.hour * 60 + window_start.minute
+            end_minute = 24 * 60 - 1 if day < now.date() else now.hour * 60 + now.minute
+            
+            for reminder in db.get_due_reminders(start_minute, end_minute):
+                scheduled = datetime.combine(day, time(), tzinfo=timezone.utc) + timedelta(minutes=reminder['utc_minute'])
+                created_at = self._parse_created_at(reminder.get('created_at'))
+                # Never back-fill slots from before the reminder existed
+                if created_at is not None and scheduled < created_at:
+                    continue
+                local_date = scheduled.astimezone(get_timezone(reminder.get('timezone'))).date()
+                reminder['slot'] = format_slot(reminder['minute_of_day'])
+                due.append((reminder, local_date.isoformat(), reminder['slot']))
+            day += timedelta(days=1)
+        return due
+    
+    def _parse_created_at(self, value):
+        """created_at is stored by SQLite in UTC; truncate to the minute"""
+        if not value:
+            return None
+        try:
+            created = datetime.fromisoformat(str(value)).replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+        return created.replace(second=0, microsecond=0)
+    
+    def dispatch_batch(self, batch) -> bool:
+        """Claim occurrences for one recipient in the ledger and send them as a single email"""
+        claimed = [
+            (reminder, scheduled_date, slot)
+            for reminder, scheduled_date, slot in batch
+            if db.claim_reminder_dispatch(reminder['id'], scheduled_date, slot,
+                                          self.owner_id, self.max_send_attempts, self.claim_lease_seconds)
+        ]
+        if not claimed:
             return False
         
-        # For simplicity, we'll send daily reminders
-        # In a production system, you'd want more sophisticated frequency handling
-        if frequency in ['once daily', 'twice daily', 'three times daily', 'four times daily']:
-            return True
+        if len(claimed) == 1:
+            success = self.send_reminder_email(claimed[0][0])
+        else:
+            success = self.send_reminder_digest([reminder for reminder, _, _ in claimed])
         
-        return False
+        for reminder, scheduled_date, slot in claimed:
+            db.complete_reminder_dispatch(reminder['id'], scheduled_date, slot, success)
+        return success
     
-    def send_reminder_email(self, reminder):
+    def send_reminder_digest(self, reminders) -> bool:
+        """Send several due reminders for one recipient as a single digest email"""
+        first = reminders[0]
+        try:
+            success = email_service.send_reminder_digest(
+                to_email=first['email'],
+                username=first['username'],
+                reminders=[
+                    {
+                        'medicine_name': r['medicine_name'],
+                        'dosage': r['dosage'],
+                        'time': r.get('slot', r['time'])
+                    }
+                    for r in reminders
+                ],
+                locale=first.get('locale')
+            )
+            
+            if success:
+                print(f"Reminder digest sent to {first['username']} for {len(reminders)} medications")
+            else:
+                print(f"Failed to send reminder digest to {first['username']}")
+            return success
+                
+        except Exception as e:
+            print(f"Error sending reminder digest: {e}")
+            return False
+    
+    def refresh_timezone_slots(self):
+        """Recompute UTC minutes whose timezone offset changed (leader only)"""
+        if not self.is_leader:
+            return
+        try:
+            updated = db.refresh_utc_slots()
+            if updated:
+                print(f"Recomputed {updated} reminder slots for timezone offset changes")
+        except Exception as e:
+            print(f"Error refreshing reminder timezone slots: {e}")
+    
+    def prune_dispatch_ledger(self):
+        """Drop old ledger rows (leader only)"""
+        if not self.is_leader:
+            return
+        try:
+            deleted = db.prune_reminder_dispatch(self.ledger_retention_days)
+            print(f"Pruned {deleted} reminder dispatch records")
+        except Exception as e:
+            print(f"Error pruning reminder dispatch ledger: {e}")
+    
+    def send_reminder_email(self, reminder) -> bool:
         """Send reminder email to user"""
         try:
             if not reminder['email']:
                 print(f"No email address for user {reminder['username']}")
-                return
+                return False
             
             success = email_service.send_reminder_email(
                 to_email=reminder['email'],
                 username=reminder['username'],
                 medicine_name=reminder['medicine_name'],
                 dosage=reminder['dosage'],
-                time=reminder['time']
+                time=reminder.get('slot', reminder['time']),
+                locale=reminder.get('locale')
             )
             
             if success:
                 print(f"Reminder sent to {reminder['username']} for {reminder['medicine_name']}")
             else:
                 print(f"Failed to send reminder to {reminder['username']}")
+            return success
                 
         except Exception as e:
             print(f"Error sending reminder email: {e}")
+            return False
     
     def add_custom_reminder(self, user_id, medicine_name, dosage, frequency, time_str):
         """Add a custom scheduled reminder (for future enhancement)"""
@@ -85,18 +287,43 @@ class ReminderScheduler:
     def remove_reminder_job(self, reminder_id):
         """Remove a specific reminder job (for future enhancement)"""
         job_id = f"reminder_{reminder_id}"
+        if self.scheduler is None:
+            return
         try:
             self.scheduler.remove_job(job_id)
         except:
             pass  # Job might not exist
     
     def get_scheduler_status(self):
-        """Get scheduler status for debugging"""
-        return {
-            'running': self.scheduler.running,
-            'jobs': len(self.scheduler.get_jobs()),
-            'next_run': str(self.scheduler.get_jobs()[0].next_run_time) if self.scheduler.get_jobs() else None
+        """Get scheduler status and reminder engine ownership for debugging"""
+        status = {
+            'mode': self.mode,
+            'owner_id': self.owner_id,
+            'is_leader': self.is_leader,
+            'lease_holder': db.get_lease(LEASE_NAME),
+            'running': False,
+            'jobs': 0,
+            'next_run': None
         }
+        if self.scheduler is not None:
+            jobs = self.scheduler.get_jobs()
+            checker = self.scheduler.get_job('reminder_checker')
+            status.update({
+                'running': self.scheduler.running,
+                'jobs': len(jobs),
+                'next_run': str(checker.next_run_time) if checker else None
+            })
+        return status
 
 # Global scheduler instance
-reminder_scheduler = ReminderScheduler()
\ No newline at end of file
+reminder_scheduler = ReminderScheduler()
+
+if __name__ == "__main__":
+    # Standalone reminder engine: run once alongside API workers started with
+    # REMINDER_SCHEDULER_MODE=standalone
+    print("⏰ Starting standalone reminder engine...")
+    reminder_scheduler.mode = "standalone"
+    try:
+        reminder_scheduler.start(blocking=True)
+    except (KeyboardInterrupt, SystemExit):
+        reminder_scheduler.shutdown()
\ No newline at end of file
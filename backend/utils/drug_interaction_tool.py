@@ -3,10 +3,21 @@ Complete drug interaction system using RxNorm API with local fallback
 This is the ONLY file the agent uses - everything is consolidated here
 """
 
+import os
+import time
 import requests
-from typing import Optional, List, Dict
+from urllib.parse import quote
+from typing import Optional, List, Dict, Tuple
 from langchain_core.tools import tool
 
+from utils.drug_lexicon import drug_lexicon
+from utils.interaction_result import InteractionPair, InteractionResult, InteractionSource, Severity
+from utils.metrics import metrics
+from utils.tracing import tracer
+
+# RxNav REST base URL (overridable to point at a mirror or a local mock)
+RXNORM_API_BASE = os.getenv("RXNORM_API_BASE", "https://rxnav.nlm.nih.gov/REST").rstrip('/')
+
 # Local interaction database for fallback
 LOCAL_INTERACTIONS = {
     'warfarin': {
@@ -28,6 +39,52 @@ LOCAL_INTERACTIONS = {
     }
 }
 
+def _rxnav_get(url: str) -> requests.Response:
+    """GET an RxNav endpoint, timed as a client span and counted per endpoint"""
+    endpoint = url[len(RXNORM_API_BASE) + 1:].split('.json')[0]
+    start = time.perf_counter()
+    status = "error"
+    with tracer.span("rxnav.get", kind="client", **{"http.url": url}) as span:
+        try:
+            response = requests.get(url, timeout=10)
+            status = str(response.status_code)
+            span.set_attribute("http.status_code", response.status_code)
+            return response
+        finally:
+            metrics.inc("rxnav_requests_total", endpoint=endpoint, status=status)
+            metrics.histogram("rxnav_request_duration_seconds", time.perf_counter() - start, endpoint=endpoint)
+
+def _query_interaction(drug1_rxcui: str, drug2_rxcui: str) -> Optional[Tuple[Severity, str]]:
+    """
+    Look up one drug pair in the RxNorm interaction API
+    
+    Returns:
+        (severity, description) if an interaction is listed, otherwise None;
+        raises RuntimeError if the API request fails
+    """
+    url = f"{RXNORM_API_BASE}/interaction/list.json?rxcuis={drug1_rxcui}+{drug2_rxcui}"
+    response = _rxnav_get(url)
+    
+    if response.status_code != 200:
+        raise RuntimeError(f"API request failed with status: {response.status_code}")
+    
+    data = response.json()
+    
+    # Check for fullInteractionTypeGroup (correct structure), then the older structure as fallback
+    for group_key, type_key in (("fullInteractionTypeGroup", "fullInteractionType"),
+                                ("interactionTypeGroup", "interactionType")):
+        if group_key in data and data[group_key]:
+            interaction_group = data[group_key][0]
+            if type_key in interaction_group and interaction_group[type_key]:
+                interaction_type = interaction_group[type_key][0]
+                if "interactionPair" in interaction_type and interaction_type["interactionPair"]:
+                    pair = interaction_type["interactionPair"][0]
+                    description = pair.get("description", "Interaction found but no description available")
+                    return Severity.parse(pair.get("severity", "Unknown")), description
+            break
+    
+    return None
+
 @tool
 def drug_interaction_checker(drug1_rxcui: str, drug2_rxcui: str) -> str:
     """
@@ -41,41 +98,62 @@ def drug_interaction_checker(drug1_rxcui: str, drug2_rxcui: str) -> str:
         String describing the interaction or no interaction found
     """
     try:
-        url = f"https://rxnav.nlm.nih.gov/REST/interaction/list.json?rxcuis={drug1_rxcui}+{drug2_rxcui}"
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Check for fullInteractionTypeGroup (correct structure)
-            if "fullInteractionTypeGroup" in data and data["fullInteractionTypeGroup"]:
-                interaction_group = data["fullInteractionTypeGroup"][0]
-                if "fullInteractionType" in interaction_group and interaction_group["fullInteractionType"]:
-                    interaction_type = interaction_group["fullInteractionType"][0]
-                    if "interactionPair" in interaction_type and interaction_type["interactionPair"]:
-                        pair = interaction_type["interactionPair"][0]
-                        description = pair.get("description", "Interaction found but no description available")
-                        severity = pair.get("severity", "Unknown")
-                        return f"⚠️ Interaction found ({severity}): {description}"
-            
-            # Check for older structure as fallback
-            elif "interactionTypeGroup" in data and data["interactionTypeGroup"]:
-                interaction_group = data["interactionTypeGroup"][0]
-                if "interactionType" in interaction_group and interaction_group["interactionType"]:
-                    interaction_type = interaction_group["interactionType"][0]
-                    if "interactionPair" in interaction_type and interaction_type["interactionPair"]:
-                        pair = interaction_type["interactionPair"][0]
-                        description = pair.get("description", "Interaction found but no description available")
-                        severity = pair.get("severity", "Unknown")
-                        return f"⚠️ Interaction found ({severity}): {description}"
-            
-            return "✅ No known interaction between these drugs."
-        else:
-            return f"❌ API request failed with status: {response.status_code}"
-            
+        found = _query_interaction(drug1_rxcui, drug2_rxcui)
+        if found:
+            severity, description = found
+            return f"⚠️ Interaction found ({severity.value}): {description}"
+        return "✅ No known interaction between these drugs."
+    
+    except RuntimeError as e:
+        return f"❌ {str(e)}"
     except Exception as e:
         return f"❌ Error checking interaction: {str(e)}"
 
+def _query_interactions_among(rxcuis: List[str]) -> List[Tuple[str, str, Severity, str]]:
+    """
+    Look up all listed interactions among a set of drugs in one RxNorm API request
+    
+    Returns:
+        (rxcui1, rxcui2, severity, description) for each interacting pair;
+        raises RuntimeError if the API request fails
+    """
+    url = f"{RXNORM_API_BASE}/interaction/list.json?rxcuis={'+'.join(rxcuis)}"
+    response = _rxnav_get(url)
+    
+    if response.status_code != 200:
+        raise RuntimeError(f"API request failed with status: {response.status_code}")
+    
+    data = response.json()
+    found = []
+    for group in data.get("fullInteractionTypeGroup") or []:
+        for interaction_type in group.get("fullInteractionType") or []:
+            for pair in interaction_type.get("interactionPair") or []:
+                concepts = pair.get("interactionConcept") or []
+                if len(concepts) < 2:
+                    continue
+                rxcui1 = concepts[0].get("minConceptItem", {}).get("rxcui")
+                rxcui2 = concepts[1].get("minConceptItem", {}).get("rxcui")
+                if rxcui1 and rxcui2:
+                    description = pair.get("description", "Interaction found but no description available")
+                    found.append((rxcui1, rxcui2, Severity.parse(pair.get("severity", "Unknown")), description))
+    return found
+
+def _exact_rxcui(name: str) -> Optional[str]:
+    """RxCUI for an exact drug name, or None if RxNorm does not list it"""
+    response = _rxnav_get(f"{RXNORM_API_BASE}/rxcui.json?name={quote(name)}")
+    if response.status_code == 200:
+        rxcuis = response.json().get('idGroup', {}).get('rxnormId')
+        if rxcuis:
+            return rxcuis[0]  # Return first match
+    return None
+
+def is_rxnorm_name(name: str) -> bool:
+    """True if RxNorm resolves the name exactly (False when RxNav is unreachable)"""
+    try:
+        return _exact_rxcui(name) is not None
+    except Exception:
+        return False
+
 @tool
 def drug_rxcui_finder(drug_name: str) -> str:
     """
@@ -88,26 +166,24 @@ def drug_rxcui_finder(drug_name: str) -> str:
         RxCUI string if found, or error message
     """
     try:
-        from urllib.parse import quote
-        
-        # Clean and encode drug name
         clean_name = drug_name.strip()
         encoded_name = quote(clean_name)
         
-        # Try exact match first
-        url = f"https://rxnav.nlm.nih.gov/REST/rxcui.json?name={encoded_name}"
-        response = requests.get(url, timeout=10)
+        # Try exact match first, on the name as given, so a real drug is never swapped for a similar one
+        rxcui = _exact_rxcui(clean_name)
+        if rxcui:
+            return rxcui
         
-        if response.status_code == 200:
-            data = response.json()
-            if 'idGroup' in data and 'rxnormId' in data['idGroup']:
-                rxcuis = data['idGroup']['rxnormId']
-                if rxcuis:
-                    return rxcuis[0]  # Return first match
+        # Then correct a misspelling of a known drug offline
+        corrected = drug_lexicon.correct(clean_name)
+        if corrected and corrected != clean_name.lower():
+            rxcui = _exact_rxcui(corrected)
+            if rxcui:
+                return rxcui
         
-        # If exact match fails, try approximate match
-        url = f"https://rxnav.nlm.nih.gov/REST/approximateTerm.json?term={encoded_name}"
-        response = requests.get(url, timeout=10)
+        # If both fail, try approximate match (names the local lexicon could not resolve)
+        url = f"{RXNORM_API_BASE}/approximateTerm.json?term={encoded_name}"
+        response = _rxnav_get(url)
         
         if response.status_code == 200:
             data = response.json()
@@ -154,16 +230,17 @@ def multi_drug_interaction_checker(drug_rxcuis: str) -> str:
             
     except Exception as e:
         return f"❌ Error checking multiple drug interactions: {str(e)}"
-def check_all_drug_interactions(new_drugs: List[str], current_medications: List[str] = None) -> str:
+
+def find_drug_interactions(new_drugs: List[str], current_medications: List[str] = None) -> InteractionResult:
     """
-    Complete drug interaction checking function - this is what the agent should use
+    Check new drugs against current medications and against each other
     
     Args:
         new_drugs: List of new drug names to check
         current_medications: List of current medications (optional)
     
     Returns:
-        Formatted string with all interaction results
+        InteractionResult with the interacting pairs, their severity and source
     """
     if current_medications is None:
         current_medications = []
@@ -180,142 +257,129 @@ def check_all_drug_interactions(new_drugs: List[str], current_medications: List[
         all_drugs = new_drugs + current_medications
         for drug in all_drugs:
             rxcui = drug_rxcui_finder.invoke(drug)
-            if isinstance(rxcui, str) and not rxcui.startswith('❌'):
+            if isinstance(rxcui, str) and rxcui and not rxcui.startswith('❌'):
                 drug_rxcuis[drug] = rxcui
                 api_working = True
                 print(f"✅ Found RxCUI for {drug}: {rxcui}")
             else:
                 print(f"❌ Could not find RxCUI for {drug}")
         
-        # Step 2: Check interactions using RxNorm API
+        # Step 2: Check interactions using RxNorm API, in one request over every resolved drug
         if api_working:
-            # Check new drugs vs current medications
-            for new_drug in new_drugs:
-                if new_drug in drug_rxcuis:
-                    for current_drug in current_medications:
-                        if current_drug in drug_rxcuis:
-                            result = drug_interaction_checker.invoke(drug_rxcuis[new_drug], drug_rxcuis[current_drug])
-                            if isinstance(result, str) and "⚠️ Interaction found" in result:
-                                interactions_found.append({
-                                    'drug1': new_drug,
-                                    'drug2': current_drug,
-                                    'result': result,
-                                    'source': 'RxNorm API'
-                                })
+            listed = {}
+            rxcuis = list(dict.fromkeys(drug_rxcuis.values()))
+            if len(rxcuis) > 1:
+                try:
+                    for rxcui1, rxcui2, severity, description in _query_interactions_among(rxcuis):
+                        listed.setdefault(frozenset((rxcui1, rxcui2)), (severity, description))
+                except Exception as e:
+                    print(f"❌ Error checking interactions among {len(rxcuis)} drugs: {e}")
             
-            # Check new drugs vs new drugs
-            for i, drug1 in enumerate(new_drugs):
-                if drug1 in drug_rxcuis:
-                    for drug2 in new_drugs[i+1:]:
-                        if drug2 in drug_rxcuis:
-                            result = drug_interaction_checker.invoke(drug_rxcuis[drug1], drug_rxcuis[drug2])
-                            if isinstance(result, str) and "⚠️ Interaction found" in result:
-                                interactions_found.append({
-                                    'drug1': drug1,
-                                    'drug2': drug2,
-                                    'result': result,
-                                    'source': 'RxNorm API'
-                                })
+            # The response also covers current x current; keep only the pairs being checked
+            for drug1, drug2 in _pairs_to_check(new_drugs, current_medications):
+                if drug1 in drug_rxcuis and drug2 in drug_rxcuis:
+                    found = listed.get(frozenset((drug_rxcuis[drug1], drug_rxcuis[drug2])))
+                    if found:
+                        severity, description = found
+                        interactions_found.append(
+                            InteractionPair(drug1, drug2, severity, description, InteractionSource.RXNORM)
+                        )
         
         # Step 3: If no API results, use local database
         if not interactions_found:
             print("No RxNorm API interactions found, checking local database...")
             interactions_found = _check_local_interactions(new_drugs, current_medications)
         
-        # Step 4: Format response
-        return _format_interaction_response(new_drugs, current_medications, interactions_found, api_working)
-        
+        return InteractionResult(new_drugs, current_medications, interactions_found, api_working,
+                                 {drug: drug_rxcuis[drug] for drug in new_drugs if drug in drug_rxcuis})
+    
     except Exception as e:
         print(f"Error in comprehensive drug checking: {e}")
         # Fallback to local database only
-        interactions_found = _check_local_interactions(new_drugs, current_medications)
         print("Falling back to local database only.")
-        return _format_interaction_response(new_drugs, current_medications, interactions_found, False)
+        return InteractionResult(new_drugs, current_medications,
+                                 _check_local_interactions(new_drugs, current_medications), False)
 
-def _check_local_interactions(new_drugs: List[str], current_medications: List[str]) -> List[Dict]:
-    """Check interactions using local database"""
-    interactions_found = []
-    
-    # Check new drugs vs current medications
-    for new_drug in new_drugs:
-        new_drug_lower = new_drug.lower()
-        if new_drug_lower in LOCAL_INTERACTIONS:
-            for current_drug in current_medications:
-                current_drug_lower = current_drug.lower()
-                if current_drug_lower in LOCAL_INTERACTIONS[new_drug_lower]:
-                    interaction = LOCAL_INTERACTIONS[new_drug_lower][current_drug_lower]
-                    interactions_found.append({
-                        'drug1': new_drug,
-                        'drug2': current_drug,
-                        'result': f"⚠️ Interaction found ({interaction['severity']}): {interaction['description']}",
-                        'source': 'Local Database'
-                    })
+def check_all_drug_interactions(new_drugs: List[str], current_medications: List[str] = None) -> str:
+    """
+    Complete drug interaction checking function - this is what the agent should use
     
-    # Check new drugs vs new drugs
-    for i, drug1 in enumerate(new_drugs):
-        drug1_lower = drug1.lower()
-        if drug1_lower in LOCAL_INTERACTIONS:
-            for drug2 in new_drugs[i+1:]:
-                drug2_lower = drug2.lower()
-                if drug2_lower in LOCAL_INTERACTIONS[drug1_lower]:
-                    interaction = LOCAL_INTERACTIONS[drug1_lower][drug2_lower]
-                    interactions_found.append({
-                        'drug1': drug1,
-                        'drug2': drug2,
-                        'result': f"⚠️ Interaction found ({interaction['severity']}): {interaction['description']}",
-                        'source': 'Local Database'
-                    })
+    Args:
+        new_drugs: List of new drug names to check
+        current_medications: List of current medications (optional)
     
-    return interactions_found
+    Returns:
+        Formatted string with all interaction results
+    """
+    return find_drug_interactions(new_drugs, current_medications).to_markdown()
 
-def _format_interaction_response(new_drugs: List[str], current_medications: List[str], interactions_found: List[Dict], api_working: bool) -> str:
-    """Format the final response"""
+def find_interactions_with_regimen(new_drug: str, regimen: Dict[str, Optional[str]]) -> InteractionResult:
+    """
+    Check one new drug against medications whose RxCUIs are already known
     
-    source = "RxNorm API" if api_working else "Local Database"
+    Only the new drug is resolved, and its interactions with the whole regimen come back
+    from a single RxNorm API request
     
-    response_parts = [f"💊 **Drug Interaction Check ({source})**\n"]
+    Args:
+        new_drug: Name of the new drug
+        regimen: Current medication name -> RxCUI (None if it could not be resolved)
     
-    # Medications being checked
-    response_parts.append("**Medications Checked:**")
-    response_parts.append(f"- New: {', '.join([d.title() for d in new_drugs])}")
-    if current_medications:
-        response_parts.append(f"- Current: {', '.join([d.title() for d in current_medications])}")
-    else:
-        response_parts.append("- Current: None")
-    response_parts.append("")
+    Returns:
+        InteractionResult, with the new drug's RxCUI in rxcuis if it was resolved
+    """
+    current_medications = list(regimen)
+    rxcui = None
+    interactions_found = []
     
-    # Interactions found
-    if interactions_found:
-        response_parts.append("**⚠️ Interactions Detected:**")
-        for interaction in interactions_found:
-            drug1 = interaction['drug1'].title()
-            drug2 = interaction['drug2'].title()
-            result = interaction['result']
-            
-            # Extract severity and description
-            if "High" in result:
-                emoji = "🔴"
-            elif "Medium" in result:
-                emoji = "🟡"
-            else:
-                emoji = "🟠"
-            
-            response_parts.append(f"{emoji} **{drug1} + {drug2}**")
-            response_parts.append(f"   {result}")
-        response_parts.append("")
-    else:
-        response_parts.append("✅ **No Major Interactions Found**")
-        response_parts.append(f"Based on {source} analysis.\n")
+    try:
+        found = drug_rxcui_finder.invoke(new_drug)
+        if isinstance(found, str) and found and not found.startswith('❌'):
+            rxcui = found
+        
+        known: Dict[str, List[str]] = {}
+        for name, cui in regimen.items():
+            if cui:
+                known.setdefault(cui, []).append(name)
+        # Regimen RxCUIs come from the interaction graph; only the new drug is resolved through RxNav
+        metrics.inc("rxcui_cache_total", sum(len(names) for names in known.values()), result="hit")
+        metrics.inc("rxcui_cache_total", result="miss")
+        
+        if rxcui and known:
+            for rxcui1, rxcui2, severity, description in _query_interactions_among([rxcui] + list(known)):
+                if rxcui not in (rxcui1, rxcui2):
+                    continue
+                other = rxcui2 if rxcui1 == rxcui else rxcui1
+                for name in known.get(other, []):
+                    interactions_found.append(
+                        InteractionPair(new_drug, name, severity, description, InteractionSource.RXNORM)
+                    )
+    except Exception as e:
+        print(f"Error checking {new_drug} against regimen: {e}")
     
-    # Safety footer
-    response_parts.extend([
-        "**Important Notes:**",
-        f"- This check uses the {'NIH RxNorm database' if api_working else 'local drug database'}",
-        "- Always consult your pharmacist or doctor",
-        "- Report any unusual side effects immediately",
-        "- Keep all healthcare providers informed of your medications",
-        "",
-        f"**Source:** {'National Library of Medicine RxNorm API' if api_working else 'Local Drug Database'}"
-    ])
+    # If no API results, use local database
+    if not interactions_found:
+        interactions_found = _check_local_interactions([new_drug], current_medications)
     
-    return "\n".join(response_parts)
\ No newline at end of file
+    api_working = rxcui is not None or any(regimen.values())
+    return InteractionResult([new_drug], current_medications, interactions_found, api_working,
+                             {new_drug: rxcui} if rxcui else {})
+
+def _pairs_to_check(new_drugs: List[str], current_medications: List[str]) -> List[Tuple[str, str]]:
+    """New drugs vs current medications, then new drugs vs each other"""
+    pairs = [(new_drug, current_drug) for new_drug in new_drugs for current_drug in current_medications]
+    pairs += [(drug1, drug2) for i, drug1 in enumerate(new_drugs) for drug2 in new_drugs[i+1:]]
+    return pairs
+
+def _check_local_interactions(new_drugs: List[str], current_medications: List[str]) -> List[InteractionPair]:
+    """Check interactions using local database"""
+    interactions_found = []
+    
+    for drug1, drug2 in _pairs_to_check(new_drugs, current_medications):
+        interaction = LOCAL_INTERACTIONS.get(drug1.lower(), {}).get(drug2.lower())
+        if interaction:
+            interactions_found.append(InteractionPair(
+                drug1, drug2, Severity.parse(interaction['severity']),
+                interaction['description'], InteractionSource.LOCAL
+            ))
+    
+    return interactions_found
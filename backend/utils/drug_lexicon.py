@@ -0,0 +1,183 @@
+"""
+Local drug name lexicon with fuzzy matching
+A trigram index over known drug names corrects misspellings such as "ibuprofin" or "paracetmol"
+offline, so only names that are not close to any known drug go to RxNav approximateTerm
+"""
+
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+# Common generic and brand names, grouped by use
+DRUG_NAMES = [
+    # Pain relievers
+    'aspirin', 'ibuprofen', 'acetaminophen', 'paracetamol', 'tylenol', 'advil', 'motrin', 'naproxen', 'aleve',
+    # Blood thinners
+    'warfarin', 'coumadin', 'heparin', 'eliquis', 'xarelto', 'pradaxa',
+    # Diabetes medications
+    'metformin', 'insulin', 'glipizide', 'glyburide', 'januvia', 'victoza',
+    # Blood pressure medications
+    'lisinopril', 'atenolol', 'amlodipine', 'hydrochlorothiazide', 'losartan', 'metoprolol',
+    # Stomach medications
+    'omeprazole', 'ranitidine', 'nexium', 'prilosec', 'zantac', 'pepcid',
+    # Cholesterol medications
+    'simvastatin', 'atorvastatin', 'lipitor', 'crestor', 'zocor',
+    # Thyroid medications
+    'levothyroxine', 'synthroid', 'armour thyroid',
+    # Steroids
+    'prednisone', 'prednisolone', 'methylprednisolone',
+    # Respiratory
+    'albuterol', 'ventolin', 'proair', 'symbicort', 'advair',
+    # Antibiotics
+    'amoxicillin', 'azithromycin', 'ciprofloxacin', 'doxycycline', 'penicillin',
+    # Heart medications
+    'digoxin', 'furosemide', 'lasix', 'spironolactone'
+]
+
+# Corrections remembered per lexicon; the cache is dropped when it fills up or a name is added
+CORRECTION_CACHE_SIZE = 4096
+
+# Words shorter than this are never fuzzy-matched (too many ordinary words are close to them)
+MIN_FUZZY_LENGTH = 6
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def edit_distance(a: str, b: str, limit: int = None) -> int:
+    """Levenshtein distance; stops early and returns limit + 1 once it is exceeded"""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def max_distance(word: str) -> int:
+    """Typos tolerated for a word of this length"""
+    if len(word) < MIN_FUZZY_LENGTH:
+        return 0
+    return 1 if len(word) < 9 else 2
+
+
+def trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Trigram postings for finding names within a small edit distance of a word (not thread-safe)"""
+
+    def __init__(self):
+        self._postings: Dict[str, set] = defaultdict(set)
+
+    def add(self, word: str) -> None:
+        for gram in trigrams(word):
+            self._postings[gram].add(word)
+
+    def search(self, word: str, tolerance: int) -> List[Tuple[int, str]]:
+        """All (distance, name) within tolerance, closest first"""
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            for name in self._postings.get(gram, ()):
+                shared[name] += 1
+        # Each edit changes at most three trigrams, so closer names share at least this many
+        needed = max(len(grams) - 3 * tolerance, 1)
+        found = []
+        for name, count in shared.items():
+            if count >= needed and abs(len(name) - len(word)) <= tolerance:
+                distance = edit_distance(word, name, tolerance)
+                if distance <= tolerance:
+                    found.append((distance, name))
+        return sorted(found)
+
+
+class DrugLexicon:
+    """Known drug names with exact and typo-tolerant lookup"""
+
+    def __init__(self, names: Iterable[str] = DRUG_NAMES):
+        # Guards _names, _index and _corrections: extract() adds names while other requests read them
+        self._lock = threading.Lock()
+        self._names = set()
+        self._index = TrigramIndex()
+        self._corrections: Dict[str, Optional[str]] = {}
+        self.add(names)
+
+    def add(self, names: Iterable[str]) -> None:
+        """Extend the lexicon (e.g. with names resolved through RxNav)"""
+        with self._lock:
+            for name in names:
+                name = ' '.join(name.lower().split())
+                if name and name not in self._names:
+                    self._names.add(name)
+                    if ' ' not in name:
+                        self._index.add(name)
+            self._corrections.clear()
+
+    def __contains__(self, name: str) -> bool:
+        return ' '.join(name.lower().split()) in self._names
+
+    def correct(self, word: str) -> Optional[str]:
+        """The known drug name closest to word, or None if nothing is close enough"""
+        word = word.lower().strip()
+        tolerance = max_distance(word)
+        with self._lock:
+            if word in self._names:
+                return word
+            if tolerance == 0:
+                return None
+            if word in self._corrections:
+                return self._corrections[word]
+            matches = self._index.search(word, tolerance)
+            # Ambiguous corrections (two names equally close) are left to RxNav
+            if not matches or (len(matches) > 1 and matches[0][0] == matches[1][0]):
+                corrected = None
+            else:
+                corrected = matches[0][1]
+            if len(self._corrections) >= CORRECTION_CACHE_SIZE:
+                self._corrections.clear()
+            self._corrections[word] = corrected
+        metrics.inc("drug_name_corrections_total", result="corrected" if corrected else "miss")
+        return corrected
+
+    def extract(self, text: str, resolves: Callable[[str], bool] = None) -> List[str]:
+        """
+        Known drug names mentioned in text, correcting misspelled words
+
+        A word that would be corrected to a different drug is first checked with resolves
+        (e.g. an exact RxNorm lookup); if it is a real drug name in its own right it is kept
+        as written and added to the lexicon, instead of being swapped for the similar name
+        """
+        text_lower = text.lower()
+        with self._lock:
+            names = frozenset(self._names)
+        found = {name for name in names if name in text_lower}
+        for word in set(_WORD.findall(text_lower)):
+            if word in names or any(word in name for name in found):
+                continue
+            corrected = self.correct(word)
+            if not corrected:
+                continue
+            if resolves is not None and resolves(word):
+                self.add([word])
+                found.add(word)
+            else:
+                found.add(corrected)
+        return sorted(found)
+
+
+# Global drug lexicon
+drug_lexicon = DrugLexicon()
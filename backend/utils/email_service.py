@@ -1,10 +1,15 @@
+import base64
 import os
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from typing import Optional
+import time
+import uuid
+from email.header import Header
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
+from utils.email_templates import email_templates
+from utils.metrics import metrics
+
 load_dotenv()
 
 class EmailService:
@@ -13,88 +18,133 @@ class EmailService:
         self.smtp_port = int(os.getenv("EMAIL_PORT", "587"))
         self.email_user = os.getenv("EMAIL_USER")
         self.email_pass = os.getenv("EMAIL_PASS")
+        self.use_tls = os.getenv("EMAIL_USE_TLS", "true").lower() == "true"
+        
+        # MIME skeleton shared by every message: only bodies and address headers vary.
+        # '_' never occurs in base64, so the boundary cannot collide with encoded content.
+        self._boundary = f"==hcs_{uuid.uuid4().hex}"
+        self._text_part_header = (
+            f"--{self._boundary}\n"
+            "Content-Type: text/plain; charset=\"utf-8\"\n"
+            "MIME-Version: 1.0\n"
+            "Content-Transfer-Encoding: base64\n\n"
+        )
+        self._html_part_header = (
+            f"--{self._boundary}\n"
+            "Content-Type: text/html; charset=\"utf-8\"\n"
+            "MIME-Version: 1.0\n"
+            "Content-Transfer-Encoding: base64\n\n"
+        )
+    
+    def _send(self, msg, to_email: str) -> None:
+        """Deliver a message over one SMTP session"""
+        start = time.perf_counter()
+        status = "error"
+        try:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+            try:
+                if self.use_tls:
+                    server.starttls()
+                if self.email_user and self.email_pass:
+                    server.login(self.email_user, self.email_pass)
+                server.sendmail(self.email_user, to_email, msg if isinstance(msg, str) else msg.as_string())
+            finally:
+                server.quit()
+            status = "ok"
+        finally:
+            metrics.inc("emails_sent_total", status=status)
+            metrics.histogram("email_send_duration_seconds", time.perf_counter() - start, status=status)
     
-    def send_reminder_email(self, to_email: str, username: str, 
-                           medicine_name: str, dosage: str, time: str) -> bool:
+    def _encode_header(self, value: str) -> str:
+        """Header value on one line; CR/LF from user data (e.g. a medicine name) would start a new header"""
+        value = ' '.join(value.replace('\r', '\n').split('\n'))
+        return value if value.isascii() else Header(value, 'utf-8').encode()
+    
+    def build_message(self, to_email: str, rendered: Dict[str, Optional[str]]) -> str:
+        """Assemble a multipart message (plain text plus HTML when available) from rendered templates"""
+        subtype = 'alternative' if rendered.get('html') else 'mixed'
+        parts = [
+            f'Content-Type: multipart/{subtype}; boundary="{self._boundary}"\n'
+            "MIME-Version: 1.0\n"
+            f"From: {self._encode_header(self.email_user or '')}\n"
+            f"To: {self._encode_header(to_email)}\n"
+            f"Subject: {self._encode_header(rendered['subject'])}\n\n",
+            self._text_part_header,
+            base64.encodebytes(rendered['text'].encode('utf-8')).decode('ascii'),
+        ]
+        if rendered.get('html'):
+            parts.append(self._html_part_header)
+            parts.append(base64.encodebytes(rendered['html'].encode('utf-8')).decode('ascii'))
+        parts.append(f"--{self._boundary}--\n")
+        return ''.join(parts)
+    
+    def send_reminder_email(self, to_email: str, username: str,
+                           medicine_name: str, dosage: str, time: str,
+                           locale: str = None) -> bool:
         """Send medication reminder email"""
         try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.email_user
-            msg['To'] = to_email
-            msg['Subject'] = f"Medication Reminder: {medicine_name}"
-            
-            # Email body
-            body = f"""
-            Hello {username},
-            
-            This is a friendly reminder to take your medication:
-            
-            💊 Medicine: {medicine_name}
-            📏 Dosage: {dosage}
-            ⏰ Time: {time}
-            
-            Please take your medication as prescribed by your healthcare provider.
-            
-            Stay healthy!
-            
-            ---
-            Healthcare Support System
-            This is an automated reminder. Please do not reply to this email.
-            """
-            
-            msg.attach(MIMEText(body, 'plain'))
+            rendered = email_templates.render('reminder', {
+                'username': username,
+                'medicine_name': medicine_name,
+                'dosage': dosage,
+                'time': time
+            }, locale)
+            msg = self.build_message(to_email, rendered)
             
             # Send email
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_user, self.email_pass)
-            
-            text = msg.as_string()
-            server.sendmail(self.email_user, to_email, text)
-            server.quit()
+            self._send(msg, to_email)
             
             print(f"Reminder email sent to {to_email} for {medicine_name}")
             return True
-            
+        
         except Exception as e:
             print(f"Failed to send email: {e}")
             return False
     
+    def send_reminder_digest(self, to_email: str, username: str, reminders: List[Dict],
+                             locale: str = None) -> bool:
+        """Send one email listing several due medications (each dict has medicine_name, dosage, time)"""
+        if len(reminders) == 1:
+            reminder = reminders[0]
+            return self.send_reminder_email(to_email, username, reminder['medicine_name'],
+                                            reminder['dosage'], reminder['time'], locale)
+        try:
+            rendered = email_templates.render(
+                'digest',
+                {'username': username, 'count': len(reminders)},
+                locale,
+                items=sorted(reminders, key=lambda r: (r['time'], r['medicine_name']))
+            )
+            msg = self.build_message(to_email, rendered)
+            self._send(msg, to_email)
+            
+            print(f"Reminder digest sent to {to_email} for {len(reminders)} medications")
+            return True
+        
+        except Exception as e:
+            print(f"Failed to send digest email: {e}")
+            return False
+    
     def send_test_email(self, to_email: str) -> bool:
         """Send test email to verify configuration"""
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email_user
-            msg['To'] = to_email
-            msg['Subject'] = "Healthcare System - Email Configuration Test"
-            
-            body = """
-            Hello!
-            
-            This is a test email to verify your email configuration is working correctly.
+            msg = self.build_message(to_email, email_templates.render('test', {}))
             
-            If you received this email, your healthcare reminder system is ready to send notifications.
-            
-            Best regards,
-            Healthcare Support System
-            """
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_user, self.email_pass)
-            
-            text = msg.as_string()
-            server.sendmail(self.email_user, to_email, text)
-            server.quit()
+            self._send(msg, to_email)
             
             return True
-            
+        
         except Exception as e:
             print(f"Failed to send test email: {e}")
             return False
+    
+    def get_status(self) -> Dict:
+        """Whether SMTP credentials are configured, and send counts since startup"""
+        return {
+            "configured": bool(self.email_user and self.email_pass),
+            "sent": metrics.get_counter("emails_sent_total", status="ok"),
+            "failed": metrics.get_counter("emails_sent_total", status="error")
+        }
 
 # Global email service instance
-email_service = EmailService()
\ No newline at end of file
+email_service = EmailService()
@@ -0,0 +1,217 @@
+"""
+Email templates for reminder notifications
+Templates are compiled once per (name, locale) into literal/field segments and cached,
+so rendering a peak minute of reminders is a single join per message
+"""
+
+import html
+import os
+import threading
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_LOCALE = os.getenv("EMAIL_DEFAULT_LOCALE", "en")
+
+# Each template has a subject plus plain-text and HTML bodies. Digest emails render
+# `item_text`/`item_html` once per medication and insert the joined rows as {items}.
+TEMPLATES: Dict[str, Dict[str, Dict[str, str]]] = {
+    'en': {
+        'reminder': {
+            'subject': "Medication Reminder: {medicine_name}",
+            'text': (
+                "Hello {username},\n\n"
+                "This is a friendly reminder to take your medication:\n\n"
+                "💊 Medicine: {medicine_name}\n"
+                "📏 Dosage: {dosage}\n"
+                "⏰ Time: {time}\n\n"
+                "Please take your medication as prescribed by your healthcare provider.\n\n"
+                "Stay healthy!\n\n"
+                "---\n"
+                "Healthcare Support System\n"
+                "This is an automated reminder. Please do not reply to this email.\n"
+            ),
+            'html': (
+                "<p>Hello {username},</p>"
+                "<p>This is a friendly reminder to take your medication:</p>"
+                "<ul><li>💊 <strong>Medicine:</strong> {medicine_name}</li>"
+                "<li>📏 <strong>Dosage:</strong> {dosage}</li>"
+                "<li>⏰ <strong>Time:</strong> {time}</li></ul>"
+                "<p>Please take your medication as prescribed by your healthcare provider.</p>"
+                "<p>Stay healthy!</p>"
+                "<hr><p><small>Healthcare Support System<br>"
+                "This is an automated reminder. Please do not reply to this email.</small></p>"
+            ),
+        },
+        'digest': {
+            'subject': "Medication Reminder: {count} medications due",
+            'text': (
+                "Hello {username},\n\n"
+                "This is a friendly reminder to take your medications:\n\n"
+                "{items}\n\n"
+                "Please take your medication as prescribed by your healthcare provider.\n\n"
+                "Stay healthy!\n\n"
+                "---\n"
+                "Healthcare Support System\n"
+                "This is an automated reminder. Please do not reply to this email.\n"
+            ),
+            'html': (
+                "<p>Hello {username},</p>"
+                "<p>This is a friendly reminder to take your medications:</p>"
+                "<ul>{items}</ul>"
+                "<p>Please take your medication as prescribed by your healthcare provider.</p>"
+                "<p>Stay healthy!</p>"
+                "<hr><p><small>Healthcare Support System<br>"
+                "This is an automated reminder. Please do not reply to this email.</small></p>"
+            ),
+            'item_text': "💊 {medicine_name} - {dosage} at {time}",
+            'item_html': "<li>💊 <strong>{medicine_name}</strong> - {dosage} at {time}</li>",
+        },
+        'test': {
+            'subject': "Healthcare System - Email Configuration Test",
+            'text': (
+                "Hello!\n\n"
+                "This is a test email to verify your email configuration is working correctly.\n\n"
+                "If you received this email, your healthcare reminder system is ready to send notifications.\n\n"
+                "Best regards,\n"
+                "Healthcare Support System\n"
+            ),
+        },
+    },
+    'es': {
+        'reminder': {
+            'subject': "Recordatorio de medicación: {medicine_name}",
+            'text': (
+                "Hola {username},\n\n"
+                "Este es un recordatorio para tomar tu medicamento:\n\n"
+                "💊 Medicamento: {medicine_name}\n"
+                "📏 Dosis: {dosage}\n"
+                "⏰ Hora: {time}\n\n"
+                "Toma tu medicamento según las indicaciones de tu profesional de salud.\n\n"
+                "¡Cuídate!\n\n"
+                "---\n"
+                "Healthcare Support System\n"
+                "Este es un recordatorio automático. Por favor, no respondas a este correo.\n"
+            ),
+            'html': (
+                "<p>Hola {username},</p>"
+                "<p>Este es un recordatorio para tomar tu medicamento:</p>"
+                "<ul><li>💊 <strong>Medicamento:</strong> {medicine_name}</li>"
+                "<li>📏 <strong>Dosis:</strong> {dosage}</li>"
+                "<li>⏰ <strong>Hora:</strong> {time}</li></ul>"
+                "<p>Toma tu medicamento según las indicaciones de tu profesional de salud.</p>"
+                "<p>¡Cuídate!</p>"
+                "<hr><p><small>Healthcare Support System<br>"
+                "Este es un recordatorio automático. Por favor, no respondas a este correo.</small></p>"
+            ),
+        },
+        'digest': {
+            'subject': "Recordatorio de medicación: {count} medicamentos pendientes",
+            'text': (
+                "Hola {username},\n\n"
+                "Este es un recordatorio para tomar tus medicamentos:\n\n"
+                "{items}\n\n"
+                "Toma tu medicamento según las indicaciones de tu profesional de salud.\n\n"
+                "¡Cuídate!\n\n"
+                "---\n"
+                "Healthcare Support System\n"
+                "Este es un recordatorio automático. Por favor, no respondas a este correo.\n"
+            ),
+            'html': (
+                "<p>Hola {username},</p>"
+                "<p>Este es un recordatorio para tomar tus medicamentos:</p>"
+                "<ul>{items}</ul>"
+                "<p>Toma tu medicamento según las indicaciones de tu profesional de salud.</p>"
+                "<p>¡Cuídate!</p>"
+                "<hr><p><small>Healthcare Support System<br>"
+                "Este es un recordatorio automático. Por favor, no respondas a este correo.</small></p>"
+            ),
+            'item_text': "💊 {medicine_name} - {dosage} a las {time}",
+            'item_html': "<li>💊 <strong>{medicine_name}</strong> - {dosage} a las {time}</li>",
+        },
+    },
+}
+
+
+class CompiledTemplate:
+    """A template pre-split into literal text and field names"""
+
+    def __init__(self, source: str, escape_html: bool = False):
+        self.source = source
+        self.escape_html = escape_html
+        self.segments: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(source)
+        ]
+
+    def render(self, values: Dict[str, object], raw: Tuple[str, ...] = ()) -> str:
+        """Substitute values; fields named in raw are inserted without HTML escaping"""
+        parts = []
+        for literal, field in self.segments:
+            parts.append(literal)
+            if field is not None:
+                value = str(values.get(field, ''))
+                if self.escape_html and field not in raw:
+                    value = html.escape(value)
+                parts.append(value)
+        return ''.join(parts)
+
+
+class TemplateRegistry:
+    """Resolve templates by name and locale and cache the compiled versions"""
+
+    def __init__(self, templates: Dict = None, default_locale: str = DEFAULT_LOCALE):
+        self.templates = templates or TEMPLATES
+        self.default_locale = default_locale
+        self._cache: Dict[Tuple[str, str, str], Optional[CompiledTemplate]] = {}
+        self._lock = threading.Lock()
+
+    def resolve_locale(self, locale: Optional[str], name: str) -> str:
+        """Fall back from 'es-MX' to 'es' to the default locale"""
+        for candidate in (locale, (locale or '').replace('_', '-').split('-')[0]):
+            if candidate and name in self.templates.get(candidate.lower(), {}):
+                return candidate.lower()
+        return self.default_locale
+
+    def get(self, name: str, variant: str, locale: Optional[str] = None) -> Optional[CompiledTemplate]:
+        """Return the compiled template for one variant ('subject', 'text', 'html', ...)"""
+        key = (name, locale or self.default_locale, variant)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._cache:
+                resolved = self.resolve_locale(locale, name)
+                source = self.templates.get(resolved, {}).get(name, {}).get(variant)
+                self._cache[key] = (
+                    CompiledTemplate(source, escape_html=variant.endswith('html'))
+                    if source is not None else None
+                )
+            return self._cache[key]
+
+    def render(self, name: str, values: Dict[str, object], locale: Optional[str] = None,
+               items: Optional[List[Dict[str, object]]] = None) -> Dict[str, Optional[str]]:
+        """Render subject, text and html (None if the template has no HTML variant)"""
+        values = dict(values)
+        rendered = {}
+        for variant in ('subject', 'text', 'html'):
+            template = self.get(name, variant, locale)
+            if template is None:
+                rendered[variant] = None
+                continue
+            raw = ()
+            if items is not None:
+                item_template = self.get(name, f'item_{variant}', locale)
+                if item_template is not None:
+                    separator = '\n' if variant == 'text' else ''
+                    values['items'] = separator.join(item_template.render(item) for item in items)
+                    raw = ('items',)
+            rendered[variant] = template.render(values, raw)
+        return rendered
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+# Global template registry instance
+email_templates = TemplateRegistry()
@@ -0,0 +1,89 @@
+"""
+Short-lived interaction check tokens
+When adding a reminder is held back by an interaction warning, the parsed reminder and the
+computed interaction result are kept under a token so the user's confirmation can insert
+directly, without re-parsing the request or re-running the interaction check
+"""
+
+import os
+import secrets
+import threading
+import time
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from database import normalize_medicine_name
+from utils.interaction_result import InteractionResult
+from utils.metrics import metrics
+
+load_dotenv()
+
+
+class InteractionCheckStore:
+    """In-process store of pending interaction confirmations"""
+
+    def __init__(self):
+        self.ttl = int(os.getenv("INTERACTION_CHECK_TTL", "600"))
+        self.max_entries = int(os.getenv("INTERACTION_CHECK_MAX", "10000"))
+        self._checks: Dict[str, Dict] = {}
+        # (user_id, medicine key) -> token, for the chat "confirm add <medicine>" path
+        self._by_medicine: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def issue(self, user_id: int, reminder: Dict, interaction_result: InteractionResult) -> str:
+        """Remember a held-back reminder and its interaction result; returns the check token"""
+        token = secrets.token_urlsafe(16)
+        now = time.monotonic()
+        key = (user_id, normalize_medicine_name(reminder['medicine_name']))
+        with self._lock:
+            self._expire(now)
+            # Only the latest warning for a medicine can be confirmed
+            previous = self._by_medicine.pop(key, None)
+            if previous:
+                self._checks.pop(previous, None)
+            if len(self._checks) >= self.max_entries:
+                oldest = min(self._checks, key=lambda t: self._checks[t]['expires_at'])
+                self._drop(oldest)
+            self._checks[token] = {
+                'user_id': user_id,
+                'reminder': dict(reminder),
+                'interaction_result': interaction_result,
+                'expires_at': now + self.ttl,
+            }
+            self._by_medicine[key] = token
+        return token
+
+    def consume(self, token: str, user_id: int) -> Optional[Dict]:
+        """Claim a check by token (one use); None if unknown, expired or another user's"""
+        if not token:
+            return None
+        with self._lock:
+            self._expire(time.monotonic())
+            check = self._checks.get(token)
+            if check is None or check['user_id'] != user_id:
+                metrics.inc("interaction_check_tokens_total", result="miss")
+                return None
+            self._drop(token)
+        metrics.inc("interaction_check_tokens_total", result="hit")
+        return check
+
+    def consume_for_medicine(self, user_id: int, medicine_name: str) -> Optional[Dict]:
+        """Claim the pending check for a medicine the user was warned about in chat"""
+        with self._lock:
+            token = self._by_medicine.get((user_id, normalize_medicine_name(medicine_name)))
+        return self.consume(token, user_id) if token else None
+
+    def _drop(self, token: str) -> None:
+        check = self._checks.pop(token, None)
+        if check is not None:
+            key = (check['user_id'], normalize_medicine_name(check['reminder']['medicine_name']))
+            if self._by_medicine.get(key) == token:
+                del self._by_medicine[key]
+
+    def _expire(self, now: float) -> None:
+        for token in [t for t, c in self._checks.items() if c['expires_at'] <= now]:
+            self._drop(token)
+
+
+# Global interaction check store
+interaction_checks = InteractionCheckStore()
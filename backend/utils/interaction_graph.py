@@ -0,0 +1,90 @@
+"""
+Per-user medication interaction graph
+Nodes are a user's active medicines with their RxCUIs, edges are known interactions between
+them. The graph is kept up to date as reminders are added and deleted, so checking a new
+drug only resolves that drug and looks up its own edges against the stored RxCUIs
+"""
+
+from typing import Dict
+
+from database import db, normalize_medicine_name
+from utils.interaction_result import InteractionResult, Severity
+from utils.metrics import metrics
+
+
+class InteractionGraph:
+    """Maintain and query users' medication interaction graphs"""
+
+    def check(self, user_id: int, medicine_name: str) -> InteractionResult:
+        """Check a new medicine against the user's current regimen"""
+        graph = self.sync(user_id, fresh=True)
+        return self._check_against(graph, medicine_name)
+
+    def add_medication(self, user_id: int, medicine_name: str, result: InteractionResult = None) -> None:
+        """Add a medicine the user just started taking, reusing its check result when there is one"""
+        if result is None:
+            graph = db.get_medication_graph(user_id)
+            if any(node['medicine_key'] == normalize_medicine_name(medicine_name) for node in graph['nodes']):
+                return
+            result = self._check_against(graph, medicine_name)
+
+        name = medicine_name.lower()
+        edges = [{
+            'other_key': normalize_medicine_name(pair.other(name)),
+            'severity': pair.severity.value,
+            'description': pair.description,
+            'source': pair.source.value,
+        } for pair in result.pairs_for(name)]
+        if db.add_medication_graph_node(user_id, medicine_name, result.rxcuis.get(name), edges):
+            metrics.inc("interaction_graph_updates_total", op="add")
+
+    def sync(self, user_id: int, fresh: bool = False) -> Dict:
+        """Bring the graph in line with the user's active reminders and return it"""
+        active = {}
+        for reminder in db.get_user_reminders(user_id, fresh=fresh):
+            active.setdefault(normalize_medicine_name(reminder['medicine_name']), reminder['medicine_name'])
+
+        graph = db.get_medication_graph(user_id)
+        nodes = {node['medicine_key'] for node in graph['nodes']}
+        stale = nodes - set(active)
+        missing = [name for key, name in active.items() if key not in nodes]
+        if stale:
+            db.prune_medication_graph(user_id)
+            metrics.inc("interaction_graph_updates_total", op="prune")
+        # Reminders saved without going through a check (bulk import, older data) join one at a time
+        for name in missing:
+            self.add_medication(user_id, name)
+        if stale or missing:
+            graph = db.get_medication_graph(user_id)
+        return graph
+
+    def describe(self, user_id: int) -> Dict:
+        """Graph for the dashboard: nodes with their degree, edges and a summary"""
+        graph = self.sync(user_id)
+        degree = {node['medicine_key']: 0 for node in graph['nodes']}
+        for edge in graph['edges']:
+            degree[edge['key1']] = degree.get(edge['key1'], 0) + 1
+            degree[edge['key2']] = degree.get(edge['key2'], 0) + 1
+        severities = [Severity.parse(edge['severity']) for edge in graph['edges']]
+        return {
+            'nodes': [dict(node, degree=degree.get(node['medicine_key'], 0)) for node in graph['nodes']],
+            'edges': graph['edges'],
+            'summary': {
+                'medications': len(graph['nodes']),
+                'interactions': len(graph['edges']),
+                'max_severity': max(severities, key=lambda s: s.rank).value if severities else None,
+                'by_severity': {s.value: severities.count(s) for s in Severity if s in severities},
+            },
+        }
+
+    def _check_against(self, graph: Dict, medicine_name: str) -> InteractionResult:
+        """Resolve only the new medicine and look up its edges against the stored RxCUIs"""
+        from utils.drug_interaction_tool import find_interactions_with_regimen
+        key = normalize_medicine_name(medicine_name)
+        regimen = {node['medicine_key']: node['rxcui'] for node in graph['nodes'] if node['medicine_key'] != key}
+        metrics.inc("interaction_graph_checks_total")
+        return find_interactions_with_regimen(medicine_name.lower(), regimen)
+
+
+# Global interaction graph
+interaction_graph = InteractionGraph()
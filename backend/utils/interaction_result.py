@@ -0,0 +1,145 @@
+"""
+Structured drug interaction results
+Checks return an InteractionResult; markdown is rendered only where a response is shown
+to the user, and API responses can send the same result as JSON
+"""
+
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, List
+
+
+class Severity(str, Enum):
+    HIGH = "High"
+    MEDIUM = "Medium"
+    LOW = "Low"
+    UNKNOWN = "Unknown"
+
+    @classmethod
+    def parse(cls, value: str) -> "Severity":
+        """Map a severity label from RxNav or the local table (any case, 'N/A', None)"""
+        label = (value or "").strip().lower()
+        for severity in cls:
+            if severity.value.lower() == label:
+                return severity
+        return cls.UNKNOWN
+
+    @property
+    def rank(self) -> int:
+        return _SEVERITY_RANK[self]
+
+    @property
+    def emoji(self) -> str:
+        return _SEVERITY_EMOJI[self]
+
+
+_SEVERITY_RANK = {Severity.UNKNOWN: 0, Severity.LOW: 1, Severity.MEDIUM: 2, Severity.HIGH: 3}
+_SEVERITY_EMOJI = {Severity.HIGH: "🔴", Severity.MEDIUM: "🟡", Severity.LOW: "🟠", Severity.UNKNOWN: "🟠"}
+
+
+class InteractionSource(str, Enum):
+    RXNORM = "RxNorm API"
+    LOCAL = "Local Database"
+
+
+@dataclass
+class InteractionPair:
+    """One interacting pair of drugs"""
+    drug1: str
+    drug2: str
+    severity: Severity
+    description: str
+    source: InteractionSource
+
+    @property
+    def result(self) -> str:
+        """One-line summary, as returned by the drug_interaction_checker tool"""
+        return f"⚠️ Interaction found ({self.severity.value}): {self.description}"
+
+    def involves(self, drug: str) -> bool:
+        return drug.lower() in (self.drug1.lower(), self.drug2.lower())
+
+    def other(self, drug: str) -> str:
+        return self.drug2 if self.drug1.lower() == drug.lower() else self.drug1
+
+    def to_dict(self) -> Dict:
+        return {
+            'drug1': self.drug1,
+            'drug2': self.drug2,
+            'severity': self.severity.value,
+            'description': self.description,
+            'source': self.source.value,
+        }
+
+
+@dataclass
+class InteractionResult:
+    """Outcome of checking new drugs against current medications and each other"""
+    new_drugs: List[str]
+    current_medications: List[str]
+    pairs: List[InteractionPair] = field(default_factory=list)
+    api_working: bool = False
+    rxcuis: Dict[str, str] = field(default_factory=dict)  # resolved RxCUIs of the checked drugs
+
+    @property
+    def has_interactions(self) -> bool:
+        return bool(self.pairs)
+
+    @property
+    def source(self) -> InteractionSource:
+        return InteractionSource.RXNORM if self.api_working else InteractionSource.LOCAL
+
+    @property
+    def max_severity(self) -> Severity:
+        return max((p.severity for p in self.pairs), key=lambda s: s.rank, default=Severity.UNKNOWN)
+
+    def pairs_for(self, drug: str) -> List[InteractionPair]:
+        return [p for p in self.pairs if p.involves(drug)]
+
+    def to_dict(self) -> Dict:
+        return {
+            'new_drugs': self.new_drugs,
+            'current_medications': self.current_medications,
+            'has_interactions': self.has_interactions,
+            'max_severity': self.max_severity.value if self.pairs else None,
+            'source': self.source.value,
+            'pairs': [p.to_dict() for p in self.pairs],
+        }
+
+    def to_markdown(self) -> str:
+        """Chat/warning rendering of the result"""
+        source = self.source.value
+        response_parts = [f"💊 **Drug Interaction Check ({source})**\n"]
+
+        # Medications being checked
+        response_parts.append("**Medications Checked:**")
+        response_parts.append(f"- New: {', '.join([d.title() for d in self.new_drugs])}")
+        if self.current_medications:
+            response_parts.append(f"- Current: {', '.join([d.title() for d in self.current_medications])}")
+        else:
+            response_parts.append("- Current: None")
+        response_parts.append("")
+
+        # Interactions found
+        if self.pairs:
+            response_parts.append("**⚠️ Interactions Detected:**")
+            for pair in self.pairs:
+                response_parts.append(f"{pair.severity.emoji} **{pair.drug1.title()} + {pair.drug2.title()}**")
+                response_parts.append(f"   {pair.result}")
+            response_parts.append("")
+        else:
+            response_parts.append("✅ **No Major Interactions Found**")
+            response_parts.append(f"Based on {source} analysis.\n")
+
+        # Safety footer
+        response_parts.extend([
+            "**Important Notes:**",
+            f"- This check uses the {'NIH RxNorm database' if self.api_working else 'local drug database'}",
+            "- Always consult your pharmacist or doctor",
+            "- Report any unusual side effects immediately",
+            "- Keep all healthcare providers informed of your medications",
+            "",
+            f"**Source:** {'National Library of Medicine RxNorm API' if self.api_working else 'Local Drug Database'}"
+        ])
+
+        return "\n".join(response_parts)
@@ -0,0 +1,62 @@
+"""
+Lazy module-level singletons
+Heavy services are built on first use instead of at import time
+"""
+
+import threading
+import time
+from typing import Callable
+
+from utils.metrics import metrics
+
+
+class LazyInstance:
+    """Proxy that constructs the wrapped singleton on first attribute access"""
+
+    def __init__(self, factory: Callable, name: str = None):
+        object.__setattr__(self, '_lazy_factory', factory)
+        object.__setattr__(self, '_lazy_name', name or getattr(factory, '__name__', 'instance'))
+        object.__setattr__(self, '_lazy_instance', None)
+        object.__setattr__(self, '_lazy_lock', threading.Lock())
+
+    def _lazy_get(self):
+        instance = object.__getattribute__(self, '_lazy_instance')
+        if instance is not None:
+            return instance
+        with object.__getattribute__(self, '_lazy_lock'):
+            instance = object.__getattribute__(self, '_lazy_instance')
+            if instance is None:
+                name = object.__getattribute__(self, '_lazy_name')
+                start = time.perf_counter()
+                instance = object.__getattribute__(self, '_lazy_factory')()
+                elapsed = time.perf_counter() - start
+                object.__setattr__(self, '_lazy_instance', instance)
+                metrics.observe("lazy_init_seconds", elapsed, component=name)
+                print(f"DEBUG: Initialized {name} in {elapsed:.2f}s")
+        return instance
+
+    def __getattr__(self, item):
+        return getattr(self._lazy_get(), item)
+
+    def __setattr__(self, key, value):
+        setattr(self._lazy_get(), key, value)
+
+    def __repr__(self):
+        instance = object.__getattribute__(self, '_lazy_instance')
+        name = object.__getattribute__(self, '_lazy_name')
+        return repr(instance) if instance is not None else f"<LazyInstance {name} (not loaded)>"
+
+
+def is_loaded(proxy) -> bool:
+    """Return True if a LazyInstance has been constructed (or the object is not lazy)"""
+    if isinstance(proxy, LazyInstance):
+        return object.__getattribute__(proxy, '_lazy_instance') is not None
+    return True
+
+
+def warm_up(proxy) -> float:
+    """Force construction of a LazyInstance and return the time it took"""
+    start = time.perf_counter()
+    if isinstance(proxy, LazyInstance):
+        proxy._lazy_get()
+    return time.perf_counter() - start
@@ -1,20 +1,211 @@
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
-from typing import Optional
-
-# Try to import Groq, but handle if it fails
-try:
-    from groq import Groq
-    GROQ_AVAILABLE = True
-except ImportError as e:
-    print(f"⚠️  Groq not available: {e}")
-    GROQ_AVAILABLE = False
-    Groq = None
+from typing import Dict, Optional, Tuple
+from utils.prompt_compactor import prompt_compactor, estimate_tokens
+from utils.model_router import model_router
+from utils.metrics import metrics
+from utils.output_budget import OutputBudget, OUTPUT_BUDGETS
+from utils.resilience import CircuitBreaker, LatencyWindow
+from utils.lazy import LazyInstance
+from utils.tracing import tracer
 
 load_dotenv()
 
+# User on whose behalf LLM calls in the current request are made (for fair queuing)
+_llm_user: ContextVar[str] = ContextVar("llm_user", default="anonymous")
+
+
+def set_llm_user(user_id) -> None:
+    """Tag LLM calls made in the current request with a user for fair scheduling"""
+    _llm_user.set(str(user_id) if user_id is not None else "anonymous")
+
+
+class LLMQueueTimeout(TimeoutError):
+    """Raised when a call waits too long for a scheduler slot"""
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Return the retry-after delay from a 429 error, or None if it is not a rate limit"""
+    response = getattr(error, "response", None)
+    status_code = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status_code != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(str(value).rstrip("s"))
+            except ValueError:
+                continue
+    return 1.0
+
+
+class LLMScheduler:
+    """Global concurrency limit plus requests/tokens-per-minute token buckets with per-user fair queuing"""
+    
+    def __init__(self, max_concurrency: int, requests_per_minute: int,
+                 tokens_per_minute: int, max_wait: float):
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        
+        self._cond = threading.Condition()
+        self._active = 0
+        self._request_tokens = float(requests_per_minute)
+        self._token_tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        # user -> queue of waiting tickets; users are served round-robin
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+    
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_tokens = min(self.requests_per_minute,
+                                   self._request_tokens + elapsed * self.requests_per_minute / 60)
+        self._token_tokens = min(self.tokens_per_minute,
+                                 self._token_tokens + elapsed * self.tokens_per_minute / 60)
+    
+    def _seconds_until_capacity(self, tokens: int, now: float) -> Optional[float]:
+        """Seconds until a request of this size fits, or None if blocked on concurrency"""
+        if self._active >= self.max_concurrency:
+            return None
+        waits = [self._paused_until - now]
+        if self._request_tokens < 1:
+            waits.append((1 - self._request_tokens) * 60 / self.requests_per_minute)
+        if self._token_tokens < tokens:
+            waits.append((tokens - self._token_tokens) * 60 / self.tokens_per_minute)
+        return max(waits + [0.0])
+    
+    def _is_next(self, user: str, ticket: object) -> bool:
+        first_user = next(iter(self._queues))
+        return first_user == user and self._queues[user][0] is ticket
+    
+    def _admit(self, user: str, tokens: int) -> None:
+        queue = self._queues[user]
+        queue.popleft()
+        if queue:
+            self._queues.move_to_end(user)
+        else:
+            del self._queues[user]
+        self._active += 1
+        self._request_tokens -= 1
+        self._token_tokens -= tokens
+    
+    def acquire(self, user: str, tokens: int) -> float:
+        """Block until the call may proceed; returns the time spent queued"""
+        tokens = min(tokens, self.tokens_per_minute)
+        ticket = object()
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        
+        with self._cond:
+            self._queues.setdefault(user, deque()).append(ticket)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait_for = self._seconds_until_capacity(tokens, now)
+                if wait_for == 0 and self._is_next(user, ticket):
+                    self._admit(user, tokens)
+                    self._cond.notify_all()
+                    break
+                
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._queues[user].remove(ticket)
+                    if not self._queues[user]:
+                        del self._queues[user]
+                    self._cond.notify_all()
+                    metrics.inc("llm_queue_timeouts_total")
+                    raise LLMQueueTimeout(f"LLM scheduler queue wait timed out after {self.max_wait:.0f}s")
+                self._cond.wait(remaining if not wait_for else min(remaining, wait_for))
+        
+        waited = time.monotonic() - start
+        metrics.observe("llm_queue_wait_seconds", waited)
+        return waited
+    
+    def try_acquire(self, tokens: int) -> bool:
+        """Take a slot without queuing (used for hedged duplicates)"""
+        tokens = min(tokens, self.tokens_per_minute)
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if self._queues or self._seconds_until_capacity(tokens, now) != 0:
+                return False
+            self._active += 1
+            self._request_tokens -= 1
+            self._token_tokens -= tokens
+            return True
+    
+    def release(self, reserved_tokens: int, used_tokens: Optional[int] = None) -> None:
+        """Free the slot and settle the token reservation against actual usage"""
+        with self._cond:
+            self._active -= 1
+            if used_tokens is not None:
+                reserved_tokens = min(reserved_tokens, self.tokens_per_minute)
+                self._token_tokens = min(self.tokens_per_minute,
+                                         self._token_tokens + reserved_tokens - used_tokens)
+            self._cond.notify_all()
+    
+    def defer(self, seconds: float) -> None:
+        """Pause admissions after the provider returned retry-after"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+        print(f"DEBUG: LLM scheduler paused for {seconds:.1f}s (retry-after)")
+    
+    def get_status(self) -> Dict:
+        """Get scheduler state for health checks"""
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "active": self._active,
+                "max_concurrency": self.max_concurrency,
+                "queued": sum(len(q) for q in self._queues.values()),
+                "queued_users": len(self._queues),
+                "requests_available": int(self._request_tokens),
+                "tokens_available": int(self._token_tokens),
+                "paused_for_seconds": round(max(self._paused_until - time.monotonic(), 0), 1)
+            }
+
+
 class LlamaAPI:
     def __init__(self):
+        self.timeout = float(os.getenv("AI_TIMEOUT", "30"))
+        
+        # Fail fast to the fallback text after repeated Groq failures or timeouts
+        self.circuit_breaker = CircuitBreaker(
+            "groq",
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+        )
+        
+        # Optional hedged requests: send a duplicate call once the primary exceeds the p95 latency
+        self.hedge_enabled = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+        self.hedge_min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))
+        self.hedge_default_delay = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "5.0"))
+        self.latency_window = LatencyWindow(size=200)
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("LLM_HEDGE_WORKERS", "16")),
+            thread_name_prefix="groq-hedge"
+        ) if self.hedge_enabled else None
+        
+        # Bound concurrent Groq calls and stay inside the provider's rate limits
+        self.scheduler = LLMScheduler(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30")),
+            tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "6000")),
+            max_wait=float(os.getenv("LLM_QUEUE_MAX_WAIT", "10"))
+        )
+        self.max_rate_limit_retries = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "1"))
+        
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key or api_key.startswith("gsk_your_"):
             print("Warning: GROQ_API_KEY not configured properly")
@@ -22,9 +213,12 @@ class LlamaAPI:
             self.model = None
         else:
             try:
+                # Imported here so loading this module does not pull in the Groq SDK
+                from groq import Groq
+                
                 # Try different initialization approaches
                 self.client = Groq(api_key=api_key)
-                self.model = "llama-3.3-70b-versatile"  # Using available LLaMA model
+                self.model = model_router.large_model  # Escalation model; see utils/model_router.py
                 print("✅ Groq client initialized successfully")
             except TypeError as e:
                 if "proxies" in str(e):
@@ -40,14 +234,28 @@ class LlamaAPI:
                 self.client = None
                 self.model = None
     
+    @tracer.traced("llm.generate_response")
     def generate_response(self, prompt: str, system_message: str = None, 
-                         max_tokens: int = 1000) -> Optional[str]:
-        """Generate response using LLaMA via GroqCloud"""
+                         max_tokens: int = 1000, agent: str = None,
+                         intent: str = None,
+                         output_budget: OutputBudget = None) -> Optional[str]:
+        """Generate response using LLaMA via GroqCloud, routed to the fast or large model"""
         if not self.client:
             return self._fallback_response(prompt, system_message)
+        
+        if not self.circuit_breaker.allow_request():
+            print("DEBUG: Groq circuit breaker open - returning fallback without calling the API")
+            return self._timeout_fallback_response(prompt, system_message)
             
         try:
             messages = []
+            stop = None
+            
+            # The agent's output budget replaces the generic max_tokens
+            if output_budget:
+                max_tokens = output_budget.max_tokens
+                stop = output_budget.stop
+                system_message = f"{system_message}\n\n{output_budget.instruction}" if system_message else output_budget.instruction
             
             if system_message:
                 messages.append({
@@ -60,15 +268,24 @@ class LlamaAPI:
                 "content": prompt
             })
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=0.7,
-                timeout=30  # 30 second timeout
-            )
+            model = model_router.select_model(prompt, agent=agent, intent=intent)
+            content, finish_reason = self._create_completion(model, messages, max_tokens, agent, stop)
             
-            return response.choices[0].message.content
+            # Confidence heuristic: retry weak fast-model answers on the large model
+            if model_router.should_escalate(model, content, finish_reason):
+                print(f"DEBUG: Escalating {agent or 'default'} request from {model} to {model_router.large_model}")
+                metrics.inc("llm_escalations_total", agent=agent or "default")
+                try:
+                    content, finish_reason = self._create_completion(
+                        model_router.large_model, messages, max_tokens, agent, stop
+                    )
+                except Exception as e:
+                    # Keep the fast-model answer rather than failing the request
+                    print(f"Escalation failed, keeping fast model response: {e}")
+                    if not content:
+                        raise
+            
+            return content
             
         except Exception as e:
             error_msg = str(e).lower()
@@ -79,8 +296,132 @@ class LlamaAPI:
                 print(f"Error generating LLaMA response: {e}")
                 return self._fallback_response(prompt, system_message)
     
-    def analyze_medical_report(self, ocr_text: str) -> Optional[str]:
-        """Analyze medical report text"""
+    @tracer.traced("llm.completion", kind="client")
+    def _create_completion(self, model: str, messages: list, max_tokens: int,
+                           agent: str = None, stop: list = None) -> Tuple[Optional[str], Optional[str]]:
+        """Call Groq through the scheduler and record model choice and latency"""
+        start = time.perf_counter()
+        status = "ok"
+        used = None
+        user = _llm_user.get()
+        reserved = sum(estimate_tokens(m["content"]) for m in messages) + max_tokens
+        request = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": 0.7,
+            "stop": stop,
+            "timeout": self.timeout
+        }
+        try:
+            attempts = 0
+            while True:
+                self.scheduler.acquire(user, reserved)
+                used = None
+                try:
+                    if self._executor is not None:
+                        response = self._hedged_create(request, reserved)
+                    else:
+                        response = self.client.chat.completions.create(**request)
+                    used = getattr(getattr(response, "usage", None), "total_tokens", None)
+                    break
+                except Exception as e:
+                    retry_after = _retry_after_seconds(e)
+                    if retry_after is None or attempts >= self.max_rate_limit_retries:
+                        raise
+                    attempts += 1
+                    metrics.inc("llm_rate_limited_total", model=model)
+                    self.scheduler.defer(retry_after)
+                finally:
+                    self.scheduler.release(reserved, used)
+            self.circuit_breaker.record_success()
+            self.latency_window.add(time.perf_counter() - start)
+            usage = getattr(response, "usage", None)
+            for kind in ("prompt", "completion"):
+                tokens = getattr(usage, f"{kind}_tokens", None)
+                if tokens:
+                    metrics.inc("llm_tokens_total", tokens, model=model, agent=agent or "default", type=kind)
+            choice = response.choices[0]
+            finish_reason = getattr(choice, "finish_reason", None)
+            if finish_reason == "length":
+                metrics.inc("llm_output_budget_exhausted_total", agent=agent or "default")
+            return choice.message.content, finish_reason
+        except Exception as e:
+            status = "error"
+            # Local queue timeouts and provider rate limits say nothing about Groq health
+            if not isinstance(e, LLMQueueTimeout) and _retry_after_seconds(e) is None:
+                self.circuit_breaker.record_failure()
+            else:
+                # Let the next request probe instead of leaving the breaker half-open for good
+                self.circuit_breaker.release_probe()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            labels = {"model": model, "agent": agent or "default", "status": status}
+            metrics.inc("llm_requests_total", **labels)
+            metrics.histogram("llm_request_latency_seconds", elapsed, **labels)
+            span = tracer.current_span()
+            span.set_attribute("llm.model", model)
+            span.set_attribute("llm.agent", labels["agent"])
+            span.set_attribute("llm.max_tokens", max_tokens)
+            span.set_attribute("llm.total_tokens", used)
+            print(f"DEBUG: LLM call agent={labels['agent']} model={model} status={status} latency={elapsed:.2f}s")
+    
+    def _hedge_delay(self) -> float:
+        """Delay before sending a hedged duplicate: p95 of recent latencies"""
+        if len(self.latency_window) < 20:
+            return min(self.hedge_default_delay, self.timeout / 2)
+        p95 = self.latency_window.percentile(95)
+        return min(max(p95, self.hedge_min_delay), self.timeout / 2)
+    
+    def _hedged_create(self, request: Dict, reserved_tokens: int):
+        """Send the request, and a duplicate if it is still pending after the hedge delay"""
+        deadline = time.monotonic() + self.timeout
+        futures = [self._executor.submit(self.client.chat.completions.create, **request)]
+        
+        try:
+            return futures[0].result(timeout=self._hedge_delay())
+        except FutureTimeoutError:
+            # Only hedge when the scheduler has spare capacity right now
+            if not self.scheduler.try_acquire(reserved_tokens):
+                try:
+                    return futures[0].result(timeout=max(deadline - time.monotonic(), 0))
+                except FutureTimeoutError:
+                    raise TimeoutError(f"Groq request timed out after {self.timeout:.0f}s")
+            metrics.inc("llm_hedged_requests_total", model=request["model"])
+            hedge = self._executor.submit(self.client.chat.completions.create, **request)
+            hedge.add_done_callback(lambda _: self.scheduler.release(reserved_tokens))
+            futures.append(hedge)
+        
+        last_error = None
+        try:
+            for future in as_completed(futures, timeout=max(deadline - time.monotonic(), 0)):
+                if future.exception() is None:
+                    if future is futures[1]:
+                        metrics.inc("llm_hedge_wins_total", model=request["model"])
+                    return future.result()
+                last_error = future.exception()
+        except FutureTimeoutError:
+            raise TimeoutError(f"Groq request timed out after {self.timeout:.0f}s")
+        raise last_error
+    
+    def get_status(self) -> Dict:
+        """Get client, circuit breaker and hedging status for health checks"""
+        p95 = self.latency_window.percentile(95)
+        return {
+            "available": self.client is not None,
+            "circuit_breaker": self.circuit_breaker.get_status(),
+            "hedging": {
+                "enabled": self.hedge_enabled,
+                "delay_seconds": round(self._hedge_delay(), 2) if self.hedge_enabled else None
+            },
+            "scheduler": self.scheduler.get_status(),
+            "latency_p95_seconds": round(p95, 3) if p95 is not None else None,
+            "timeout_seconds": self.timeout
+        }
+    
+    def analyze_medical_report(self, ocr_text: str, compact: bool = True) -> Optional[str]:
+        """Analyze medical report text; compact=False when the caller already compacted it"""
         system_message = """You are a medical report analyzer. Analyze the provided medical report text and provide a comprehensive summary in simple, easy-to-understand language. Include:
         1. Key findings and what they mean
         2. Important values and their significance in plain terms
@@ -90,9 +431,14 @@ class LlamaAPI:
         
         Write 5-6 sentences that explain the report in layman's terms. Be clear and informative without medical jargon."""
         
-        prompt = f"Please analyze this medical report and explain it in simple terms:\n\n{ocr_text}"
+        # Strip OCR noise and keep the report within the prompt token budget
+        report_text = prompt_compactor.compact(ocr_text).text if compact else ocr_text
+        
+        prompt = f"Please analyze this medical report and explain it in simple terms:\n\n{report_text}"
         
-        return self.generate_response(prompt, system_message, max_tokens=1500)
+        return self.generate_response(prompt, system_message, agent="report_analyzer",
+                                      intent="report_analysis",
+                                      output_budget=OUTPUT_BUDGETS['report_analyzer'])
     
     def check_symptoms(self, symptoms: str) -> Optional[str]:
         """Analyze symptoms and suggest possible conditions"""
@@ -106,9 +452,12 @@ class LlamaAPI:
         
         prompt = f"Please analyze these symptoms and provide guidance: {symptoms}"
         
-        return self.generate_response(prompt, system_message, max_tokens=1200)
+        return self.generate_response(prompt, system_message, agent="symptom_checker",
+                                      intent="symptom_check",
+                                      output_budget=OUTPUT_BUDGETS['symptom_checker'])
     
-    def answer_healthcare_question(self, question: str) -> Optional[str]:
+    def answer_healthcare_question(self, question: str, agent: str = "chatbot",
+                                   output_budget: OutputBudget = None) -> Optional[str]:
         """Answer general healthcare questions"""
         system_message = """You are a knowledgeable healthcare assistant. Provide accurate, helpful information about:
         - General health topics
@@ -118,7 +467,9 @@ class LlamaAPI:
         
         Always remind users to consult healthcare professionals for specific medical advice."""
         
-        return self.generate_response(question, system_message, max_tokens=1000)
+        return self.generate_response(question, system_message, agent=agent,
+                                      intent="general_question",
+                                      output_budget=output_budget or OUTPUT_BUDGETS['chatbot'])
     
     def _timeout_fallback_response(self, prompt: str, system_message: str = None) -> str:
         """Provide fallback response when request times out"""
@@ -226,5 +577,5 @@ class LlamaAPI:
 
 Please try your question again, or contact your healthcare provider for immediate assistance."""
 
-# Global LLaMA API instance
-llama_api = LlamaAPI()
\ No newline at end of file
+# Global LLaMA API instance (built on first use)
+llama_api = LazyInstance(LlamaAPI, "llama_api")
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""
+Lightweight in-process metrics registry
+Counters, gauges, summaries and histograms keyed by metric name plus label values,
+rendered in the Prometheus text format for /metrics
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from typing import Dict, Tuple
+
+# Default histogram buckets (seconds): sub-millisecond DB calls up to slow LLM responses
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Timer(ContextDecorator):
+    """Context manager / decorator that records its duration in a histogram"""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Dict[str, str]):
+        self._registry = registry
+        self._name = name
+        self._labels = labels
+        self._local = threading.local()
+
+    def __enter__(self):
+        # Decorated functions run concurrently, so the start time is per thread
+        starts = getattr(self._local, 'starts', None)
+        if starts is None:
+            starts = self._local.starts = []
+        starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._local.starts.pop()
+        self._registry.histogram(self._name, elapsed, **self._labels)
+        return False
+
+
+class MetricsRegistry:
+    """Thread-safe store for counters, gauges, summaries and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        self._gauges: Dict[Tuple, float] = {}
+        self._summaries: Dict[Tuple, Dict[str, float]] = {}
+        self._histograms: Dict[Tuple, Dict] = {}
+
+    def _key(self, name: str, labels: Dict[str, str]) -> Tuple:
+        return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Increment a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Set a gauge to a value"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def add_gauge(self, name: str, delta: float, **labels) -> None:
+        """Move a gauge up or down (e.g. +1 when work is queued, -1 when it finishes)"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record an observation in a summary (count, sum, min, max)"""
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = {'count': 1, 'sum': value, 'min': value, 'max': value}
+            else:
+                summary['count'] += 1
+                summary['sum'] += value
+                summary['min'] = min(summary['min'], value)
+                summary['max'] = max(summary['max'], value)
+
+    def histogram(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels) -> None:
+        """Record an observation in a histogram with fixed bucket bounds"""
+        key = self._key(name, labels)
+        index = bisect_left(buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    'buckets': buckets, 'counts': [0] * (len(buckets) + 1), 'count': 0, 'sum': 0.0
+                }
+            histogram['counts'][index] += 1
+            histogram['count'] += 1
+            histogram['sum'] += value
+
+    def timed(self, name: str, **labels) -> _Timer:
+        """Time a block or function into a histogram: `with metrics.timed(...)` or `@metrics.timed(...)`"""
+        return _Timer(self, name, labels)
+
+    def get_counter(self, name: str, **labels) -> float:
+        """Return the current value of a counter"""
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def get_gauge(self, name: str, **labels) -> float:
+        """Return the current value of a gauge"""
+        with self._lock:
+            return self._gauges.get(self._key(name, labels), 0)
+
+    def snapshot(self) -> Dict:
+        """Return a JSON-friendly copy of all metrics"""
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in self._counters.items()
+            ]
+            gauges = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in self._gauges.items()
+            ]
+            summaries = [
+                {'name': name, 'labels': dict(labels), **values}
+                for (name, labels), values in self._summaries.items()
+            ]
+            histograms = [
+                {'name': name, 'labels': dict(labels), 'count': values['count'], 'sum': values['sum'],
+                 'buckets': dict(zip([*map(str, values['buckets']), '+Inf'], values['counts']))}
+                for (name, labels), values in self._histograms.items()
+            ]
+        return {'counters': counters, 'gauges': gauges, 'summaries': summaries, 'histograms': histograms}
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            summaries = sorted((key, dict(values)) for key, values in self._summaries.items())
+            histograms = sorted((key, dict(values, counts=list(values['counts'])))
+                                for key, values in self._histograms.items())
+
+        lines = []
+        typed = set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), value in gauges:
+            declare(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), values in summaries:
+            declare(name, "summary")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(values['count'])}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(values['sum'])}")
+        for (name, labels), values in histograms:
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, count in zip([*values['buckets'], '+Inf'], values['counts']):
+                cumulative += count
+                le = bound if bound == '+Inf' else _format_value(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_count{_format_labels(labels)} {values['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(values['sum'])}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
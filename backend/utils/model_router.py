@@ -0,0 +1,90 @@
+"""
+Two-tier model routing for Groq calls
+Simple intents go to a small fast model; complex intents escalate to the 70B model
+"""
+
+import os
+import re
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from utils.prompt_compactor import estimate_tokens
+
+load_dotenv()
+
+TIER_FAST = 'fast'
+TIER_LARGE = 'large'
+TIER_AUTO = 'auto'
+
+
+class ModelRouter:
+    """Pick the Groq model for a request by agent, intent and prompt complexity"""
+
+    # Intents that always need the large model
+    ESCALATE_INTENTS = {'report_analysis', 'multi_drug_interaction'}
+
+    def __init__(self):
+        self.large_model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+        self.fast_model = os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
+        self.prompt_token_threshold = int(os.getenv("LLM_ESCALATE_PROMPT_TOKENS", "600"))
+
+        # Default tier per agent; override with LLM_AGENT_TIERS="chatbot=fast,symptom_checker=large"
+        self.agent_tiers: Dict[str, str] = {
+            'chatbot': TIER_FAST,
+            'symptom_checker': TIER_AUTO,
+            'drug_interaction': TIER_AUTO,
+            'report_analyzer': TIER_LARGE,
+        }
+        self.agent_tiers.update(self._parse_agent_tiers(os.getenv("LLM_AGENT_TIERS", "")))
+        self.default_tier = os.getenv("LLM_DEFAULT_TIER", TIER_AUTO)
+
+        # Phrases that suggest the fast model was not confident in its answer
+        self.low_confidence_patterns = [
+            re.compile(p, re.IGNORECASE) for p in [
+                r"\bi(?:'m| am) not (?:sure|certain)\b",
+                r"\bi (?:cannot|can't|am unable to) (?:determine|tell|say|answer)\b",
+                r"\bnot enough information\b",
+                r"\bunclear\b",
+            ]
+        ]
+
+    def _parse_agent_tiers(self, value: str) -> Dict[str, str]:
+        """Parse 'agent=tier' pairs from a comma-separated string"""
+        tiers = {}
+        for pair in value.split(','):
+            if '=' not in pair:
+                continue
+            agent, tier = (part.strip().lower() for part in pair.split('=', 1))
+            if tier in (TIER_FAST, TIER_LARGE, TIER_AUTO):
+                tiers[agent] = tier
+        return tiers
+
+    def select_model(self, prompt: str, agent: Optional[str] = None,
+                     intent: Optional[str] = None) -> str:
+        """Return the model to use for the first attempt"""
+        tier = self.agent_tiers.get(agent, self.default_tier) if agent else self.default_tier
+
+        if tier == TIER_LARGE or intent in self.ESCALATE_INTENTS:
+            return self.large_model
+        if tier == TIER_FAST:
+            return self.fast_model
+
+        # Auto tier: escalate long or complex prompts up front
+        if estimate_tokens(prompt) > self.prompt_token_threshold:
+            return self.large_model
+        return self.fast_model
+
+    def should_escalate(self, model: str, content: Optional[str],
+                        finish_reason: Optional[str] = None) -> bool:
+        """Decide whether a fast-model answer should be retried on the large model"""
+        if model == self.large_model:
+            return False
+        # A 'length' finish is expected now that output budgets cap max_tokens,
+        # so only empty or hedging answers count as low confidence
+        if not content or len(content.strip()) < 40:
+            return True
+        return any(pattern.search(content) for pattern in self.low_confidence_patterns)
+
+
+# Global model router instance
+model_router = ModelRouter()
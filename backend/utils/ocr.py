@@ -1,11 +1,20 @@
-import pytesseract
-from PIL import Image
 import io
 import os
-from typing import Optional
+from typing import Dict, Optional
+from utils.metrics import metrics
+from utils.tracing import tracer
 
 class OCRProcessor:
     def __init__(self):
+        self._tesseract = None
+    
+    def _load_tesseract(self):
+        """Import pytesseract on first use so app startup does not pay for it"""
+        if self._tesseract is not None:
+            return self._tesseract
+        
+        import pytesseract
+        
         # Configure Tesseract path if needed (Windows)
         if os.name == 'nt':  # Windows
             # Common Tesseract installation paths on Windows
@@ -19,10 +28,18 @@ class OCRProcessor:
                 if os.path.exists(path):
                     pytesseract.pytesseract.tesseract_cmd = path
                     break
+        
+        self._tesseract = pytesseract
+        return pytesseract
     
+    @tracer.traced("ocr.extract_text")
+    @metrics.timed("ocr_duration_seconds")
     def extract_text_from_image(self, image_data: bytes) -> Optional[str]:
         """Extract text from image using OCR"""
         try:
+            from PIL import Image
+            pytesseract = self._load_tesseract()
+            
             # Open image from bytes
             image = Image.open(io.BytesIO(image_data))
             
@@ -76,6 +93,13 @@ class OCRProcessor:
         
         # If at least 2 medical keywords found, consider it a medical report
         return keyword_count >= 2
+    
+    def get_status(self) -> Dict:
+        """Whether Tesseract is loaded and how many uploads are waiting for or running OCR"""
+        return {
+            "loaded": self._tesseract is not None,
+            "queue_depth": metrics.get_gauge("ocr_queue_depth")
+        }
 
 # Global OCR processor instance
 ocr_processor = OCRProcessor()
\ No newline at end of file
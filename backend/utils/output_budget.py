@@ -0,0 +1,54 @@
+"""
+Per-agent output budgets
+Each agent's display limit drives max_tokens and stop sequences so the model stops
+generating near the point where the response would be truncated anyway
+"""
+
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from utils.metrics import metrics
+from utils.prompt_compactor import estimate_tokens
+
+# Average characters per generated token for English prose
+CHARS_PER_TOKEN = 4
+# Extra room so the model can finish its last sentence past the display limit
+TOKEN_HEADROOM = float(os.getenv("LLM_OUTPUT_TOKEN_HEADROOM", "1.3"))
+MIN_MAX_TOKENS = 64
+
+
+@dataclass
+class OutputBudget:
+    """Output limit for one agent response"""
+    name: str
+    max_chars: int
+    stop: Optional[List[str]] = field(default=None)
+
+    @property
+    def max_tokens(self) -> int:
+        return max(MIN_MAX_TOKENS, math.ceil(self.max_chars / CHARS_PER_TOKEN * TOKEN_HEADROOM))
+
+    @property
+    def instruction(self) -> str:
+        return f"Keep your entire answer under {self.max_chars} characters and end on a complete sentence."
+
+    def record(self, generated: str, kept: str) -> None:
+        """Record how many generated tokens the safety-net truncation discarded"""
+        generated_tokens = estimate_tokens(generated or "")
+        discarded = max(generated_tokens - estimate_tokens(kept or ""), 0)
+        metrics.inc("llm_output_tokens_generated_total", generated_tokens, agent=self.name)
+        metrics.inc("llm_output_tokens_discarded_total", discarded, agent=self.name)
+        if discarded:
+            metrics.inc("llm_output_truncations_total", agent=self.name)
+
+
+# Display limits used by each agent's _truncate_at_sentence call
+OUTPUT_BUDGETS: Dict[str, OutputBudget] = {
+    'chatbot': OutputBudget('chatbot', 700, stop=["\n\n\n"]),
+    'symptom_checker': OutputBudget('symptom_checker', 800, stop=["\n\n\n"]),
+    'report_analyzer': OutputBudget('report_analyzer', 500, stop=["\n\n\n"]),
+    'drug_interaction': OutputBudget('drug_interaction', 200, stop=["\n\n\n"]),
+    'drug_info': OutputBudget('drug_info', 300, stop=["\n\n\n"]),
+}
@@ -0,0 +1,187 @@
+"""
+Token-budgeted compaction of OCR text before it is sent to the LLM
+Strips boilerplate, dedupes lines, ranks by medical relevance and enforces a token budget
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+from dotenv import load_dotenv
+
+from utils.metrics import metrics
+
+load_dotenv()
+
+# Rough BPE approximation: words, numbers and punctuation each cost at least one
+# token, long words cost roughly one token per four characters
+_TOKEN_PIECE = re.compile(r"[A-Za-z]+|\d+(?:\.\d+)?|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in text without a remote tokenizer"""
+    if not text:
+        return 0
+    tokens = 0
+    for piece in _TOKEN_PIECE.findall(text):
+        tokens += 1 + (len(piece) - 1) // 4 if len(piece) > 4 else 1
+    return tokens
+
+
+@dataclass
+class CompactionResult:
+    """Compacted text plus bookkeeping for metrics"""
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+    lines_dropped: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(self.original_tokens - self.compacted_tokens, 0)
+
+
+class PromptCompactor:
+    """Reduce noisy OCR report text to the lines that matter for analysis"""
+
+    def __init__(self, token_budget: int = None):
+        self.token_budget = token_budget or int(os.getenv("REPORT_PROMPT_TOKEN_BUDGET", "1200"))
+
+        # Lines matching any of these carry no clinical information
+        self.boilerplate_patterns = [
+            re.compile(p, re.IGNORECASE) for p in [
+                r'^page\s*\d+(\s*(of|/)\s*\d+)?$',
+                # A real phone number: 7+ digits after the label ("ph" would also match "Urine pH 6")
+                r'\b(tel|phone|fax|mobile)\s*[:.]?\s*\+?(\d[\s()\-]*){7,}',
+                r'[\w.+-]+@[\w-]+\.[\w.]+',
+                r'(https?://|www\.)\S+',
+                r'\b(street|st\.|road|rd\.|avenue|ave\.|p\.?o\.? box)\b.*\d'
+                r'|\d+.*\b(street|road|avenue|lane|nagar|marg)\b',
+                r'\b(zip|pin)\s*(code)?\s*[:\-]?\s*\d{5,6}\b',
+                r'\b(printed|generated|reported)\s+(on|at|by)\b',
+                r'\b(confidential|disclaimer|this is a computer generated|end of report|'
+                r'electronically signed|not valid for medico.?legal)\b',
+                r'\b(nabl|iso\s*\d+|accredited|cap accredited)\b',
+                r'^[\W_]+$',
+            ]
+        ]
+
+        # Terms that indicate clinically relevant content (whole words, so 'alt' does not match "salt")
+        medical_terms = [
+            'hemoglobin', 'haemoglobin', 'glucose', 'cholesterol', 'triglyceride', 'hdl', 'ldl',
+            'creatinine', 'urea', 'bilirubin', 'albumin', 'platelet', 'wbc', 'rbc', 'hba1c',
+            'tsh', 't3', 't4', 'sodium', 'potassium', 'calcium', 'vitamin', 'ferritin', 'iron',
+            'alt', 'ast', 'sgot', 'sgpt', 'alkaline', 'uric acid', 'esr', 'crp', 'neutrophil',
+            'lymphocyte', 'hematocrit', 'mcv', 'mch', 'impression', 'diagnosis', 'finding',
+            'conclusion', 'result', 'abnormal', 'normal', 'positive', 'negative', 'elevated',
+            'reduced', 'deficiency', 'lesion', 'fracture', 'opacity', 'mass', 'nodule',
+            'infection', 'blood pressure', 'pulse', 'test', 'range', 'reference',
+        ]
+        self.medical_terms = re.compile(r'\b(' + '|'.join(map(re.escape, medical_terms)) + r')\b', re.IGNORECASE)
+        # H/L only as a standalone flag column, never the L of a unit such as mmol/L
+        self.flag_pattern = re.compile(
+            r'(?i:\b(high|low|critical|abnormal|elevated|borderline)\b)|[*↑↓]|(?<!\S)[(\[]?[HL][)\]]?(?!\S)'
+        )
+        self.value_pattern = re.compile(
+            r'\d+(\.\d+)?\s*(mg/dl|g/dl|mmol/l|µ?iu/ml|u/l|iu/l|%|/cumm|cells|lakh|mm/hr|ng/ml|pg/ml|fl|pg|mmhg|bpm)',
+            re.IGNORECASE
+        )
+        self.range_pattern = re.compile(r'\d+(\.\d+)?\s*[-–]\s*\d+(\.\d+)?')
+
+    def compact(self, text: str, token_budget: int = None) -> CompactionResult:
+        """Compact text to fit the token budget and record tokens saved"""
+        budget = token_budget or self.token_budget
+        original_tokens = estimate_tokens(text or "")
+
+        if original_tokens <= budget:
+            # Already fits: send the report as read, only without blank lines
+            kept = [line for line in (text or "").splitlines() if line.strip()]
+        else:
+            lines = self._dedupe(self._strip_boilerplate((text or "").splitlines()))
+            kept = self._fit_budget(lines, budget)
+        compacted = "\n".join(kept)
+
+        result = CompactionResult(
+            text=compacted,
+            original_tokens=original_tokens,
+            compacted_tokens=estimate_tokens(compacted),
+            lines_dropped=len((text or "").splitlines()) - len(kept)
+        )
+
+        metrics.inc("report_prompt_compactions_total")
+        metrics.inc("report_prompt_tokens_saved_total", result.tokens_saved)
+        metrics.observe("report_prompt_tokens_saved", result.tokens_saved)
+        print(f"DEBUG: Report prompt compacted {result.original_tokens} -> "
+              f"{result.compacted_tokens} tokens ({result.lines_dropped} lines dropped)")
+        return result
+
+    def _strip_boilerplate(self, lines: List[str]) -> List[str]:
+        """Drop addresses, contact details, footers and empty lines"""
+        kept = []
+        for line in lines:
+            line = ' '.join(line.split())
+            if not line:
+                continue
+            if self._is_clinical(line):
+                kept.append(line)
+                continue
+            if any(pattern.search(line) for pattern in self.boilerplate_patterns):
+                continue
+            kept.append(line)
+        return kept
+
+    def _is_clinical(self, line: str) -> bool:
+        """Lines with a measured value, a reference range or a flag are never boilerplate"""
+        return bool(self.value_pattern.search(line) or self.range_pattern.search(line)
+                    or self.flag_pattern.search(line))
+
+    def _dedupe(self, lines: List[str]) -> List[str]:
+        """Remove repeated lines such as per-page headers, keeping the first occurrence"""
+        seen = set()
+        unique = []
+        for line in lines:
+            key = re.sub(r'[^a-z0-9]', '', line.lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(line)
+        return unique
+
+    def _score_line(self, line: str) -> float:
+        """Score a line by medical relevance"""
+        score = 0.0
+        if self.value_pattern.search(line):
+            score += 3
+        if self.range_pattern.search(line):
+            score += 1.5
+        if self.flag_pattern.search(line):
+            score += 2
+        score += len({term.lower() for term in self.medical_terms.findall(line)})
+        if any(ch.isdigit() for ch in line):
+            score += 0.5
+        return score
+
+    def _fit_budget(self, lines: List[str], budget: int) -> List[str]:
+        """Keep the highest-scoring lines that fit the budget, in original order"""
+        costs = [estimate_tokens(line) + 1 for line in lines]
+        if sum(costs) <= budget:
+            return lines
+
+        ranked: List[Tuple[float, int]] = sorted(
+            ((self._score_line(line), i) for i, line in enumerate(lines)),
+            key=lambda item: (-item[0], item[1])
+        )
+
+        selected = set()
+        used = 0
+        for _, index in ranked:
+            if used + costs[index] > budget:
+                continue
+            selected.add(index)
+            used += costs[index]
+
+        return [lines[i] for i in sorted(selected)]
+
+
+# Global prompt compactor instance
+prompt_compactor = PromptCompactor()
@@ -0,0 +1,129 @@
+"""
+Recurrence rules for medication reminders
+Turns frequency strings like "2 times daily" or "Every 8 hours" into minute-of-day slots once, at save time,
+and maps those local slots to UTC minutes for each user's timezone
+"""
+
+import os
+import re
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+MINUTES_PER_DAY = 24 * 60
+
+# "N times daily" doses are spread evenly over this many hours, starting at the reminder time
+DOSING_SPAN_HOURS = 12
+
+_WORD_COUNTS = {'once': 1, 'twice': 2, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6}
+
+
+def parse_time_of_day(value: str) -> Optional[int]:
+    """Return minutes since midnight for 'HH:MM' (or None if it cannot be parsed)"""
+    match = re.match(r'^\s*(\d{1,2}):(\d{2})', value or '')
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def format_slot(minute_of_day: int) -> str:
+    """Format minutes since midnight as 'HH:MM'"""
+    return f"{minute_of_day // 60:02d}:{minute_of_day % 60:02d}"
+
+
+def parse_frequency(frequency: str) -> Optional[dict]:
+    """
+    Parse a frequency string into a rule
+
+    Returns {'times_per_day': n} or {'interval_minutes': m}, or None if not understood
+    """
+    text = (frequency or '').lower().strip()
+
+    match = re.search(r'every\s+(\d+)\s*(hour|hr|minute|min)', text)
+    if match:
+        amount = int(match.group(1))
+        minutes = amount * 60 if match.group(2).startswith('h') else amount
+        if 0 < minutes <= MINUTES_PER_DAY:
+            return {'interval_minutes': minutes}
+        return None
+
+    if re.search(r'\b(?:every\s+day|daily|per\s+day|a\s+day)\b', text):
+        match = re.search(r'(\d+)\s*times?', text)
+        if match:
+            count = int(match.group(1))
+        else:
+            words = re.findall(r'\b(' + '|'.join(_WORD_COUNTS) + r')\b', text)
+            count = _WORD_COUNTS[words[0]] if words else 1
+        if 0 < count <= 24:
+            return {'times_per_day': count}
+
+    return None
+
+
+def compute_slots(frequency: str, time_of_day: str) -> List[int]:
+    """
+    Precompute the sorted minute-of-day slots for a reminder
+
+    The reminder's time is the anchor (first dose). Interval rules repeat from the
+    anchor and restart at the anchor each day; unknown frequencies fire once daily.
+    """
+    anchor = parse_time_of_day(time_of_day)
+    if anchor is None:
+        return []
+
+    rule = parse_frequency(frequency) or {'times_per_day': 1}
+
+    if 'interval_minutes' in rule:
+        step = rule['interval_minutes']
+        count = max(1, MINUTES_PER_DAY // step)
+        offsets = [i * step for i in range(count)]
+    else:
+        count = rule['times_per_day']
+        span = DOSING_SPAN_HOURS * 60 if count > 1 else 0
+        offsets = [round(i * span / (count - 1)) for i in range(count)] if count > 1 else [0]
+
+    return sorted({(anchor + offset) % MINUTES_PER_DAY for offset in offsets})
+
+
+def get_timezone(name: Optional[str]) -> tzinfo:
+    """Return the tzinfo for an IANA name, falling back to DEFAULT_TIMEZONE or the server's zone"""
+    for candidate in (name, os.getenv("DEFAULT_TIMEZONE")):
+        if candidate:
+            try:
+                return ZoneInfo(candidate)
+            except (ZoneInfoNotFoundError, ValueError):
+                continue
+    return datetime.now().astimezone().tzinfo
+
+
+def is_valid_timezone(name: str) -> bool:
+    """Return True if name is a known IANA timezone such as 'Asia/Kolkata'"""
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+def utc_minute_of_day(minute_of_day: int, tz: tzinfo, now: Optional[datetime] = None) -> int:
+    """
+    Convert a local minute-of-day to UTC using the offset at its next occurrence
+
+    Using the next occurrence (not today's offset) means a refresh shortly before a DST
+    transition already yields the right UTC minute for the first slot after it.
+    """
+    now = now or datetime.now(timezone.utc)
+    local_now = now.astimezone(tz)
+    local_date = local_now.date()
+    hour, minute = divmod(minute_of_day, 60)
+
+    occurrence = datetime(local_date.year, local_date.month, local_date.day, hour, minute, tzinfo=tz)
+    if occurrence < local_now:
+        next_date = local_date + timedelta(days=1)
+        occurrence = datetime(next_date.year, next_date.month, next_date.day, hour, minute, tzinfo=tz)
+
+    utc = occurrence.astimezone(timezone.utc)
+    return utc.hour * 60 + utc.minute
@@ -0,0 +1,122 @@
+"""
+Resilience helpers for calls to external services
+Circuit breaker that fails fast after repeated errors, and a rolling latency window for hedging
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from utils.metrics import metrics
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures; half-open probe after the reset timeout"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._total_failures = 0
+        self._short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        # Caller holds the lock
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go through; only one probe is allowed while half-open"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._short_circuited += 1
+        metrics.inc("circuit_breaker_short_circuits_total", breaker=self.name)
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                print(f"Circuit breaker '{self.name}' closed")
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """End a half-open probe without an outcome (e.g. it never reached the service)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            self._total_failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if state != self.OPEN:
+                    print(f"⚠️  Circuit breaker '{self.name}' opened after {self._consecutive_failures} failures")
+                    metrics.inc("circuit_breaker_opened_total", breaker=self.name)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def get_status(self) -> Dict:
+        """Get breaker state for health checks"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+            if state == self.OPEN:
+                retry_in = round(max(self.reset_timeout - (time.monotonic() - self._opened_at), 0), 1)
+            return {
+                'state': state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'total_failures': self._total_failures,
+                'short_circuited': self._short_circuited,
+                'retry_in_seconds': retry_in
+            }
+
+
+class LatencyWindow:
+    """Rolling window of recent latencies used to derive percentile-based delays"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Return the pct-th percentile (0-100) or None without samples"""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
@@ -0,0 +1,151 @@
+"""
+Signed session tokens
+/login issues an HMAC-signed token; requests are validated with an in-memory LRU of
+verified tokens, falling back to one HMAC check on a miss (no database or bcrypt work)
+"""
+
+import asyncio
+import base64
+import contextvars
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from utils.metrics import metrics
+
+load_dotenv()
+
+TOKEN_VERSION = "v1"
+# Shorter keys can be brute-forced from a single issued token
+MIN_SECRET_KEY_LENGTH = 32
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+class SessionManager:
+    """Issue and validate signed session tokens"""
+
+    def __init__(self):
+        secret = os.getenv("SECRET_KEY")
+        if not secret or secret.startswith("your_") or len(secret) < MIN_SECRET_KEY_LENGTH:
+            # A placeholder or short key would let anyone forge tokens. Tokens from a random key
+            # do not survive restarts or work across workers
+            print(f"⚠️  SECRET_KEY is not set, a placeholder or shorter than {MIN_SECRET_KEY_LENGTH} "
+                  "characters; using a random per-process session key")
+            secret = secrets.token_hex(32)
+        self._key = secret.encode('utf-8')
+        self.ttl = int(os.getenv("SESSION_TIMEOUT", "3600"))
+        self.cache_size = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self._key, payload.encode('ascii'), hashlib.sha256).digest())
+
+    def issue(self, user: Dict) -> str:
+        """Create a token for an authenticated user dict (id, username)"""
+        claims = {
+            'uid': user['id'],
+            'usr': user['username'],
+            'exp': int(time.time()) + self.ttl,
+            'jti': secrets.token_hex(8),
+        }
+        payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+        body = f"{TOKEN_VERSION}.{payload}"
+        return f"{body}.{self._sign(body)}"
+
+    def validate(self, token: str) -> Optional[Dict]:
+        """Return the token's session ({'user_id', 'username', 'expires_at'}) or None"""
+        if not token:
+            return None
+        now = time.time()
+
+        with self._lock:
+            session = self._cache.get(token)
+            if session is not None:
+                if session['expires_at'] > now:
+                    self._cache.move_to_end(token)
+                    metrics.inc("session_validations_total", result="cache_hit")
+                    return session
+                del self._cache[token]
+
+        session = self._verify(token, now)
+        metrics.inc("session_validations_total", result="verified" if session else "rejected")
+        if session is None:
+            return None
+
+        with self._lock:
+            self._cache[token] = session
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return session
+
+    def _verify(self, token: str, now: float) -> Optional[Dict]:
+        """Check signature, expiry and revocation of a token not in the cache"""
+        try:
+            version, payload, signature = token.split('.')
+        except ValueError:
+            return None
+        if version != TOKEN_VERSION:
+            return None
+        if not hmac.compare_digest(signature, self._sign(f"{version}.{payload}")):
+            return None
+        try:
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, TypeError):
+            return None
+        if claims.get('exp', 0) <= now:
+            return None
+        with self._lock:
+            if claims.get('jti') in self._revoked:
+                return None
+        return {'user_id': claims['uid'], 'username': claims['usr'],
+                'expires_at': claims['exp'], 'jti': claims.get('jti')}
+
+    def revoke(self, token: str) -> bool:
+        """Invalidate a token in this process (used by /logout)"""
+        session = self.validate(token)
+        if session is None:
+            return False
+        now = time.time()
+        with self._lock:
+            self._cache.pop(token, None)
+            self._revoked[session['jti']] = session['expires_at']
+            # Forget revocations once the token would have expired anyway
+            for jti in [j for j, expires in self._revoked.items() if expires <= now]:
+                del self._revoked[jti]
+        return True
+
+
+# Bounded pool for bcrypt hashing so logins never block the event loop
+_auth_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    thread_name_prefix="bcrypt"
+)
+
+
+async def run_auth_work(func, *args):
+    """Run a bcrypt-bound call (login, registration) in the auth thread pool"""
+    loop = asyncio.get_running_loop()
+    # Keep the request's trace context on the auth thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_auth_executor, context.run, func, *args)
+
+
+# Global session manager instance
+session_manager = SessionManager()
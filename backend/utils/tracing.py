@@ -0,0 +1,320 @@
+"""
+Lightweight request tracing
+Spans record where a request spends its time (routing, SQLite, RxNav, Groq, CrewAI, OCR).
+Finished traces are exported as OTLP/JSON lines (the format read by the OpenTelemetry
+Collector's otlpjsonfile receiver) to the console or a file, from a background thread
+"""
+
+import functools
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# none (IDs only, for the response header), console or file
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "healthcare-support-system")
+
+# OTLP span kinds and status codes
+SPAN_KIND = {"internal": 1, "server": 2, "client": 3}
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict) -> List[Dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "kind", "attributes", "events",
+                 "status", "status_message", "start_ns", "_start_perf", "duration_ns", "_root", "_finished")
+
+    def __init__(self, name: str, trace_id: str, parent: Optional["Span"] = None, kind: str = "internal",
+                 parent_id: str = None, attributes: Dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else parent_id
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.events = []
+        self.status = STATUS_OK
+        self.status_message = None
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        self.duration_ns = None
+        # Spans are collected on their root and exported together when it ends
+        self._root = parent._root if parent else self
+        self._finished = [] if parent is None else None
+
+    @property
+    def recording(self) -> bool:
+        return True
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return self.duration_ns / 1e6 if self.duration_ns is not None else None
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, error: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = str(error)[:200]
+        self.events.append({
+            "name": "exception",
+            "timeUnixNano": str(time.time_ns()),
+            "attributes": _otlp_attributes({"exception.type": type(error).__name__,
+                                            "exception.message": str(error)[:500]}),
+        })
+
+    def end(self) -> None:
+        self.duration_ns = time.perf_counter_ns() - self._start_perf
+        root = self._root
+        if root is self:
+            tracer.export(self._finished + [self])
+        elif root.duration_ns is None:
+            root._finished.append(self)
+        else:
+            # Outlived its root (e.g. a hedged LLM call); export on its own
+            tracer.export([self])
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.start_ns + (self.duration_ns or 0)),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        if self.events:
+            span["events"] = self.events
+        return span
+
+
+class _NoopSpan:
+    """Stand-in when there is no sampled trace; every operation is free"""
+
+    recording = False
+    trace_id = None
+    span_id = None
+    duration_ms = None
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def record_exception(self, error: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class UnsampledTrace(_NoopSpan):
+    """Root of a trace that is not recorded; it only carries the trace ID"""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+
+
+class Tracer:
+    """Create spans and export finished traces"""
+
+    def __init__(self, exporter: str = TRACE_EXPORTER, sample_rate: float = TRACE_SAMPLE_RATE,
+                 path: str = TRACE_FILE):
+        self.exporter = exporter if exporter in ("console", "file") else "none"
+        self.sample_rate = sample_rate
+        self.path = path
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self.exported_traces = 0
+        self.dropped_spans = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter != "none"
+
+    def current_span(self):
+        """The innermost active span, or a no-op span outside a sampled trace"""
+        span = _current_span.get()
+        return span if span is not None else NOOP_SPAN
+
+    def current_trace_id(self) -> Optional[str]:
+        return self.current_span().trace_id
+
+    @contextmanager
+    def start_trace(self, name: str, traceparent: str = None, kind: str = "internal",
+                    **attributes) -> Iterator[Span]:
+        """Begin a new trace (or continue a W3C traceparent) with a root span"""
+        trace_id, parent_id, sampled = self._parse_traceparent(traceparent)
+        if trace_id is None:
+            trace_id = f"{random.getrandbits(128):032x}"
+            sampled = self.enabled and random.random() < self.sample_rate
+        if not (sampled and self.enabled):
+            token = _current_span.set(UnsampledTrace(trace_id))
+            try:
+                yield _current_span.get()
+            finally:
+                _current_span.reset(token)
+            return
+
+        span = Span(name, trace_id, kind=kind, parent_id=parent_id, attributes=attributes)
+        # A continued trace has a remote parent, but this process still exports from its own root
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes) -> Iterator[Span]:
+        """Time a block as a child of the current span (no-op outside a sampled trace)"""
+        parent = _current_span.get()
+        if parent is None or not parent.recording:
+            yield NOOP_SPAN
+            return
+        span = Span(name, parent.trace_id, parent=parent, kind=kind, attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def traced(self, name: str = None, kind: str = "internal") -> Callable:
+        """Decorator form of span(); the name defaults to the function's qualified name"""
+        def decorator(func: Callable) -> Callable:
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                parent = _current_span.get()
+                if parent is None or not parent.recording:
+                    return func(*args, **kwargs)
+                with self.span(span_name, kind=kind):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def export(self, spans: List[Span]) -> None:
+        """Queue finished spans for the background writer"""
+        if not self.enabled:
+            return
+        if self._writer is None:
+            self._start_writer()
+        self._queue.put(spans)
+
+    def _start_writer(self) -> None:
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="trace-exporter", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        output = sys.stdout if self.exporter == "console" else None
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever else is waiting so a busy server writes in larger chunks
+            while len(batch) < 256:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                lines = "".join(json.dumps(self._resource_spans(spans), separators=(",", ":")) + "\n"
+                                for spans in batch)
+                if output is not None:
+                    output.write(lines)
+                    output.flush()
+                else:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(lines)
+                self.exported_traces += len(batch)
+            except Exception as e:
+                self.dropped_spans += sum(len(spans) for spans in batch)
+                print(f"Trace export error: {e}")
+
+    def _resource_spans(self, spans: List[Span]) -> Dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": TRACE_SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": "healthcare.tracing"}, "spans": [s.to_otlp() for s in spans]}],
+        }]}
+
+    def _parse_traceparent(self, header: Optional[str]):
+        """(trace_id, parent_span_id, sampled) from a W3C traceparent header, or Nones"""
+        if not header:
+            return None, None, False
+        parts = header.strip().split("-")
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == "0" * 32:
+            return None, None, False
+        try:
+            int(parts[1], 16), int(parts[2], 16)
+            sampled = bool(int(parts[3], 16) & 1)
+        except ValueError:
+            return None, None, False
+        return parts[1], parts[2], sampled
+
+    def get_status(self) -> Dict:
+        return {
+            "exporter": self.exporter,
+            "path": self.path if self.exporter == "file" else None,
+            "sample_rate": self.sample_rate,
+            "exported_traces": self.exported_traces,
+            "dropped_spans": self.dropped_spans,
+        }
+
+
+def trace_methods(prefix: str, exclude: tuple = ()) -> Callable:
+    """Class decorator that wraps every public method in a span named prefix.method"""
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_") or attr in exclude or not callable(value):
+                continue
+            setattr(cls, attr, tracer.traced(f"{prefix}.{attr}")(value))
+        return cls
+    return decorator
+
+
+# Global tracer
+tracer = Tracer()
@@ -2,13 +2,19 @@
 const API_BASE = 'http://localhost:8000';
 let currentUser = null;
 
+// Attach the session token issued by /login
+function authHeaders(headers = {}) {
+    const token = localStorage.getItem('token');
+    return token ? { ...headers, 'Authorization': `Bearer ${token}` } : headers;
+}
+
 // Initialize dashboard
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Dashboard initializing...');
     
     // Check authentication
     const userData = localStorage.getItem('user');
-    if (!userData) {
+    if (!userData || !localStorage.getItem('token')) {
         window.location.href = 'login.html';
         return;
     }
@@ -100,9 +106,9 @@ async function sendMessage() {
     try {
         const response = await fetch(`${API_BASE}/chat`, {
             method: 'POST',
-            headers: {
+            headers: authHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify({
                 message: message,
                 user_id: currentUser.id
@@ -283,6 +289,7 @@ async function handleFileUpload(file) {
         
         const response = await fetch(`${API_BASE}/upload-report`, {
             method: 'POST',
+            headers: authHeaders(),
             body: formData
         });
         
@@ -331,9 +338,9 @@ async function addReminder(e) {
     try {
         const response = await fetch(`${API_BASE}/add-reminder`, {
             method: 'POST',
-            headers: {
+            headers: authHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify({
                 user_id: currentUser.id,
                 medicine_name: medicineName,
@@ -361,7 +368,8 @@ async function addReminder(e) {
                     medicine_name: medicineName,
                     dosage: dosage,
                     frequency: frequency,
-                    time: time
+                    time: time,
+                    check_token: data.check_token
                 });
             }
         } else {
@@ -390,7 +398,7 @@ function showInteractionWarning(interactionData, reminderData) {
                 
                 <div class="interaction-details">
                     <h5>🚨 Interaction Alert:</h5>
-                    <div class="interaction-text">${formatInteractionText(interactionData.interaction_details)}</div>
+                    <div class="interaction-text">${interactionData.interactions ? formatInteractionPairs(interactionData.interactions.pairs) : formatInteractionText(interactionData.interaction_details)}</div>
                 </div>
                 
                 <div class="conflicting-drugs">
@@ -428,6 +436,22 @@ function showInteractionWarning(interactionData, reminderData) {
     document.body.appendChild(warningDiv);
 }
 
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text == null ? '' : String(text);
+    return div.innerHTML;
+}
+
+function formatInteractionPairs(pairs) {
+    // Render the structured pairs returned by /add-reminder
+    const severityIcons = { High: '🔴', Medium: '🟡', Low: '🟠', Unknown: '🟠' };
+    const title = (drug) => drug.charAt(0).toUpperCase() + drug.slice(1);
+    return pairs.map(pair => `
+        <p>${severityIcons[pair.severity] || '🟠'} <strong>${escapeHtml(title(pair.drug1))} + ${escapeHtml(title(pair.drug2))}</strong>
+        (${escapeHtml(pair.severity)})<br>${escapeHtml(pair.description)}<br><em>Source: ${escapeHtml(pair.source)}</em></p>
+    `).join('');
+}
+
 function formatInteractionText(interactionDetails) {
     // Convert the interaction details to HTML format
     return interactionDetails
@@ -440,15 +464,16 @@ async function forceAddReminder(reminderData) {
     try {
         const response = await fetch(`${API_BASE}/force-add-reminder`, {
             method: 'POST',
-            headers: {
+            headers: authHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify({
                 user_id: currentUser.id,
                 medicine_name: reminderData.medicine_name,
                 dosage: reminderData.dosage,
                 frequency: reminderData.frequency,
-                time: reminderData.time
+                time: reminderData.time,
+                check_token: reminderData.check_token
             })
         });
         
@@ -489,7 +514,14 @@ function consultDoctor() {
 
 async function loadReminders() {
     try {
-        const response = await fetch(`${API_BASE}/get-reminders?user_id=${currentUser.id}`);
+        const response = await fetch(`${API_BASE}/get-reminders?user_id=${currentUser.id}`, {
+            headers: authHeaders()
+        });
+        if (response.status === 401) {
+            // Session expired or revoked
+            logout();
+            return;
+        }
         const data = await response.json();
         
         if (response.ok) {
@@ -541,9 +573,9 @@ async function deleteReminder(reminderId) {
     try {
         const response = await fetch(`${API_BASE}/delete-reminder`, {
             method: 'DELETE',
-            headers: {
+            headers: authHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify({
                 reminder_id: reminderId,
                 user_id: currentUser.id
@@ -588,6 +620,9 @@ function showAlert(message, type, persistent = false) {
 }
 
 function logout() {
+    // keepalive lets the revocation request outlive the navigation below
+    fetch(`${API_BASE}/logout`, { method: 'POST', headers: authHeaders(), keepalive: true }).catch(() => {});
     localStorage.removeItem('user');
+    localStorage.removeItem('token');
     window.location.href = 'login.html';
 }
\ No newline at end of file